@@ -0,0 +1,230 @@
+"""Admission control: per-user rate limits and global concurrency ceilings.
+
+Rate limits are token buckets keyed by (user, endpoint class). Each class
+("ocr", "llm", "crud") has its own refill rate and burst size from config, so
+one user scripting uploads runs out of OCR tokens without affecting anyone
+else or their own cheap CRUD calls. Routes opt in with
+`Depends(rate_limit("ocr"))`; an empty bucket answers 429 with Retry-After.
+
+Buckets live in process memory by default. With RATE_LIMIT_BACKEND=mongo they
+are shared across workers in the `rate_limits` collection, updated with a
+compare-and-set on the previous state (idle buckets expire via a TTL index).
+If Mongo is unreachable the limiter fails open rather than failing requests.
+
+Concurrency ceilings cap how many expensive requests (OCR pipelines, live LLM
+generation) run at once across all users. Requests wait up to
+`queue_timeout` seconds for a slot, then get 503 with Retry-After.
+
+The LLM ceiling is the admission side of llm_limits.py, not a second
+capacity: it counts requests, the limiter counts model calls
+(LLM_MAX_CONCURRENCY). It admits two requests per call slot,
+enough to keep every slot busy while the next request is being prepared;
+anything beyond that is turned away here within `queue_timeout` instead of
+queueing on the limiter until its LLM deadline runs out.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+from anyio import to_thread
+from fastapi import Depends, HTTPException
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from auth import User, get_current_user
+from config import config
+
+
+class Bucket:
+    """Refill rate (tokens per second) and capacity (burst) of one endpoint class."""
+
+    def __init__(self, per_minute: float, burst: int):
+        self.rate = max(per_minute, 0.001) / 60.0
+        self.capacity = max(1, burst)
+
+    def refill(self, tokens: float, last: float, now: float) -> float:
+        return min(self.capacity, tokens + max(0.0, now - last) * self.rate)
+
+    def retry_after(self, tokens: float) -> float:
+        return (1 - tokens) / self.rate
+
+
+class MemoryBucketStore:
+    """Buckets in a bounded LRU dict; per-process."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._state: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def take(self, key: str, bucket: Bucket, now: float) -> float:
+        """Spend one token; returns 0 if allowed, else seconds until one is available."""
+        with self._lock:
+            tokens, last = self._state.pop(key, (bucket.capacity, now))
+            tokens = bucket.refill(tokens, last, now)
+            wait = 0.0 if tokens >= 1 else bucket.retry_after(tokens)
+            self._state[key] = (tokens - 1 if wait == 0 else tokens, now)
+            if len(self._state) > self.max_keys:
+                self._state.popitem(last=False)
+            return wait
+
+
+class MongoBucketStore:
+    """Buckets shared across workers; optimistic compare-and-set per update."""
+
+    def __init__(self, collection: Callable[[], Any], attempts: int = 5):
+        self._collection = collection
+        self.attempts = attempts
+
+    def take(self, key: str, bucket: Bucket, now: float) -> float:
+        col = self._collection()
+        for _ in range(self.attempts):
+            doc = col.find_one({"_id": key})
+            if doc is None:
+                tokens = float(bucket.capacity)
+            else:
+                tokens = bucket.refill(doc["tokens"], doc["ts"], now)
+            if tokens < 1:
+                # Nothing to write: the refill is recomputed from the stored state next time.
+                return bucket.retry_after(tokens)
+
+            state = {
+                "tokens": tokens - 1,
+                "ts": now,
+                "expires_at": datetime.fromtimestamp(now + bucket.capacity / bucket.rate, tz=timezone.utc),
+            }
+            if doc is None:
+                try:
+                    col.insert_one({"_id": key, **state})
+                    return 0.0
+                except DuplicateKeyError:
+                    continue
+            result = col.update_one({"_id": key, "ts": doc["ts"], "tokens": doc["tokens"]}, {"$set": state})
+            if result.modified_count:
+                return 0.0
+        # Lost every race: this key is being hammered, so ask the caller to back off.
+        return 1 / bucket.rate
+
+
+class RateLimiter:
+    def __init__(self, buckets: dict[str, Bucket], store: Any, enabled: bool = True):
+        self.buckets = buckets
+        self.store = store
+        self.enabled = enabled
+
+    def check(self, user_id: str, endpoint_class: str, now: Optional[float] = None) -> float:
+        """Spend a token for the user; returns 0 if allowed, else Retry-After seconds."""
+        if not self.enabled:
+            return 0.0
+        now = time.time() if now is None else now
+        try:
+            return self.store.take(f"{endpoint_class}:{user_id}", self.buckets[endpoint_class], now)
+        except PyMongoError as e:
+            print(f"Warning: rate limit store unavailable, allowing request: {e}")
+            return 0.0
+
+
+def rate_limit(endpoint_class: str) -> Callable[..., None]:
+    """FastAPI dependency enforcing the per-user bucket for `endpoint_class`."""
+    if endpoint_class not in rate_limiter.buckets:
+        raise ValueError(f"Unknown endpoint class: {endpoint_class}")
+
+    def dependency(current_user: User = Depends(get_current_user)) -> None:
+        wait = rate_limiter.check(str(current_user.id), endpoint_class)
+        if wait > 0:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Too many {endpoint_class} requests, please slow down",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+
+    return dependency
+
+
+class ConcurrencyCeiling:
+    """Caps concurrent expensive requests; waits briefly for a slot, then 503s."""
+
+    def __init__(self, name: str, max_concurrency: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+
+    def _acquire(self) -> bool:
+        with self._lock:
+            self.waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        if acquired:
+            with self._lock:
+                self.in_flight += 1
+        return acquired
+
+    def _release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def _overloaded(self) -> HTTPException:
+        return HTTPException(
+            status_code=503,
+            detail=f"Server is busy ({self.name}), please retry shortly",
+            headers={"Retry-After": str(max(1, math.ceil(self.queue_timeout)))},
+        )
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """For sync code (threadpool endpoints)."""
+        if not self._acquire():
+            raise self._overloaded()
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def async_slot(self) -> AsyncIterator[None]:
+        """For async endpoints; waits in a worker thread so the event loop stays free."""
+        if not await to_thread.run_sync(self._acquire):
+            raise self._overloaded()
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"max": self.max_concurrency, "in_flight": self.in_flight, "waiting": self.waiting}
+
+
+def _store() -> Any:
+    if config.RATE_LIMIT_BACKEND == "mongo":
+        from database import get_rate_limits_collection
+
+        return MongoBucketStore(get_rate_limits_collection)
+    return MemoryBucketStore()
+
+
+rate_limiter = RateLimiter(
+    buckets={
+        "ocr": Bucket(config.RATE_LIMIT_OCR_PER_MINUTE, config.RATE_LIMIT_OCR_BURST),
+        "llm": Bucket(config.RATE_LIMIT_LLM_PER_MINUTE, config.RATE_LIMIT_LLM_BURST),
+        "crud": Bucket(config.RATE_LIMIT_CRUD_PER_MINUTE, config.RATE_LIMIT_CRUD_BURST),
+    },
+    store=_store(),
+    enabled=config.RATE_LIMIT_ENABLED,
+)
+ocr_ceiling = ConcurrencyCeiling("ocr", config.OCR_MAX_CONCURRENCY, config.ADMISSION_QUEUE_TIMEOUT_SECONDS)
+llm_ceiling = ConcurrencyCeiling("llm", config.LLM_MAX_INFLIGHT_REQUESTS, config.ADMISSION_QUEUE_TIMEOUT_SECONDS)
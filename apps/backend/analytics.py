@@ -0,0 +1,188 @@
+"""Pantry analytics computed server-side with aggregation pipelines.
+
+These endpoints return only aggregated numbers so the calendar and
+food-log-history pages don't need to download and crunch the full grocery
+and receipt lists. All pipelines start with a `$match` on (user_id,
+created_at), served by the indexes created in `database.ensure_indexes`.
+
+Purchase counts come from the purchase log (purchases.py), not from grocery
+documents: a re-bought item only increments its existing document, so the
+documents only show each item's first purchase. The perishability split
+describes the pantry itself and is computed over the grocery documents.
+`start`/`end` without a UTC offset are taken as UTC, like the stored dates.
+"""
+
+from datetime import datetime, timezone
+from typing import Any, List, Optional
+
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+
+from admission import rate_limit
+from auth import get_current_user, User
+from database import get_groceries_collection, get_purchases_collection, get_receipts_collection
+
+router = APIRouter(prefix="/api/analytics", tags=["analytics"], dependencies=[Depends(rate_limit("crud"))])
+
+# $bucket boundaries on max_days: [0, 3), [3, 7), ... [30, 101). Perishable
+# items are those that spoil within 100 days (see receipt_parser prompt).
+SHELF_LIFE_BOUNDARIES = [0, 3, 7, 14, 30, 101]
+
+
+class DailyPurchases(BaseModel):
+    date: str
+    grocery_items: int = 0
+    units: int = 0
+    receipts: int = 0
+
+
+class ShelfLifeBucket(BaseModel):
+    min_days: int
+    max_days: int
+    items: int
+    units: int
+
+
+class Perishability(BaseModel):
+    perishable_items: int = 0
+    perishable_units: int = 0
+    shelf_stable_items: int = 0
+    shelf_stable_units: int = 0
+    shelf_life: List[ShelfLifeBucket] = []
+
+
+class ItemFrequency(BaseModel):
+    name: str
+    items: int
+    units: int
+
+
+def _user_oid(user: User) -> ObjectId:
+    try:
+        return ObjectId(user.id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid user id")
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _match(user_id: Any, start: Optional[datetime], end: Optional[datetime]) -> dict[str, Any]:
+    # One bound may carry an offset and the other not; comparing those raises TypeError
+    start, end = _utc(start), _utc(end)
+    if start and end and end < start:
+        raise HTTPException(status_code=400, detail="'end' must not be before 'start'")
+    match: dict[str, Any] = {"user_id": user_id}
+    if start or end:
+        match["created_at"] = {}
+        if start:
+            match["created_at"]["$gte"] = start
+        if end:
+            match["created_at"]["$lt"] = end
+    return match
+
+
+_DAY = {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}}
+
+
+@router.get("/purchases/daily", response_model=List[DailyPurchases])
+def daily_purchases(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user),
+):
+    """Per-day counts of groceries bought (purchases and units) and receipts scanned."""
+    grocery_days = get_purchases_collection().aggregate([
+        {"$match": _match(_user_oid(current_user), start, end)},
+        {"$group": {"_id": _DAY, "grocery_items": {"$sum": 1}, "units": {"$sum": "$units"}}},
+    ])
+    receipt_match = _match(current_user.id, start, end)
+    # Receipts stored before created_at was recorded can't be placed on a day.
+    receipt_match.setdefault("created_at", {"$ne": None})
+    receipt_days = get_receipts_collection().aggregate([
+        {"$match": receipt_match},
+        {"$group": {"_id": _DAY, "receipts": {"$sum": 1}}},
+    ])
+
+    days: dict[str, dict[str, Any]] = {}
+    for row in grocery_days:
+        days.setdefault(row["_id"], {"date": row["_id"]}).update(
+            grocery_items=row["grocery_items"], units=row["units"]
+        )
+    for row in receipt_days:
+        days.setdefault(row["_id"], {"date": row["_id"]})["receipts"] = row["receipts"]
+    return [DailyPurchases(**days[d]) for d in sorted(days)]
+
+
+@router.get("/perishability", response_model=Perishability)
+def perishability(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user),
+):
+    """Perishable vs shelf-stable split, plus a histogram of perishable shelf life."""
+    units = {"$sum": {"$ifNull": ["$count", 1]}}
+    result = list(get_groceries_collection().aggregate([
+        {"$match": _match(_user_oid(current_user), start, end)},
+        {"$facet": {
+            "split": [
+                {"$group": {
+                    "_id": {"$cond": [{"$eq": [{"$ifNull": ["$max_days", None]}, None]}, "shelf_stable", "perishable"]},
+                    "items": {"$sum": 1},
+                    "units": units,
+                }},
+            ],
+            "shelf_life": [
+                {"$match": {"max_days": {"$ne": None}}},
+                {"$bucket": {
+                    "groupBy": "$max_days",
+                    "boundaries": SHELF_LIFE_BOUNDARIES,
+                    "default": "other",
+                    "output": {"items": {"$sum": 1}, "units": units},
+                }},
+            ],
+        }},
+    ]))
+    facets = result[0] if result else {"split": [], "shelf_life": []}
+
+    out = Perishability()
+    for row in facets["split"]:
+        setattr(out, f"{row['_id']}_items", row["items"])
+        setattr(out, f"{row['_id']}_units", row["units"])
+    upper = dict(zip(SHELF_LIFE_BOUNDARIES, SHELF_LIFE_BOUNDARIES[1:]))
+    out.shelf_life = [
+        ShelfLifeBucket(min_days=row["_id"], max_days=upper[row["_id"]] - 1, items=row["items"], units=row["units"])
+        for row in facets["shelf_life"]
+        if row["_id"] in upper
+    ]
+    return out
+
+
+@router.get("/frequency", response_model=List[ItemFrequency])
+def item_frequency(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 20,
+    current_user: User = Depends(get_current_user),
+):
+    """Most frequently bought items by units; `items` is the number of purchases."""
+    if limit <= 0:
+        raise HTTPException(status_code=400, detail="'limit' must be a positive integer")
+    rows = get_purchases_collection().aggregate([
+        {"$match": _match(_user_oid(current_user), start, end)},
+        {"$group": {
+            "_id": {"$ifNull": ["$name_key", {"$toLower": "$name"}]},
+            "name": {"$last": "$name"},
+            "items": {"$sum": 1},
+            "units": {"$sum": "$units"},
+        }},
+        {"$sort": {"units": -1, "_id": 1}},
+        {"$limit": limit},
+    ])
+    return [ItemFrequency(name=r["name"], items=r["items"], units=r["units"]) for r in rows]
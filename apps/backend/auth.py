@@ -1,21 +1,23 @@
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
+from bson import ObjectId
+from bson.errors import InvalidId
 from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
-from passlib.context import CryptContext
 from pydantic import BaseModel, EmailStr, Field, field_validator
 
 from config import config
 from database import get_user_collection
+from password_hashing import password_hasher, pwd_context
+import refresh_tokens
 
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
@@ -54,41 +56,87 @@ class LoginRequest(BaseModel):
 class TokenResponse(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    refresh_token: Optional[str] = None
+    expires_in: int = 0
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
+def _token_pair(user: dict, refresh_token: str) -> TokenResponse:
+    access_token = create_access_token({
+        "sub": str(user.get("_id")),
+        "email": user["email"],
+        "username": user.get("username", "")
+    })
+    return TokenResponse(
+        access_token=access_token,
+        refresh_token=refresh_token,
+        expires_in=config.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    )
 
 
 @router.post("/register", status_code=status.HTTP_201_CREATED)
-def register(req: RegisterRequest):
+async def register(req: RegisterRequest):
+    # Async so bcrypt runs on the hashing executor without holding a threadpool slot;
+    # the short Mongo calls go to the threadpool.
     users = get_user_collection()
     # Enforce unique email and username
-    if users.find_one({"email": req.email}):
+    if await run_in_threadpool(users.find_one, {"email": req.email}):
         raise HTTPException(status_code=400, detail="Email already registered")
-    if users.find_one({"username": req.username}):
+    if await run_in_threadpool(users.find_one, {"username": req.username}):
         raise HTTPException(status_code=400, detail="Username already registered")
 
-    hashed = get_password_hash(req.password)
+    hashed = await password_hasher.hash(req.password)
     user_doc = {
         "username": req.username,
         "email": req.email,
         "password": hashed,
         "created_at": datetime.now(timezone.utc),
     }
-    users.insert_one(user_doc)
+    await run_in_threadpool(users.insert_one, user_doc)
     return {"message": "User registered"}
 
 
 @router.post("/login", response_model=TokenResponse)
-def login(req: LoginRequest):
+async def login(req: LoginRequest):
     users = get_user_collection()
-    user = users.find_one({"email": req.email})
-    if not user or not verify_password(req.password, user.get("password", "")):
+    user = await run_in_threadpool(users.find_one, {"email": req.email})
+    if not user:
         raise HTTPException(status_code=401, detail="Invalid email or password")
+    valid, new_hash = await password_hasher.verify_and_update(req.password, user.get("password", ""))
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was made; store it at the current cost
+        try:
+            await run_in_threadpool(users.update_one, {"_id": user["_id"]}, {"$set": {"password": new_hash}})
+        except Exception as e:
+            print(f"Warning: failed to rehash password: {e}")
 
-    token = create_access_token({
-        "sub": str(user.get("_id")),
-        "email": user["email"],
-        "username": user.get("username", "")
-    })
-    return TokenResponse(access_token=token)
+    refresh_token = await run_in_threadpool(refresh_tokens.issue, str(user["_id"]))
+    return _token_pair(user, refresh_token)
+
+
+@router.post("/refresh", response_model=TokenResponse)
+def refresh(req: RefreshRequest):
+    """Trade a refresh token for a new access token and a new refresh token (no password check)."""
+    try:
+        user_id, new_refresh_token = refresh_tokens.rotate(req.refresh_token)
+        user = get_user_collection().find_one({"_id": ObjectId(user_id)})
+    except (refresh_tokens.RefreshTokenError, InvalidId):
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    if not user:
+        refresh_tokens.revoke(new_refresh_token)
+        raise HTTPException(status_code=401, detail="User not found")
+    return _token_pair(user, new_refresh_token)
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(req: RefreshRequest):
+    """Revoke the refresh token and every token rotated from the same login."""
+    refresh_tokens.revoke(req.refresh_token)
 
 
 class User(BaseModel):
@@ -113,6 +161,13 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
         raise HTTPException(status_code=401, detail="User not found")
 
     return User(id=str(user.get("_id")), email=email, username=user.get("username", ""))
+
+
+def get_admin_user(current_user: User = Depends(get_current_user)) -> User:
+    """Like get_current_user, but only for ADMIN_EMAILS; raises 403 otherwise."""
+    if current_user.email.lower() not in config.ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
     
 @router.get("/me", response_model=User)
 def me(current_user: User = Depends(get_current_user)) -> User:
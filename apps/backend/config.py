@@ -41,8 +41,31 @@ class Config:
     SECRET_KEY: str = _env_str("SECRET_KEY", "")
     MONGO_URI: str = _env_str("MONGO_URI", "")
     MONGO_DB_NAME: str = _env_str("MONGO_DB_NAME", "grocery_db")
+    # Mongo client pool, timeouts and wire compression (see database.py); times in ms
+    MONGO_MAX_POOL_SIZE: int = _env_int("MONGO_MAX_POOL_SIZE", 100) or 100
+    MONGO_MIN_POOL_SIZE: int = _env_int("MONGO_MIN_POOL_SIZE", 0) or 0
+    MONGO_MAX_IDLE_TIME_MS: int = _env_int("MONGO_MAX_IDLE_TIME_MS", 300_000) or 0
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int = _env_int("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5_000) or 0
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = _env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5_000) or 5_000
+    MONGO_CONNECT_TIMEOUT_MS: int = _env_int("MONGO_CONNECT_TIMEOUT_MS", 5_000) or 5_000
+    # 0 (default) waits for replies indefinitely. A limit applies to every operation, so set it above
+    # the slowest analytics aggregation; the migration scripts always run without one.
+    MONGO_SOCKET_TIMEOUT_MS: int = _env_int("MONGO_SOCKET_TIMEOUT_MS", 0) or 0
+    MONGO_RETRY_WRITES: bool = _env_str("MONGO_RETRY_WRITES", "true").lower() in ("1", "true", "yes")
+    MONGO_RETRY_READS: bool = _env_str("MONGO_RETRY_READS", "true").lower() in ("1", "true", "yes")
+    # Preference order; compressors whose Python package isn't installed are skipped
+    MONGO_COMPRESSORS: list[str] = [
+        c.strip().lower() for c in _env_str("MONGO_COMPRESSORS", "zstd,snappy,zlib").split(",") if c.strip()
+    ]
     ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = _env_int("ACCESS_TOKEN_EXPIRE_MINUTES", 30) or 30
+    # Rotating refresh tokens (refresh_tokens.py); /api/auth/refresh mints access tokens without bcrypt
+    REFRESH_TOKEN_EXPIRE_DAYS: int = _env_int("REFRESH_TOKEN_EXPIRE_DAYS", 30) or 30
+    # bcrypt work factor; existing hashes are rehashed at login when it changes (see password_hashing.py)
+    BCRYPT_ROUNDS: int = _env_int("BCRYPT_ROUNDS", 12) or 12
+    # Dedicated hashing threads (0 = one per CPU) and how many requests may wait for one
+    PASSWORD_HASH_WORKERS: int = _env_int("PASSWORD_HASH_WORKERS", 0) or 0
+    PASSWORD_HASH_MAX_QUEUE: int = _env_int("PASSWORD_HASH_MAX_QUEUE", 64) or 0
 
     MAX_FILE_SIZE_MB: int = _env_int("MAX_FILE_SIZE_MB", 10) or 10
     MAX_FILE_SIZE_BYTES: int = MAX_FILE_SIZE_MB * 1024 * 1024
@@ -57,17 +80,122 @@ class Config:
     LLM_MAX_TOKENS: int | None = _env_int("LLM_MAX_TOKENS", None)
     LLM_TEMPERATURE: float | None = _env_float("LLM_TEMPERATURE", None)
 
+    # Pool of pre-generated recipe variants kept per user (see recipe_cache.py)
+    RECIPE_CACHE_POOL_SIZE: int = _env_int("RECIPE_CACHE_POOL_SIZE", 3) or 3
+    RECIPE_CACHE_TTL_SECONDS: int = _env_int("RECIPE_CACHE_TTL_SECONDS", 6 * 60 * 60) or 6 * 60 * 60
+
+    # Background recipe pre-generation after pantry changes (see recipe_scheduler.py)
+    RECIPE_PREGEN_ENABLED: bool = _env_str("RECIPE_PREGEN_ENABLED", "true").lower() in ("1", "true", "yes")
+    RECIPE_PREGEN_DEBOUNCE_SECONDS: int = _env_int("RECIPE_PREGEN_DEBOUNCE_SECONDS", 30) or 30
+    RECIPE_PREGEN_COUNT: int = _env_int("RECIPE_PREGEN_COUNT", 3) or 3
+
+    # Global LLM limits shared by all model calls; budget 0 means unlimited.
+    # The reserve is how many slots background work may never take (see llm_limits.py)
+    LLM_MAX_CONCURRENCY: int = _env_int("LLM_MAX_CONCURRENCY", 4) or 4
+    LLM_HOURLY_BUDGET: int = _env_int("LLM_HOURLY_BUDGET", 500) or 0
+    LLM_INTERACTIVE_RESERVE: int = _env_int("LLM_INTERACTIVE_RESERVE", 1) or 0
+
+    # Resilience for every model call (see llm_resilience.py)
+    LLM_DEADLINE_SECONDS: float = _env_float("LLM_DEADLINE_SECONDS", 20.0) or 20.0
+    LLM_MAX_RETRIES: int = _env_int("LLM_MAX_RETRIES", 2) or 0
+    LLM_BACKOFF_BASE_SECONDS: float = _env_float("LLM_BACKOFF_BASE_SECONDS", 0.5) or 0.5
+    LLM_BACKOFF_MAX_SECONDS: float = _env_float("LLM_BACKOFF_MAX_SECONDS", 4.0) or 4.0
+    LLM_BREAKER_FAILURE_RATE: float = _env_float("LLM_BREAKER_FAILURE_RATE", 0.5) or 0.5
+    LLM_BREAKER_MIN_CALLS: int = _env_int("LLM_BREAKER_MIN_CALLS", 5) or 5
+    LLM_BREAKER_WINDOW_SECONDS: int = _env_int("LLM_BREAKER_WINDOW_SECONDS", 60) or 60
+    LLM_BREAKER_OPEN_SECONDS: int = _env_int("LLM_BREAKER_OPEN_SECONDS", 30) or 30
+
+    # LLM providers in order of preference: gemini, anthropic, stub (see llm_providers.py)
+    LLM_PROVIDERS: list[str] = [
+        p.strip().lower() for p in _env_str("LLM_PROVIDERS", "gemini").split(",") if p.strip()
+    ]
+    ANTHROPIC_API_KEY: str = _env_str("ANTHROPIC_API_KEY", "")
+    ANTHROPIC_MODEL: str = _env_str("ANTHROPIC_MODEL", "claude-3-5-haiku-latest")
+    # Fire the same prompt at the next provider if the first hasn't answered by then; 0 disables
+    LLM_HEDGE_AFTER_MS: int = _env_int("LLM_HEDGE_AFTER_MS", 0) or 0
+    # Stub provider behaviour for offline runs: median latency, log-normal spread, failure rate
+    LLM_STUB_LATENCY_MS: int = _env_int("LLM_STUB_LATENCY_MS", 0) or 0
+    LLM_STUB_LATENCY_SIGMA: float = _env_float("LLM_STUB_LATENCY_SIGMA", 0.0) or 0.0
+    LLM_STUB_ERROR_RATE: float = _env_float("LLM_STUB_ERROR_RATE", 0.0) or 0.0
+    LLM_STUB_SEED: int = _env_int("LLM_STUB_SEED", 0) or 0
+
+    # Expiry digests written by the in-process sweeper (see expiry_sweeper.py)
+    EXPIRY_SWEEP_ENABLED: bool = _env_str("EXPIRY_SWEEP_ENABLED", "true").lower() in ("1", "true", "yes")
+    EXPIRY_SWEEP_INTERVAL_SECONDS: int = _env_int("EXPIRY_SWEEP_INTERVAL_SECONDS", 15 * 60) or 15 * 60
+    EXPIRY_SWEEP_SHARDS: int = _env_int("EXPIRY_SWEEP_SHARDS", 8) or 8
+    EXPIRY_SWEEP_BATCH_SIZE: int = _env_int("EXPIRY_SWEEP_BATCH_SIZE", 500) or 500
+    EXPIRY_DIGEST_LEAD_DAYS: int = _env_int("EXPIRY_DIGEST_LEAD_DAYS", 3) or 3
+    EXPIRY_DIGEST_LOOKBACK_DAYS: int = _env_int("EXPIRY_DIGEST_LOOKBACK_DAYS", 3) or 3
+
+    # Full-text search (see search.py): mongo ($text indexes) | local (in-process inverted index)
+    SEARCH_BACKEND: str = _env_str("SEARCH_BACKEND", "mongo").lower()
+    SEARCH_LOCAL_MAX_USERS: int = _env_int("SEARCH_LOCAL_MAX_USERS", 256) or 256
+
+    # Grocery name autocomplete (see grocery_catalog.py)
+    SUGGEST_REFRESH_SECONDS: int = _env_int("SUGGEST_REFRESH_SECONDS", 60) or 60
+    SUGGEST_REBUILD_SECONDS: int = _env_int("SUGGEST_REBUILD_SECONDS", 60 * 60) or 60 * 60
+    # Users who must have a name before it is suggested to everyone (seed names always are)
+    SUGGEST_MIN_USERS: int = _env_int("SUGGEST_MIN_USERS", 3) or 3
+
+    # Per-user token buckets per endpoint class (see admission.py); backend: memory | mongo
+    RATE_LIMIT_ENABLED: bool = _env_str("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+    RATE_LIMIT_BACKEND: str = _env_str("RATE_LIMIT_BACKEND", "memory").lower()
+    RATE_LIMIT_OCR_PER_MINUTE: float = _env_float("RATE_LIMIT_OCR_PER_MINUTE", 6.0) or 6.0
+    RATE_LIMIT_OCR_BURST: int = _env_int("RATE_LIMIT_OCR_BURST", 3) or 3
+    RATE_LIMIT_LLM_PER_MINUTE: float = _env_float("RATE_LIMIT_LLM_PER_MINUTE", 12.0) or 12.0
+    RATE_LIMIT_LLM_BURST: int = _env_int("RATE_LIMIT_LLM_BURST", 4) or 4
+    RATE_LIMIT_CRUD_PER_MINUTE: float = _env_float("RATE_LIMIT_CRUD_PER_MINUTE", 240.0) or 240.0
+    RATE_LIMIT_CRUD_BURST: int = _env_int("RATE_LIMIT_CRUD_BURST", 60) or 60
+
+    # Global ceilings on concurrent expensive requests, across all users. The LLM
+    # request ceiling is derived from LLM_MAX_CONCURRENCY: two requests per model-call slot
+    OCR_MAX_CONCURRENCY: int = _env_int("OCR_MAX_CONCURRENCY", os.cpu_count() or 2) or 2
+    LLM_MAX_INFLIGHT_REQUESTS: int = 2 * LLM_MAX_CONCURRENCY
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = _env_float("ADMISSION_QUEUE_TIMEOUT_SECONDS", 5.0) or 5.0
+
+    # Content-addressed receipt image store (see image_store.py); 0 days for
+    # originals drops them at the first compactor pass after they are an hour
+    # old (image_store.MIN_ORIGINAL_AGE_SECONDS), 0 for compact keeps them forever
+    RECEIPT_WEBP_QUALITY: int = _env_int("RECEIPT_WEBP_QUALITY", 60) or 60
+    RECEIPT_THUMBNAIL_PX: int = _env_int("RECEIPT_THUMBNAIL_PX", 320) or 320
+    RECEIPT_ORIGINAL_RETENTION_DAYS: int = _env_int("RECEIPT_ORIGINAL_RETENTION_DAYS", 7) or 0
+    RECEIPT_COMPACT_RETENTION_DAYS: int = _env_int("RECEIPT_COMPACT_RETENTION_DAYS", 0) or 0
+    RECEIPT_COMPACTOR_ENABLED: bool = _env_str("RECEIPT_COMPACTOR_ENABLED", "true").lower() in ("1", "true", "yes")
+    RECEIPT_COMPACTOR_INTERVAL_SECONDS: int = _env_int("RECEIPT_COMPACTOR_INTERVAL_SECONDS", 60 * 60) or 60 * 60
+
+    # Prometheus metrics at /metrics (see metrics.py)
+    METRICS_ENABLED: bool = _env_str("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+    # Users (by email) allowed to use admin endpoints such as /api/admin/profiles
+    ADMIN_EMAILS: set[str] = {
+        e.strip().lower() for e in _env_str("ADMIN_EMAILS", "").split(",") if e.strip()
+    }
+
+    # Opt-in request profiling (see profiling.py); sample-every 0 profiles only on request
+    PROFILING_ENABLED: bool = _env_str("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+    PROFILE_SAMPLE_EVERY_N: int = _env_int("PROFILE_SAMPLE_EVERY_N", 0) or 0
+    PROFILE_INTERVAL_MS: float = _env_float("PROFILE_INTERVAL_MS", 5.0) or 5.0
+    PROFILE_MAX_FILES: int = _env_int("PROFILE_MAX_FILES", 50) or 50
+    PROFILE_DIR: Path = Path(_env_str("PROFILE_DIR", "") or Path(__file__).parent / "profiles")
+
+    # gzip / brotli response compression (see compression.py)
+    COMPRESSION_MINIMUM_SIZE: int = _env_int("COMPRESSION_MINIMUM_SIZE", 1024) or 1024
+    COMPRESSION_GZIP_LEVEL: int = _env_int("COMPRESSION_GZIP_LEVEL", 6) or 6
+    COMPRESSION_BROTLI_QUALITY: int = _env_int("COMPRESSION_BROTLI_QUALITY", 4) or 4
+
     @classmethod
     def validate(cls) -> list[str]:
         errors = []
 
-        if not (cls.GEMINI_API_KEY):
+        if "gemini" in cls.LLM_PROVIDERS and not (cls.GEMINI_API_KEY):
             errors.append("GEMINI_API_KEY is not set in environment variables (.env)")
+        if "anthropic" in cls.LLM_PROVIDERS and not (cls.ANTHROPIC_API_KEY):
+            errors.append("ANTHROPIC_API_KEY is not set in environment variables (.env)")
         if not (cls.SECRET_KEY):
             errors.append("SECRET_KEY is not set in environment variables (.env)")
         if not (cls.MONGO_URI):
             errors.append("MONGO_URI is not set in environment variables (.env)")
-        if not cls.LLM_MODEL:
+        if "gemini" in cls.LLM_PROVIDERS and not cls.LLM_MODEL:
             errors.append("LLM_MODEL is not set in environment variables (.env)")
 
         if cls.LLM_MAX_TOKENS is None:
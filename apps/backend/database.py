@@ -1,32 +1,256 @@
-from pymongo import MongoClient
-from config import config
+"""Mongo client and collection accessors.
+
+The client is created by `connect()`, which the app calls at startup, not at
+import time, so importing the app (workers booting, test collection, scripts)
+doesn't build a client or resolve TLS settings. Accessors connect on first
+use when nothing called `connect()` first, so scripts keep working as before.
+
+Pool size, timeouts, retryable reads/writes and wire compression come from
+the MONGO_* settings in config.py. `pool_monitor` listens to the driver's
+connection pool events; its stats are reported by /health and /metrics.
+"""
+
+import importlib.util
+import threading
 import warnings
-try:
-    import certifi
-    _TLS_KW = {"tls": True, "tlsCAFile": certifi.where()}
-except Exception:
-    certifi = None
-    _TLS_KW = {}
-
-try:
-    client = MongoClient(config.MONGO_URI, **_TLS_KW)
-except Exception as e:
-    # Fall back without explicit CA file; log a warning so issues aren't silent
-    warnings.warn(f"MongoClient init with TLS bundle failed: {e}; retrying without explicit CA file")
-    client = MongoClient(config.MONGO_URI)
-db = client.get_database(config.MONGO_DB_NAME)
+from typing import Any, Optional
+
+from pymongo import ASCENDING, DESCENDING, TEXT, MongoClient, monitoring
+from pymongo.database import Database
+
+from config import config
+
+# Compressor name -> Python package the driver needs for it (zlib is built in)
+_COMPRESSOR_PACKAGES = {"zstd": "zstandard", "snappy": "snappy", "zlib": None}
+
+
+def available_compressors(preferred: list[str]) -> list[str]:
+    """`preferred`, minus compressors whose package isn't installed; the server picks the first it supports."""
+    out = []
+    for name in preferred:
+        if name not in _COMPRESSOR_PACKAGES:
+            warnings.warn(f"Unknown Mongo compressor '{name}' ignored")
+            continue
+        package = _COMPRESSOR_PACKAGES[name]
+        if package is None or importlib.util.find_spec(package) is not None:
+            out.append(name)
+    return out
+
+
+def client_options() -> dict[str, Any]:
+    options: dict[str, Any] = {
+        "maxPoolSize": config.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": config.MONGO_MIN_POOL_SIZE,
+        "serverSelectionTimeoutMS": config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": config.MONGO_CONNECT_TIMEOUT_MS,
+        "retryWrites": config.MONGO_RETRY_WRITES,
+        "retryReads": config.MONGO_RETRY_READS,
+        "event_listeners": [pool_monitor],
+    }
+    # 0 means "no limit", which the driver spells as None
+    options["maxIdleTimeMS"] = config.MONGO_MAX_IDLE_TIME_MS or None
+    options["waitQueueTimeoutMS"] = config.MONGO_WAIT_QUEUE_TIMEOUT_MS or None
+    options["socketTimeoutMS"] = config.MONGO_SOCKET_TIMEOUT_MS or None
+    compressors = available_compressors(config.MONGO_COMPRESSORS)
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    return options
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Connection pool counters across all servers, fed by driver events."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.open = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.checkouts = 0
+        self.checkout_failures: dict[str, int] = {}
+        self.pool_clears = 0
+        self.max_checkout_wait_ms = 0.0
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "open": self.open,
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+                "checkouts": self.checkouts,
+                "checkout_failures": dict(self.checkout_failures),
+                "pool_clears": self.pool_clears,
+                "max_checkout_wait_ms": round(self.max_checkout_wait_ms, 1),
+            }
+
+    def connection_created(self, event: Any) -> None:
+        with self._lock:
+            self.open += 1
+
+    def connection_closed(self, event: Any) -> None:
+        with self._lock:
+            self.open -= 1
+
+    def connection_check_out_started(self, event: Any) -> None:
+        with self._lock:
+            self.waiting += 1
+
+    def connection_checked_out(self, event: Any) -> None:
+        with self._lock:
+            self.waiting -= 1
+            self.in_use += 1
+            self.checkouts += 1
+            self._record_wait(event)
+
+    def connection_check_out_failed(self, event: Any) -> None:
+        with self._lock:
+            self.waiting -= 1
+            reason = str(event.reason)
+            self.checkout_failures[reason] = self.checkout_failures.get(reason, 0) + 1
+            self._record_wait(event)
+
+    def connection_checked_in(self, event: Any) -> None:
+        with self._lock:
+            self.in_use -= 1
+
+    def pool_cleared(self, event: Any) -> None:
+        with self._lock:
+            self.pool_clears += 1
+
+    def _record_wait(self, event: Any) -> None:
+        duration = getattr(event, "duration", None)
+        if duration is None:
+            return
+        self.max_checkout_wait_ms = max(self.max_checkout_wait_ms, duration * 1000)
+        from metrics import mongo_checkout_wait
+        mongo_checkout_wait.observe(duration)
+
+    # The listener interface requires these; nothing to count
+    def pool_created(self, event: Any) -> None:
+        pass
+
+    def pool_ready(self, event: Any) -> None:
+        pass
+
+    def pool_closed(self, event: Any) -> None:
+        pass
+
+    def connection_ready(self, event: Any) -> None:
+        pass
+
+
+pool_monitor = PoolMonitor()
+
+client: Optional[MongoClient] = None
+db: Optional[Database] = None
+_connect_lock = threading.Lock()
+
+
+def connect() -> Database:
+    """Create the client (once) and return the app database."""
+    global client, db
+    with _connect_lock:
+        if db is not None:
+            return db
+        try:
+            import certifi
+            tls_kw = {"tls": True, "tlsCAFile": certifi.where()}
+        except Exception:
+            tls_kw = {}
+        options = client_options()
+        try:
+            client = MongoClient(config.MONGO_URI, **tls_kw, **options)
+        except Exception as e:
+            # Fall back without explicit CA file; log a warning so issues aren't silent
+            warnings.warn(f"MongoClient init with TLS bundle failed: {e}; retrying without explicit CA file")
+            client = MongoClient(config.MONGO_URI, **options)
+        db = client.get_database(config.MONGO_DB_NAME)
+        return db
+
+
+def close() -> None:
+    global client, db
+    with _connect_lock:
+        if client is not None:
+            client.close()
+        client, db = None, None
 
-def get_user_collection():
-    return db.get_collection("users")
 
 def get_db():
-    return db
+    return db if db is not None else connect()
+
+def get_user_collection():
+    return get_db().get_collection("users")
 
 def get_receipts_collection():
-    return db.get_collection("receipts")
+    return get_db().get_collection("receipts")
 
 def get_groceries_collection():
-    return db.get_collection("groceries")
+    return get_db().get_collection("groceries")
 
 def get_recipes_collection():
-    return db.get_collection("recipes")
+    return get_db().get_collection("recipes")
+
+def get_expiry_digests_collection():
+    return get_db().get_collection("expiry_digests")
+
+def get_rate_limits_collection():
+    return get_db().get_collection("rate_limits")
+
+def get_sweeper_leases_collection():
+    return get_db().get_collection("sweeper_leases")
+
+def get_refresh_tokens_collection():
+    return get_db().get_collection("refresh_tokens")
+
+def get_pantry_versions_collection():
+    return get_db().get_collection("pantry_versions")
+
+def get_purchases_collection():
+    return get_db().get_collection("grocery_purchases")
+
+
+def ensure_indexes() -> None:
+    """Create the indexes our queries rely on. Safe to call on every startup."""
+    recipes = get_recipes_collection()
+    recipes.create_index(
+        [("user_id", ASCENDING), ("pregenerated", ASCENDING), ("ingredient_key", ASCENDING)]
+    )
+    # Multikey: inverted index from normalized ingredient to the user's recipes
+    recipes.create_index([("user_id", ASCENDING), ("ingredient_keys", ASCENDING)])
+
+    groceries = get_groceries_collection()
+    # One document per canonical name per user; docs not yet migrated
+    # (scripts/migrate_grocery_name_keys.py) have no name_key and are excluded.
+    groceries.create_index(
+        [("user_id", ASCENDING), ("name_key", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"name_key": {"$exists": True}},
+    )
+    groceries.create_index([("user_id", ASCENDING), ("expires_earliest_at", ASCENDING)])
+    # Date-range $match for the analytics pipelines
+    groceries.create_index([("user_id", ASCENDING), ("created_at", ASCENDING)])
+    get_receipts_collection().create_index([("user_id", ASCENDING), ("created_at", ASCENDING)])
+    get_receipts_collection().create_index([("user_id", ASCENDING), ("image_sha256", ASCENDING)])
+    # Purchase log (purchases.py): date-range analytics, and the backfill's already-logged check
+    get_purchases_collection().create_index([("user_id", ASCENDING), ("created_at", ASCENDING)])
+    get_purchases_collection().create_index("grocery_id")
+    # Full-text search (search.py); the user_id prefix scopes every $text query to one user
+    groceries.create_index([("user_id", ASCENDING), ("name", TEXT)], name="user_name_text")
+    get_receipts_collection().create_index([("user_id", ASCENDING), ("raw_text", TEXT)], name="user_raw_text_text")
+    # Cross-user range scans by the expiry sweeper, keyset-paginated on _id
+    groceries.create_index([("expires_earliest_at", ASCENDING), ("_id", ASCENDING)])
+
+    digests = get_expiry_digests_collection()
+    digests.create_index([("user_id", ASCENDING), ("date", DESCENDING)])
+    # Keyset pages of one day's digests for the sweeper's prune
+    digests.create_index([("date", ASCENDING), ("_id", ASCENDING)])
+    digests.create_index("generated_at", expireAfterSeconds=14 * 24 * 60 * 60)
+    get_sweeper_leases_collection().create_index("expires_at", expireAfterSeconds=0)
+    # Idle token buckets (admission.py, RATE_LIMIT_BACKEND=mongo) are full again by expires_at
+    get_rate_limits_collection().create_index("expires_at", expireAfterSeconds=0)
+
+    refresh_tokens = get_refresh_tokens_collection()
+    # Every refresh and revocation check is one lookup on this index
+    refresh_tokens.create_index("token_hash", unique=True)
+    refresh_tokens.create_index("family_id")
+    refresh_tokens.create_index("expires_at", expireAfterSeconds=0)
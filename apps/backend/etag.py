@@ -0,0 +1,38 @@
+"""Conditional GET support for per-user list endpoints.
+
+The ETag is derived from the user's version of the listed collection (see
+pantry_events.py), not from the response body, so a matching If-None-Match is
+answered with 304 after a single primary-key read of `pantry_versions`,
+without touching the data collections. The user id and the collection are
+part of the tag so a shared client cache can't serve one account's list to
+another, and one list's tag never validates another list.
+"""
+
+from typing import Optional
+
+from fastapi import Request, Response
+
+from pantry_events import current_version
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    tags = [t.strip() for t in if_none_match.split(",")]
+    # Weak comparison: intermediaries may add a W/ prefix
+    return any(t.removeprefix("W/") == etag for t in tags)
+
+
+def check_not_modified(request: Request, response: Response, user_id: str, kind: str) -> Optional[Response]:
+    """Return a 304 response if the client's copy is current, else set the ETag and return None.
+
+    Must be called before reading the data so the tag can never be newer than
+    the body it is attached to.
+    """
+    etag = f'"{user_id}-{kind}-{current_version(user_id, kind)}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
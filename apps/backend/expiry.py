@@ -0,0 +1,58 @@
+"""Absolute expiry timestamps for groceries.
+
+Groceries carry `min_days`/`max_days` relative to `created_at`. To make
+"what expires this week" a single indexed range query we also persist
+`expires_earliest_at` / `expires_latest_at` when a grocery is first written.
+Shelf-stable items (no min/max days) store None for both. With only one of
+the two, both fields take that bound, so the item still shows as expiring.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from pymongo import UpdateOne
+
+
+def expiry_fields(created_at: datetime, min_days: Optional[int], max_days: Optional[int]) -> dict[str, Optional[datetime]]:
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    earliest = created_at + timedelta(days=int(min_days)) if min_days is not None else None
+    latest = created_at + timedelta(days=int(max_days)) if max_days is not None else earliest
+    if earliest is None:
+        earliest = latest
+    return {"expires_earliest_at": earliest, "expires_latest_at": latest}
+
+
+def backfill_expiry_fields(col: Any, batch_size: int = 500, dry_run: bool = False) -> int:
+    """Set expiry fields on grocery docs written before they existed, or with
+    only `max_days` when that left `expires_earliest_at` empty.
+
+    Processes docs in `_id` order, `batch_size` at a time, with one bulk_write
+    per batch. Returns the number of docs updated (or that would be).
+    """
+    updated = 0
+    last_id = None
+    while True:
+        query: dict[str, Any] = {"$or": [
+            {"expires_earliest_at": {"$exists": False}},
+            {"expires_earliest_at": None, "max_days": {"$ne": None}},
+        ]}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = list(
+            col.find(query, {"created_at": 1, "min_days": 1, "max_days": 1})
+            .sort("_id", 1)
+            .limit(batch_size)
+        )
+        if not batch:
+            return updated
+        last_id = batch[-1]["_id"]
+
+        ops = []
+        for doc in batch:
+            created_at = doc.get("created_at") or doc["_id"].generation_time
+            fields = expiry_fields(created_at, doc.get("min_days"), doc.get("max_days"))
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": fields}))
+        if not dry_run:
+            col.bulk_write(ops, ordered=False)
+        updated += len(ops)
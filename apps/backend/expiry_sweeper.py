@@ -0,0 +1,221 @@
+"""Periodic sweep that turns expiry dates into per-user digests.
+
+Every `interval_seconds` the sweeper looks for groceries whose
+`expires_earliest_at` falls in [now - lookback, now + lead) and upserts one
+digest document per user per day into `expiry_digests`. The frontend reads the
+latest digest with a single indexed `find_one`.
+
+The sweep window is split into `shards` equal time slices. Each slice of each
+tick is claimed by inserting a lease document with a deterministic `_id`, so
+when several backend workers run the sweeper each slice is processed once and
+the work spreads across workers. Within a slice, groceries are read in
+keyset-paginated batches ordered by (expires_earliest_at, _id).
+
+A slice only sees the groceries in it now, so it can only add or refresh
+digest items. Every item records when it was last swept (`swept_at`); once per
+tick one worker also prunes items of today's digests that no sweep has seen for
+two intervals, i.e. groceries that were consumed, deleted or left the window,
+paging through today's digests on the (date, _id) index.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import socket
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from config import config
+from database import (
+    get_expiry_digests_collection,
+    get_groceries_collection,
+    get_sweeper_leases_collection,
+)
+
+
+_PROJECTION = {"user_id": 1, "name": 1, "count": 1, "expires_earliest_at": 1, "expires_latest_at": 1}
+
+
+def _aware(dt: datetime) -> datetime:
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
+
+
+class ExpirySweeper:
+    def __init__(
+        self,
+        interval_seconds: int,
+        lead_days: int,
+        lookback_days: int,
+        shards: int,
+        batch_size: int,
+    ):
+        self.interval_seconds = max(1, interval_seconds)
+        self.lead_days = lead_days
+        self.lookback_days = lookback_days
+        self.shards = max(1, shards)
+        self.batch_size = max(1, batch_size)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="expiry-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _loop(self) -> None:
+        # Small random delay so workers booted together don't race for every shard.
+        while not self._stop.wait(random.uniform(1, 5)):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Warning: expiry sweep failed: {e}")
+            if self._stop.wait(self.interval_seconds):
+                return
+
+    def run_once(self, now: Optional[datetime] = None) -> int:
+        """Sweep every shard of the current tick this worker can claim; returns groceries processed."""
+        now = _aware(now or datetime.now(timezone.utc))
+        tick = int(now.timestamp()) // self.interval_seconds
+        start = now - timedelta(days=self.lookback_days)
+        width = (timedelta(days=self.lookback_days + self.lead_days)) / self.shards
+
+        processed = 0
+        offset = random.randrange(self.shards)
+        for i in range(self.shards):
+            shard = (offset + i) % self.shards
+            if not self._claim(tick, shard, now):
+                continue
+            lo = start + width * shard
+            hi = start + width * (shard + 1)
+            processed += self._sweep_slice(lo, hi, now)
+        if self._claim(tick, "prune", now):
+            self._prune(now)
+        return processed
+
+    def _claim(self, tick: int, shard: Any, now: datetime) -> bool:
+        try:
+            get_sweeper_leases_collection().insert_one({
+                "_id": f"expiry:{tick}:{shard}",
+                "owner": self.owner,
+                "expires_at": now + timedelta(seconds=self.interval_seconds * 2),
+            })
+            return True
+        except DuplicateKeyError:
+            return False
+
+    def _sweep_slice(self, lo: datetime, hi: datetime, now: datetime) -> int:
+        col = get_groceries_collection()
+        window = {"expires_earliest_at": {"$gte": lo, "$lt": hi}}
+        processed = 0
+        last: Optional[tuple[datetime, Any]] = None
+        while True:
+            query: dict[str, Any] = window
+            if last is not None:
+                query = {"$and": [window, {"$or": [
+                    {"expires_earliest_at": {"$gt": last[0]}},
+                    {"expires_earliest_at": last[0], "_id": {"$gt": last[1]}},
+                ]}]}
+            batch = list(
+                col.find(query, _PROJECTION)
+                .sort([("expires_earliest_at", 1), ("_id", 1)])
+                .limit(self.batch_size)
+            )
+            if not batch:
+                return processed
+            self._write_digests(batch, now)
+            processed += len(batch)
+            last = (batch[-1]["expires_earliest_at"], batch[-1]["_id"])
+
+    def _write_digests(self, batch: list[dict[str, Any]], now: datetime) -> None:
+        day = now.strftime("%Y-%m-%d")
+        by_user: dict[str, dict[str, Any]] = {}
+        for doc in batch:
+            latest = doc.get("expires_latest_at") or doc["expires_earliest_at"]
+            user_items = by_user.setdefault(str(doc["user_id"]), {})
+            user_items[f"items.{doc['_id']}"] = {
+                "grocery_id": str(doc["_id"]),
+                "name": doc.get("name", ""),
+                "count": int(doc.get("count", 1)),
+                "expires_earliest_at": doc["expires_earliest_at"],
+                "expires_latest_at": doc.get("expires_latest_at"),
+                "status": "expired" if _aware(latest) < now else "expiring",
+                "swept_at": now,
+            }
+
+        ops = [
+            UpdateOne(
+                {"_id": f"{user_id}:{day}"},
+                {
+                    "$set": {**items, "generated_at": now},
+                    "$setOnInsert": {"user_id": user_id, "date": day},
+                },
+                upsert=True,
+            )
+            for user_id, items in by_user.items()
+        ]
+        get_expiry_digests_collection().bulk_write(ops, ordered=False)
+
+    def _prune(self, now: datetime) -> int:
+        """Unset today's digest items no sweep has refreshed for two intervals; returns how many.
+
+        Today's digests are read in `_id` order, `batch_size` at a time, on
+        the (date, _id) index, with one bulk_write per batch.
+        """
+        col = get_expiry_digests_collection()
+        cutoff = now - timedelta(seconds=self.interval_seconds * 2)
+        day = now.strftime("%Y-%m-%d")
+        pruned = 0
+        last: Any = None
+        while True:
+            query: dict[str, Any] = {"date": day}
+            if last is not None:
+                query["_id"] = {"$gt": last}
+            batch = list(col.find(query, {"items": 1}).sort("_id", 1).limit(self.batch_size))
+            if not batch:
+                return pruned
+            ops = []
+            for doc in batch:
+                for grocery_id, item in (doc.get("items") or {}).items():
+                    swept_at = item.get("swept_at")
+                    if swept_at is None or _aware(swept_at) <= cutoff:
+                        # Conditional, so an item re-swept since the read is kept
+                        ops.append(UpdateOne(
+                            {"_id": doc["_id"], f"items.{grocery_id}.swept_at": item.get("swept_at")},
+                            {"$unset": {f"items.{grocery_id}": ""}},
+                        ))
+            if ops:
+                col.bulk_write(ops, ordered=False)
+            pruned += len(ops)
+            last = batch[-1]["_id"]
+
+
+def latest_digest(user_id: str) -> Optional[dict[str, Any]]:
+    """The user's most recent digest, items sorted most urgent first."""
+    doc = get_expiry_digests_collection().find_one({"user_id": user_id}, sort=[("date", -1)])
+    if not doc:
+        return None
+    items = sorted((doc.get("items") or {}).values(), key=lambda i: i["expires_earliest_at"])
+    return {"date": doc["date"], "generated_at": doc.get("generated_at"), "items": items}
+
+
+expiry_sweeper = ExpirySweeper(
+    interval_seconds=config.EXPIRY_SWEEP_INTERVAL_SECONDS,
+    lead_days=config.EXPIRY_DIGEST_LEAD_DAYS,
+    lookback_days=config.EXPIRY_DIGEST_LOOKBACK_DAYS,
+    shards=config.EXPIRY_SWEEP_SHARDS,
+    batch_size=config.EXPIRY_SWEEP_BATCH_SIZE,
+)
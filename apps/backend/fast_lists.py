@@ -0,0 +1,51 @@
+"""Fast path for list endpoints.
+
+Building one pydantic model per document in a Python loop and then letting
+FastAPI re-validate the whole list against `response_model` dominates CPU time
+for large pantries. Instead, list endpoints shape documents into the response
+layout inside Mongo with a `$project` stage (`_id` -> string `id`, defaults
+via `$ifNull`, internal fields such as `name_key` dropped) and serialize the
+result straight to JSON bytes with orjson, returning a ready `Response` so
+FastAPI skips its own response_model pass.
+
+The `$project` stage is therefore the response contract; tests check that its
+output matches the per-document models. `response_model` stays on the routes
+so the OpenAPI schema is unchanged.
+
+Bulk validation with a cached pydantic TypeAdapter was measured too (see
+scripts/bench_list_endpoints.py): it only halves the cost, because pydantic
+still builds and dumps one model per document.
+"""
+
+from typing import Any, Iterable
+
+from fastapi import Response
+
+from responses import dumps
+
+# Headers set by check_not_modified on the injected response are copied over;
+# FastAPI does not merge them into a Response returned by the endpoint.
+_SKIP_HEADERS = ("content-length", "content-type")
+
+
+def projection(fields: Iterable[str] = (), *, with_id: bool = True, **defaults: Any) -> dict[str, Any]:
+    """Build a `$project` stage in a response model's layout.
+
+    `fields` are copied as-is (required model fields). Each keyword becomes
+    the field's value when it is missing or null in the document, mirroring
+    the model's default, so the output has exactly the keys the model would
+    serialize. With `with_id`, `_id` is returned as a string `id`.
+    """
+    stage: dict[str, Any] = {"_id": 0}
+    if with_id:
+        stage["id"] = {"$toString": "$_id"}
+    stage.update({f: 1 for f in fields})
+    stage.update({f: {"$ifNull": [f"${f}", value]} for f, value in defaults.items()})
+    return {"$project": stage}
+
+
+def list_response(docs: Iterable[dict[str, Any]], response: Response) -> Response:
+    """Return shaped documents as a pre-serialized JSON response."""
+    body = dumps(list(docs))
+    headers = {k: v for k, v in response.headers.items() if k not in _SKIP_HEADERS}
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -3,36 +3,50 @@
 Each grocery item doc (in `groceries` collection) has:
   user_id: ObjectId of owning user
   name: string
-  perish_min_days: int | null (minimum days before perishing)
-  perish_max_days: int | null (maximum days before perishing)
+  min_days: int | null (minimum days before perishing)
+  max_days: int | null (maximum days before perishing)
   created_at: datetime (UTC)
+  expires_earliest_at / expires_latest_at: datetime | null (created_at + min/max days)
+  count: int
 
-The perishing range lets clients calculate estimated expiration windows.
+The perishing range lets clients calculate estimated expiration windows; the
+absolute expiry fields make "what expires soon" an indexed range query.
 """
 
-from datetime import datetime, timezone
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from typing import Any, Literal, Optional
+import json
 import random
+import re
 from math import ceil
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from pydantic import BaseModel, Field, validator
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
 
+from admission import llm_ceiling, rate_limit
 from auth import get_current_user, User
 from database import get_groceries_collection, get_user_collection, get_recipes_collection
 from config import config
+from expiry import expiry_fields
+from etag import check_not_modified
+from fast_lists import list_response, projection
+from grocery_catalog import grocery_catalog
+from expiry_sweeper import latest_digest
+from names import normalize_name
+from llm_limits import llm_limiter
+from llm_providers import llm_router
+from pantry_events import pantry_changed
+from purchases import purchase_event, record_purchases
+from recipe_cache import recipe_cache, ingredient_key
+from recipe_scheduler import take_pregenerated
 
-try:
-    import google.generativeai as genai
-except Exception:
-    genai = None
+router = APIRouter(prefix="/api/groceries", tags=["groceries"], dependencies=[Depends(rate_limit("crud"))])
 
 
-router = APIRouter(prefix="/api/groceries", tags=["groceries"])
-
-
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 
 class GroceryCreate(BaseModel):
     name: str = Field(..., min_length=1, description="Name of the grocery item")
@@ -54,6 +68,8 @@ class GroceryItem(BaseModel):
     max_days: Optional[int]
     created_at: datetime
     count: int = Field(default=1, ge=1)
+    expires_earliest_at: Optional[datetime] = None
+    expires_latest_at: Optional[datetime] = None
 
 
 class Recipe(BaseModel):
@@ -70,150 +86,257 @@ def _object_id(user: User) -> ObjectId:
         raise HTTPException(status_code=400, detail="Invalid user id")
 
 
+def _grocery_item(doc: dict[str, Any]) -> GroceryItem:
+    return GroceryItem(
+        id=str(doc.get("_id")),
+        name=doc.get("name", ""),
+        min_days=doc.get("min_days"),
+        max_days=doc.get("max_days"),
+        created_at=doc.get("created_at", datetime.now(timezone.utc)),
+        count=int(doc.get("count", 1)),
+        expires_earliest_at=doc.get("expires_earliest_at"),
+        expires_latest_at=doc.get("expires_latest_at"),
+    )
+
+
 @router.get("/", response_model=list[GroceryItem])
-def list_groceries(current_user: User = Depends(get_current_user)):
+def list_groceries(request: Request, response: Response, current_user: User = Depends(get_current_user)):
     col = get_groceries_collection()
-    cursor = col.find({"user_id": _object_id(current_user)})
-    items: list[GroceryItem] = []
-    for doc in cursor:
-        items.append(GroceryItem(
-            id=str(doc.get("_id")),
-            name=doc.get("name", ""),
-            min_days=doc.get("min_days"),
-            max_days=doc.get("max_days"),
-            created_at=doc.get("created_at", datetime.now(timezone.utc)),
-            count=int(doc.get("count", 1)),
-        ))
-    return items
-
-
-
-@router.get("/recipe", response_model=Recipe)
+    not_modified = check_not_modified(request, response, current_user.id, "groceries")
+    if not_modified is not None:
+        return not_modified
+    cursor = col.aggregate([
+        {"$match": {"user_id": _object_id(current_user)}},
+        projection(
+            ("name",),
+            created_at=datetime.now(timezone.utc),
+            count=1,
+            min_days=None,
+            max_days=None,
+            expires_earliest_at=None,
+            expires_latest_at=None,
+        ),
+    ])
+    return list_response(cursor, response)
+
+
+@router.get("/expiring", response_model=list[GroceryItem])
+def list_expiring_groceries(
+    within_days: int = Query(7, ge=0, le=3650),
+    current_user: User = Depends(get_current_user),
+):
+    """Groceries that may expire within `within_days` (including already expired), most urgent first."""
+    col = get_groceries_collection()
+    cutoff = datetime.now(timezone.utc) + timedelta(days=within_days)
+    cursor = col.find({
+        "user_id": _object_id(current_user),
+        "expires_earliest_at": {"$ne": None, "$lte": cutoff},
+    }).sort([("expires_earliest_at", 1), ("expires_latest_at", 1)])
+    return [_grocery_item(doc) for doc in cursor]
+
+
+class DigestItem(BaseModel):
+    grocery_id: str
+    name: str
+    count: int = 1
+    expires_earliest_at: datetime
+    expires_latest_at: Optional[datetime] = None
+    status: str = Field(..., description="expiring | expired")
+
+
+class ExpiryDigest(BaseModel):
+    date: str
+    generated_at: Optional[datetime] = None
+    items: list[DigestItem] = Field(default_factory=list)
+
+
+@router.get("/digest", response_model=ExpiryDigest)
+def get_expiry_digest(current_user: User = Depends(get_current_user)):
+    """Latest expiry digest written by the background sweeper (one indexed read)."""
+    digest = latest_digest(str(current_user.id))
+    if digest is None:
+        raise HTTPException(status_code=404, detail="No digest available yet")
+    return digest
+
+
+class GrocerySuggestion(BaseModel):
+    name: str
+    popularity: int
+
+
+@router.get("/suggest", response_model=list[GrocerySuggestion])
+def suggest_groceries(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(8, ge=1, le=20),
+    current_user: User = Depends(get_current_user),
+):
+    """Grocery names starting with `q` (or with a word starting with it), most common first."""
+    return [GrocerySuggestion(name=name, popularity=n) for name, n in grocery_catalog.suggest(q, limit)]
+
+
+@router.get("/recipe", response_model=Recipe, dependencies=[Depends(rate_limit("llm"))])
 def generate_recipe(current_user: User = Depends(get_current_user)):
+    ingredients = _pantry_ingredients(_object_id(current_user))
+    if not ingredients:
+        raise HTTPException(status_code=400, detail="No groceries found for user")
+
+    user_id = str(current_user.id)
+    key = ingredient_key(ingredients)
+    # Memory pool first, then recipes pre-generated in the background, then the model.
+    recipe = recipe_cache.take(user_id, key)
+    if recipe is None:
+        recipe = _stored_recipe(user_id, key)
+        if recipe is None:
+            with llm_ceiling.slot():
+                recipe = _generate_recipe(ingredients, _previous_recipe_titles(user_id))
+        if recipe is None:
+            raise HTTPException(status_code=503, detail="Recipe generation is unavailable, please try again")
+        recipe_cache.mark_served(user_id, key, recipe)
+
+    def refill(seen: list[str]) -> Optional[Recipe]:
+        stored = _stored_recipe(user_id, key)
+        if stored is not None or not llm_limiter.budget_available():
+            return stored
+        with llm_limiter.background():
+            return _generate_recipe(ingredients, _previous_recipe_titles(user_id) + seen)
+
+    # Keep a few unseen variants ready so the next tap is served from memory.
+    recipe_cache.schedule_refill(user_id, key, refill)
+    return recipe
+
+
+def _stored_recipe(user_id: str, key: str) -> Optional[Recipe]:
+    doc = take_pregenerated(user_id, key)
+    if doc is None:
+        return None
+    return Recipe(
+        title=doc.get("title", "Quick Recipe"),
+        ingredients_used=doc.get("ingredients", []),
+        steps=doc.get("steps", []),
+        estimated_minutes=int(doc.get("estimated_minutes", 20)),
+    )
+
+
+def _pantry_ingredients(user_oid: ObjectId) -> list[str]:
+    """Distinct grocery names in the user's pantry (first spelling wins)."""
     col = get_groceries_collection()
-    cursor = col.find({"user_id": _object_id(current_user)})
+    cursor = col.find({"user_id": user_oid}, {"name": 1})
     names = [doc.get("name", "").strip() for doc in cursor if doc.get("name")]
     seen = set()
     ingredients = []
     for n in names:
-        key = n.lower()
+        key = normalize_name(n)
         if key and key not in seen:
             seen.add(key)
             ingredients.append(n)
+    return ingredients
 
-    if not ingredients:
-        raise HTTPException(status_code=400, detail="No groceries found for user")
-    
-    # Fetch previously generated recipes to avoid duplicates
+
+def _previous_recipe_titles(user_id: str) -> list[str]:
+    """Titles of the user's most recent AI recipes, so new ones differ."""
     recipes_col = get_recipes_collection()
     prev_recipes = list(recipes_col.find(
-        {"user_id": str(current_user.id), "source": "ai_generated"}
+        {"user_id": user_id, "source": "ai_generated"}, {"title": 1}
     ).sort("created_at", -1).limit(5))
-    previous_titles = [r.get("title", "") for r in prev_recipes if r.get("title")]
-    if config.GEMINI_API_KEY and genai is not None:
-        try:
-            genai.configure(api_key=config.GEMINI_API_KEY)
-            model = genai.GenerativeModel(config.LLM_MODEL)
-            generation_config = genai.types.GenerationConfig(
-                temperature=float(config.LLM_TEMPERATURE),
-                max_output_tokens=int(config.LLM_MAX_TOKENS),
-            )
-            parts: list[str] = []
-            parts.append("SYSTEM_ROLE:\n")
-            parts.append("You are an expert home cook and recipe developer.\n")
-            parts.append(
-                "TASK:\nGenerate a single practical recipe the user can make using ONLY the ingredients listed below. You may assume basic staples (salt, pepper, oil, water) but do not assume any other ingredients. Be concise and provide a short ingredients list (with amounts if appropriate) and clear step-by-step instructions.\n\n"
-            )
-            if previous_titles:
-                parts.append("IMPORTANT_CONSTRAINT:\n")
-                parts.append("The user has already received the following recipes. Generate something DISTINCTLY DIFFERENT in style, cuisine, or cooking method:\n")
-                for title in previous_titles:
-                    parts.append(f"- {title}\n")
-                parts.append("\n")
-            parts.append(
-                "RESPONSE_FORMAT: Return only a JSON object with the keys:\n  title: string\n  ingredients: list of objects {name: string, amount: string (optional)}\n  steps: list of strings\n  estimated_minutes: integer\nDo NOT include any extra commentary outside the JSON object.\n\n"
-            )
-            parts.append("AVAILABLE_INGREDIENTS:\n")
-            for it in ingredients:
-                parts.append(f"- {it}\n")
-            parts.append("\nJSON_OUTPUT:\n")
-            prompt = "".join(parts)
-
-            resp = model.generate_content(prompt, generation_config=generation_config)
-            resp_text = None
-            if isinstance(resp, str):
-                resp_text = resp
-            elif hasattr(resp, "text") and resp.text:
-                resp_text = resp.text
-            elif hasattr(resp, "content") and resp.content:
-                resp_text = resp.content
-            elif hasattr(resp, "candidates") and getattr(resp, "candidates"):
-                first = resp.candidates[0]
-                if isinstance(first, dict):
-                    resp_text = first.get("content") or first.get("output") or None
-                elif hasattr(first, "content"):
-                    resp_text = first.content
-
-            if resp_text:
-                import json, re
-
-                m = re.search(r"\{.*\}", resp_text, re.DOTALL)
-                if m:
-                    try:
-                        obj = json.loads(m.group(0))
-                        title = obj.get("title", "Quick Recipe")
-                        ing = obj.get("ingredients", [])
-                        steps = obj.get("steps", [])
-                        est = int(obj.get("estimated_minutes", 20))
-
-                        names_used: list[str] = []
-                        for ii in ing:
-                            if isinstance(ii, dict):
-                                n = ii.get("name") or ii.get("ingredient")
-                                if n:
-                                    names_used.append(str(n))
-                            elif isinstance(ii, str):
-                                names_used.append(ii)
-
-                        return Recipe(title=title, ingredients_used=names_used, steps=steps, estimated_minutes=est)
-                    except Exception:
-                        # If parsing fails, fall back to local generator
-                        pass
-        except Exception:
-            # Model call failed; fall back to local generator
-            pass
+    return [r.get("title", "") for r in prev_recipes if r.get("title")]
+
+
+def _build_recipe_prompt(ingredients: list[str], previous_titles: list[str]) -> str:
+    parts: list[str] = []
+    parts.append("SYSTEM_ROLE:\n")
+    parts.append("You are an expert home cook and recipe developer.\n")
+    parts.append(
+        "TASK:\nGenerate a single practical recipe the user can make using ONLY the ingredients listed below. You may assume basic staples (salt, pepper, oil, water) but do not assume any other ingredients. Be concise and provide a short ingredients list (with amounts if appropriate) and clear step-by-step instructions.\n\n"
+    )
+    if previous_titles:
+        parts.append("IMPORTANT_CONSTRAINT:\n")
+        parts.append("The user has already received the following recipes. Generate something DISTINCTLY DIFFERENT in style, cuisine, or cooking method:\n")
+        for title in previous_titles:
+            parts.append(f"- {title}\n")
+        parts.append("\n")
+    parts.append(
+        "RESPONSE_FORMAT: Return only a JSON object with the keys:\n  title: string\n  ingredients: list of objects {name: string, amount: string (optional)}\n  steps: list of strings\n  estimated_minutes: integer\nDo NOT include any extra commentary outside the JSON object.\n\n"
+    )
+    parts.append("AVAILABLE_INGREDIENTS:\n")
+    for it in ingredients:
+        parts.append(f"- {it}\n")
+    parts.append("\nJSON_OUTPUT:\n")
+    return "".join(parts)
+
+
+def _generate_recipe(ingredients: list[str], previous_titles: list[str]) -> Optional[Recipe]:
+    """Ask the model for one recipe; returns None if the model is unavailable or fails."""
+    if not llm_router.available():
+        return None
+    try:
+        resp_text = llm_router.generate(
+            _build_recipe_prompt(ingredients, previous_titles),
+            temperature=float(config.LLM_TEMPERATURE),
+            max_tokens=int(config.LLM_MAX_TOKENS),
+        )
+    except Exception as e:
+        print(f"Warning: recipe generation failed: {e}")
+        return None
+
+    if not resp_text:
+        return None
+    return _parse_recipe_response(resp_text)
+
+
+def _parse_recipe_response(resp_text: str) -> Optional[Recipe]:
+    m = re.search(r"\{.*\}", resp_text, re.DOTALL)
+    if not m:
+        return None
+    try:
+        obj = json.loads(m.group(0))
+        title = obj.get("title", "Quick Recipe")
+        ing = obj.get("ingredients", [])
+        steps = obj.get("steps", [])
+        est = int(obj.get("estimated_minutes", 20))
+
+        names_used: list[str] = []
+        for ii in ing:
+            if isinstance(ii, dict):
+                n = ii.get("name") or ii.get("ingredient")
+                if n:
+                    names_used.append(str(n))
+            elif isinstance(ii, str):
+                names_used.append(ii)
+
+        return Recipe(title=title, ingredients_used=names_used, steps=steps, estimated_minutes=est)
+    except Exception:
+        return None
 
 
 @router.post("/", response_model=GroceryItem, status_code=201)
 def add_grocery(body: GroceryCreate, current_user: User = Depends(get_current_user)):
     col = get_groceries_collection()
     user_id = _object_id(current_user)
-    # Upsert: if the user already has the same named grocery, increment its count
-    from pymongo import ReturnDocument
-
+    # Upsert: if the user already has the same grocery, increment its count
+    now = datetime.now(timezone.utc)
+    name_key = normalize_name(body.name)
+    if not name_key:
+        raise HTTPException(status_code=400, detail="Name is required")
     doc_on_insert = {
         "user_id": user_id,
         "name": body.name,
         "min_days": body.min_days,
         "max_days": body.max_days,
-        "created_at": datetime.now(timezone.utc),
+        "created_at": now,
+        **expiry_fields(now, body.min_days, body.max_days),
     }
 
+    # Keyed on name_key so "Milk", "milk " and "Milks" share one document
     updated = col.find_one_and_update(
-        {"user_id": user_id, "name": body.name},
+        {"user_id": user_id, "name_key": name_key},
         {"$inc": {"count": 1}, "$setOnInsert": doc_on_insert},
         upsert=True,
         return_document=ReturnDocument.AFTER,
     )
+    record_purchases([purchase_event(user_id, updated, 1, now)])
+    pantry_changed(current_user.id)
 
-    return GroceryItem(
-        id=str(updated.get("_id")),
-        name=updated.get("name", body.name),
-        min_days=updated.get("min_days"),
-        max_days=updated.get("max_days"),
-        created_at=updated.get("created_at", datetime.now(timezone.utc)),
-        count=updated.get("count", 1),
-    )
+    return _grocery_item(updated)
 
 
 @router.delete("/{grocery_id}", status_code=204)
@@ -243,10 +366,150 @@ def delete_grocery(
         res = col.update_one({"_id": target_oid, "user_id": user_oid}, {"$inc": {"count": -by}})
         if res.modified_count == 0:
             raise HTTPException(status_code=500, detail="Failed to decrement grocery count")
+        pantry_changed(current_user.id)
         return None
 
     # count <= 1 -> delete
     result = col.delete_one({"_id": target_oid, "user_id": user_oid})
     if result.deleted_count == 0:
         raise HTTPException(status_code=500, detail="Failed to delete grocery")
-    return None
\ No newline at end of file
+    pantry_changed(current_user.id)
+    return None
+
+class GroceryBatchOp(BaseModel):
+    """One pantry mutation. `add` needs `name`; `consume` and `delete` take `id` or `name`."""
+    op: Literal["add", "consume", "delete"]
+    id: Optional[str] = None
+    name: Optional[str] = None
+    by: int = Field(default=1, ge=1, description="How many to add or consume")
+    min_days: Optional[int] = Field(None, ge=0)
+    max_days: Optional[int] = Field(None, ge=0)
+
+    @model_validator(mode="after")
+    def validate_target(self) -> "GroceryBatchOp":
+        if self.op == "add" and not (self.name and normalize_name(self.name)):
+            raise ValueError("'add' requires a name")
+        if self.op != "add" and not self.id and not (self.name and normalize_name(self.name)):
+            raise ValueError(f"'{self.op}' requires an id or a name")
+        if self.id is not None and not ObjectId.is_valid(self.id):
+            raise ValueError("Invalid grocery id")
+        if self.max_days is not None and self.min_days is not None and self.max_days < self.min_days:
+            raise ValueError("max_days cannot be less than min_days")
+        return self
+
+
+class GroceryBatchRequest(BaseModel):
+    ops: list[GroceryBatchOp] = Field(..., min_length=1, max_length=200)
+
+
+class GroceryBatchResult(BaseModel):
+    index: int
+    op: str
+    # ok: applied, item still in the pantry; removed: count reached zero (or delete); not_found: no such item;
+    # error: the write failed; skipped: not attempted after an earlier error
+    status: Literal["ok", "removed", "not_found", "error", "skipped"]
+    id: Optional[str] = None
+    name: Optional[str] = None
+    count: int = 0
+    detail: Optional[str] = None
+
+
+_BATCH_FIELDS = {"name": 1, "name_key": 1, "count": 1}
+
+
+def _apply_batch_op(col: Any, op: GroceryBatchOp, target: dict[str, Any], now: datetime) -> Optional[dict[str, Any]]:
+    """Apply one op as atomic conditional writes; returns the item after it, with `removed` set if it is gone."""
+    if op.op == "add":
+        doc_on_insert = {
+            "user_id": target["user_id"],
+            "name": op.name,
+            "min_days": op.min_days,
+            "max_days": op.max_days,
+            "created_at": now,
+            **expiry_fields(now, op.min_days, op.max_days),
+        }
+        update = {"$inc": {"count": op.by}, "$setOnInsert": doc_on_insert}
+        try:
+            return col.find_one_and_update(
+                target, update, _BATCH_FIELDS, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # A concurrent add inserted the same name_key first; the retry matches it
+            return col.find_one_and_update(
+                target, update, _BATCH_FIELDS, upsert=True, return_document=ReturnDocument.AFTER
+            )
+    if op.op == "delete":
+        doc = col.find_one_and_delete(target, projection=_BATCH_FIELDS)
+        return {**doc, "removed": True} if doc else None
+    # consume: decrement while more than `by` are left, otherwise remove; a
+    # concurrent write can move the count between the two, so try twice
+    for _ in range(2):
+        doc = col.find_one_and_update(
+            {**target, "count": {"$gt": op.by}},
+            {"$inc": {"count": -op.by}},
+            _BATCH_FIELDS,
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc:
+            return doc
+        # Documents without a count hold one item
+        doc = col.find_one_and_delete(
+            {**target, "$or": [{"count": {"$lte": op.by}}, {"count": {"$exists": False}}]}, projection=_BATCH_FIELDS
+        )
+        if doc:
+            return {**doc, "removed": True}
+    return None
+
+
+@router.post("/batch", response_model=list[GroceryBatchResult])
+def batch_groceries(body: GroceryBatchRequest, current_user: User = Depends(get_current_user)):
+    """Apply many add/consume/delete operations in request order.
+
+    Each op is one conditional write with no read first: `add` is an upsert
+    with `$inc`, `consume` a `$inc` by -N conditioned on the count being > N,
+    else a delete conditioned on it being <= N, and `delete` a plain delete.
+    Counts never reach zero, so readers never see an emptied item, and each
+    result reports the item as that op left it. A failed write stops the
+    batch: its result is `error`, later ops are `skipped`, and earlier ones
+    stay applied.
+    """
+    col = get_groceries_collection()
+    user_id = _object_id(current_user)
+    now = datetime.now(timezone.utc)
+
+    results: list[GroceryBatchResult] = []
+    events: list[dict[str, Any]] = []
+    failed = False
+    for i, op in enumerate(body.ops):
+        if failed:
+            results.append(GroceryBatchResult(index=i, op=op.op, status="skipped", id=op.id, name=op.name))
+            continue
+        target: dict[str, Any] = {"user_id": user_id}
+        if op.id is not None and op.op != "add":
+            target["_id"] = ObjectId(op.id)
+        else:
+            target["name_key"] = normalize_name(op.name or "")
+        try:
+            doc = _apply_batch_op(col, op, target, now)
+        except PyMongoError as e:
+            print(f"Warning: grocery batch op {i} failed: {e}")
+            failed = True
+            results.append(GroceryBatchResult(
+                index=i, op=op.op, status="error", id=op.id, name=op.name, detail="Write failed"
+            ))
+            continue
+        if doc is None:
+            results.append(GroceryBatchResult(index=i, op=op.op, status="not_found", id=op.id, name=op.name))
+        elif doc.get("removed"):
+            results.append(GroceryBatchResult(index=i, op=op.op, status="removed", id=str(doc["_id"]), name=doc.get("name")))
+        else:
+            if op.op == "add":
+                events.append(purchase_event(user_id, doc, op.by, now))
+            results.append(GroceryBatchResult(
+                index=i, op=op.op, status="ok", id=str(doc["_id"]), name=doc.get("name"), count=int(doc.get("count", 1))
+            ))
+
+    record_purchases(events)
+    if any(r.status in ("ok", "removed") for r in results):
+        pantry_changed(current_user.id)
+    return results
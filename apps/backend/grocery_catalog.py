@@ -0,0 +1,259 @@
+"""Global catalog of grocery names for prefix autocomplete.
+
+GET /api/groceries/suggest?q=tom returns names like "Tomatoes" and "Cherry
+Tomatoes", ranked by how many users have the item, so free-text inputs can
+steer people toward an existing canonical name instead of a typo.
+
+The catalog combines the names shipped in `grocery_seed.txt` with the names
+across all users' groceries, one entry per `name_key` (see names.py). A user
+name is only suggested once at least SUGGEST_MIN_USERS distinct users have
+it, so one person's unusual entries are not shown to everyone else. The
+catalog remembers which users hold each key, so deleting and re-adding an
+item (a new document each time) never counts the same person twice.
+
+Lookups use an immutable `PrefixIndex`: a sorted array of the lowercased
+names and every word-suffix of them ("cherry tomatoes", "tomatoes"), searched
+with bisect. A prefix maps to one contiguous slice; the best entries in it are
+picked by popularity. When the slice is a large share of the catalog (short or
+very common prefixes), walking the names in popularity order finds the top
+matches sooner, so that is done instead. Answers for one- and two-letter
+prefixes are also cached per index.
+
+A background thread refreshes the catalog every SUGGEST_REFRESH_SECONDS by
+reading only groceries inserted since the last refresh (`_id` greater than
+the last one seen), then swaps in a new index. Decrements and deletions are
+picked up by a full rebuild every SUGGEST_REBUILD_SECONDS.
+"""
+
+from __future__ import annotations
+
+import bisect
+import heapq
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+from config import config
+from database import get_groceries_collection
+from names import normalize_name
+
+SEED_PATH = Path(__file__).with_name("grocery_seed.txt")
+# Popularity given to seed names, as if this many users had them
+SEED_WEIGHT = 1
+_CACHED_PREFIX_LEN = 2
+_PREFIX_END = "\U0010ffff"
+
+
+def load_seed(path: Path = SEED_PATH) -> list[str]:
+    try:
+        lines = path.read_text(encoding="utf-8").splitlines()
+    except OSError as e:
+        print(f"Warning: could not read grocery seed list {path}: {e}")
+        return []
+    return [line.strip() for line in lines if line.strip() and not line.lstrip().startswith("#")]
+
+
+def _fold(text: str) -> str:
+    return " ".join(str(text or "").casefold().split())
+
+
+class PrefixIndex:
+    """Immutable prefix index over (display name, popularity) entries."""
+
+    def __init__(self, entries: Iterable[tuple[str, int]]):
+        self.names: list[str] = []
+        self.weights: list[int] = []
+        self._folded: list[str] = []
+        rows: list[tuple[str, int, bool]] = []
+        for name, weight in entries:
+            i = len(self.names)
+            folded = _fold(name)
+            self.names.append(name)
+            self.weights.append(weight)
+            self._folded.append(folded)
+            rows.append((folded, i, True))
+            # Every later word too, so "tom" finds "Cherry Tomatoes"
+            for pos, ch in enumerate(folded):
+                if ch == " " and pos + 1 < len(folded):
+                    rows.append((folded[pos + 1:], i, False))
+        rows.sort()
+        self.keys = [r[0] for r in rows]
+        self._ids = [r[1] for r in rows]
+        self._at_start = [r[2] for r in rows]
+        # Entry ids, most popular first, for prefixes that match a large share of names
+        self._by_popularity = sorted(range(len(self.names)), key=lambda i: -self.weights[i])
+        self._cache: dict[tuple[str, int], list[tuple[str, int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _rank(self, item: tuple[int, bool]) -> tuple[int, bool, int, str]:
+        i, at_start = item
+        return -self.weights[i], not at_start, len(self.names[i]), self.names[i]
+
+    def suggest(self, prefix: str, limit: int = 8) -> list[tuple[str, int]]:
+        """Up to `limit` (name, popularity), most popular first; names starting with `prefix` first on ties."""
+        prefix = _fold(prefix)
+        if not prefix:
+            return []
+        cacheable = len(prefix) <= _CACHED_PREFIX_LEN
+        if cacheable:
+            cached = self._cache.get((prefix, limit))
+            if cached is not None:
+                return cached
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + _PREFIX_END, lo)
+        # Scanning the slice costs (hi - lo); walking names by popularity until
+        # `limit` match costs about limit * len / (hi - lo). Take the cheaper.
+        if (hi - lo) ** 2 > limit * len(self.names):
+            found = self._walk_popular(prefix, limit)
+        else:
+            best: dict[int, bool] = {}
+            for j in range(lo, hi):
+                i = self._ids[j]
+                best[i] = best.get(i, False) or self._at_start[j]
+            found = list(best.items())
+        top = heapq.nsmallest(limit, found, key=self._rank)
+        out = [(self.names[i], self.weights[i]) for i, _ in top]
+        if cacheable:
+            self._cache[(prefix, limit)] = out
+        return out
+
+    def _walk_popular(self, prefix: str, limit: int) -> list[tuple[int, bool]]:
+        inner = " " + prefix
+        found: list[tuple[int, bool]] = []
+        for i in self._by_popularity:
+            # Keep going while ties with the last needed entry could still outrank it
+            if len(found) >= limit and self.weights[i] < self.weights[found[limit - 1][0]]:
+                break
+            folded = self._folded[i]
+            if folded.startswith(prefix):
+                found.append((i, True))
+            elif inner in folded:
+                found.append((i, False))
+        return found
+
+
+class GroceryCatalog:
+    def __init__(self, refresh_seconds: int, rebuild_seconds: int, min_users: int, seed: Optional[list[str]] = None):
+        self.refresh_seconds = max(1, refresh_seconds)
+        self.rebuild_seconds = max(self.refresh_seconds, rebuild_seconds)
+        self.min_users = max(1, min_users)
+        self._seed = seed
+        self._lock = threading.RLock()
+        # name_key -> {user id: that user's display name}
+        self._holders: dict[str, dict[Any, str]] = {}
+        self._seed_names: dict[str, str] = {}
+        self._last_id: Any = None
+        self._index: Optional[PrefixIndex] = None
+        self._built_at = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def index(self) -> PrefixIndex:
+        """The current index, built on first use."""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self.rebuild()
+        return self._index  # type: ignore[return-value]
+
+    def suggest(self, prefix: str, limit: int = 8) -> list[tuple[str, int]]:
+        return self.index().suggest(prefix, limit)
+
+    def rebuild(self) -> None:
+        """Recount every grocery name from scratch."""
+        with self._lock:
+            seed = self._seed if self._seed is not None else load_seed()
+            self._seed_names = {}
+            for name in seed:
+                self._seed_names.setdefault(normalize_name(name), name)
+            col = get_groceries_collection()
+            # Read the high-water mark first: docs inserted during the scan are
+            # read again by the next refresh (harmless, holders are per user), never missed
+            last = next(iter(col.find({}, {"_id": 1}).sort("_id", -1).limit(1)), None)
+            holders: dict[str, dict[Any, str]] = {}
+            for row in col.aggregate([
+                {"$match": {"name_key": {"$exists": True}}},
+                {"$group": {"_id": {"key": "$name_key", "user": "$user_id"}, "name": {"$last": "$name"}}},
+            ]):
+                key, name = row["_id"].get("key"), row.get("name")
+                if key and name:
+                    holders.setdefault(key, {})[row["_id"].get("user")] = name
+            self._holders = holders
+            self._last_id = last["_id"] if last else None
+            self._publish()
+            self._built_at = time.monotonic()
+
+    def refresh(self, batch_size: int = 1000) -> int:
+        """Fold in groceries inserted since the last refresh; returns how many were read."""
+        with self._lock:
+            if self._index is None:
+                return 0
+            col = get_groceries_collection()
+            seen = 0
+            while True:
+                query = {"_id": {"$gt": self._last_id}} if self._last_id is not None else {}
+                docs = list(
+                    col.find(query, {"name": 1, "name_key": 1, "user_id": 1}).sort("_id", 1).limit(batch_size)
+                )
+                for doc in docs:
+                    name = doc.get("name")
+                    key = doc.get("name_key") or normalize_name(name or "")
+                    if key and name:
+                        self._holders.setdefault(key, {})[doc.get("user_id")] = name
+                    self._last_id = doc["_id"]
+                seen += len(docs)
+                if len(docs) < batch_size:
+                    break
+            if seen:
+                self._publish()
+            return seen
+
+    def _publish(self) -> None:
+        entries: list[tuple[str, int]] = []
+        for key in set(self._holders) | set(self._seed_names):
+            holders = self._holders.get(key, {})
+            users = len(holders)
+            seeded = key in self._seed_names
+            if not seeded and users < self.min_users:
+                continue
+            display = self._seed_names.get(key) or max(
+                Counter(holders.values()).items(), key=lambda kv: (kv[1], kv[0])
+            )[0]
+            entries.append((display, users + (SEED_WEIGHT if seeded else 0)))
+        self._index = PrefixIndex(entries)
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="grocery-catalog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if self._index is None or time.monotonic() - self._built_at >= self.rebuild_seconds:
+                    self.rebuild()
+                else:
+                    self.refresh()
+            except Exception as e:
+                print(f"Warning: grocery catalog refresh failed: {e}")
+            if self._stop.wait(self.refresh_seconds):
+                return
+
+
+grocery_catalog = GroceryCatalog(
+    refresh_seconds=config.SUGGEST_REFRESH_SECONDS,
+    rebuild_seconds=config.SUGGEST_REBUILD_SECONDS,
+    min_users=config.SUGGEST_MIN_USERS,
+)
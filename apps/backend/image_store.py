@@ -0,0 +1,304 @@
+"""Content-addressed storage for receipt images.
+
+Uploads are stored by the sha256 of their bytes, sharded two levels deep so
+no directory grows unbounded:
+
+    <root>/originals/ab/cd/abcd...<64 hex>.jpg    uploaded bytes, as-is
+    <root>/compact/ab/cd/abcd....webp             grayscale WebP re-encode
+    <root>/thumbs/ab/cd/abcd....webp              small preview for the UI
+
+Identical uploads share one blob and names can't collide. After OCR the
+original is re-encoded into the compact and thumbnail tiers in the background.
+Retention then drops originals after `original_retention_days` (only once a
+compact copy exists, and never before `min_original_age_seconds`, so a 0-day
+setting can't pull an image from under an upload of the same bytes that is
+still being OCR'd) and, if `compact_retention_days` is set, compact copies
+after that many days. Thumbnails and the OCR text in Mongo are kept. Readers
+go through the content hash (`best_image`), never a stored file path, so they
+get whichever tier is still on disk.
+
+`ImageCompactor` periodically catches up on compaction that didn't happen
+(restarts, failures) and applies retention. Originals that can't be decoded
+(e.g. PDFs) get an empty marker under `<root>/uncompactable/` and are kept
+without being retried. Every step is idempotent and writes go through a temp
+file plus rename, so several workers can share the same store.
+
+Uploads from before the store existed sit at `<root>/<user_id>/receipt_*`.
+Compaction and retention only look at the tiers, so they never touch these
+files. `migrate_legacy` (scripts/receipt_storage.py --migrate-legacy) moves
+them into the store and points their receipts at the content hash.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from config import config
+
+TIERS = ("originals", "compact", "thumbs")
+_UNCOMPACTABLE = "uncompactable"
+_DAY = 24 * 60 * 60
+# Originals younger than this are kept whatever the retention setting
+MIN_ORIGINAL_AGE_SECONDS = 60 * 60
+
+
+@dataclass(frozen=True)
+class StoredImage:
+    sha256: str
+    ext: str
+    path: Path
+
+
+def _is_digest(name: str) -> bool:
+    return len(name) == 64 and all(c in "0123456789abcdef" for c in name)
+
+
+class ImageStore:
+    def __init__(
+        self,
+        root: Path,
+        webp_quality: int = 60,
+        thumbnail_px: int = 320,
+        original_retention_days: int = 7,
+        compact_retention_days: int = 0,
+        min_original_age_seconds: int = MIN_ORIGINAL_AGE_SECONDS,
+    ):
+        self.root = Path(root)
+        self.webp_quality = webp_quality
+        self.thumbnail_px = thumbnail_px
+        self.original_retention_days = original_retention_days
+        self.compact_retention_days = compact_retention_days
+        self.min_original_age_seconds = min_original_age_seconds
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-compact")
+
+    def path(self, tier: str, sha256: str, ext: str) -> Path:
+        return self.root / tier / sha256[:2] / sha256[2:4] / f"{sha256}.{ext}"
+
+    def put(self, data: bytes, ext: str) -> StoredImage:
+        """Store `data` under its content hash; re-uploading the same bytes is a no-op."""
+        sha256 = hashlib.sha256(data).hexdigest()
+        ext = ext.lower().lstrip(".") or "bin"
+        path = self.path("originals", sha256, ext)
+        if path.exists():
+            # Restart the retention clock: the image was just uploaded again
+            os.utime(path)
+        else:
+            self._write(path, data)
+        return StoredImage(sha256=sha256, ext=ext, path=path)
+
+    def original(self, sha256: str) -> Optional[Path]:
+        folder = self.path("originals", sha256, "x").parent
+        return next(folder.glob(f"{sha256}.*"), None) if folder.exists() else None
+
+    def best_image(self, sha256: str) -> Optional[Path]:
+        """The highest-fidelity copy still on disk: original, else compact."""
+        original = self.original(sha256)
+        if original is not None:
+            return original
+        compact = self.path("compact", sha256, "webp")
+        return compact if compact.exists() else None
+
+    def thumbnail(self, sha256: str) -> Optional[Path]:
+        path = self.path("thumbs", sha256, "webp")
+        return path if path.exists() else None
+
+    def compact(self, sha256: str) -> bool:
+        """Write the compact and thumbnail tiers from the original.
+
+        Returns False if there is no original or it isn't a decodable image
+        (e.g. a PDF); such originals are never dropped by retention, and are
+        marked so later passes don't try again.
+        """
+        compact_path = self.path("compact", sha256, "webp")
+        thumb_path = self.path("thumbs", sha256, "webp")
+        if compact_path.exists() and thumb_path.exists():
+            return True
+        original = self.original(sha256)
+        marker = self._uncompactable_marker(sha256)
+        if original is None or marker.exists():
+            return False
+
+        from PIL import Image, ImageOps
+
+        try:
+            with Image.open(original) as img:
+                gray = ImageOps.exif_transpose(img).convert("L")
+        except Exception as e:
+            print(f"Warning: cannot compact receipt image {original.name}, keeping the original: {e}")
+            # Same hash, same bytes: it will never decode, so don't retry
+            self._write(marker, b"")
+            return False
+        self._write_webp(compact_path, gray, self.webp_quality)
+        gray.thumbnail((self.thumbnail_px, self.thumbnail_px))
+        self._write_webp(thumb_path, gray, self.webp_quality)
+        return True
+
+    def schedule_compaction(self, sha256: str) -> None:
+        """Compact in the background so the upload response isn't delayed."""
+        self._executor.submit(self._compact_quietly, sha256)
+
+    def _compact_quietly(self, sha256: str) -> None:
+        try:
+            self.compact(sha256)
+        except Exception as e:
+            print(f"Warning: receipt image compaction failed: {e}")
+
+    def run_once(self, now: Optional[float] = None) -> dict[str, int]:
+        """Compact any originals that still need it, then apply retention."""
+        now = now or time.time()
+        stats = {"compacted": 0, "originals_dropped": 0, "compact_dropped": 0}
+        keep_originals = max(self.original_retention_days * _DAY, self.min_original_age_seconds)
+        for path in self._files("originals"):
+            sha256 = path.stem
+            compact_exists = self.path("compact", sha256, "webp").exists()
+            if not compact_exists and self.compact(sha256):
+                stats["compacted"] += 1
+                compact_exists = True
+            if compact_exists and self._older_than(path, keep_originals, now):
+                path.unlink(missing_ok=True)
+                stats["originals_dropped"] += 1
+        if self.compact_retention_days > 0:
+            for path in self._files("compact"):
+                if self._older_than(path, self.compact_retention_days * _DAY, now):
+                    path.unlink(missing_ok=True)
+                    stats["compact_dropped"] += 1
+        return stats
+
+    def disk_usage(self) -> dict[str, Any]:
+        """Files and bytes per tier, plus pre-content-addressing `legacy` files."""
+        report: dict[str, Any] = {}
+        for tier in TIERS:
+            files = list(self._files(tier))
+            report[tier] = {"files": len(files), "bytes": sum(self._size(p) for p in files)}
+        legacy = list(self._legacy_files())
+        report["legacy"] = {"files": len(legacy), "bytes": sum(self._size(p) for p in legacy)}
+        report["total_bytes"] = sum(report[k]["bytes"] for k in (*TIERS, "legacy"))
+        return report
+
+    def migrate_legacy(self, receipts: Any, dry_run: bool = False) -> dict[str, int]:
+        """Move pre-content-addressing uploads into the store; returns counters.
+
+        Each file is stored under its hash with its modification time kept, so
+        retention sees its real age. Receipts whose `file_path` points at it
+        get `image_sha256` and the new path, then the old file is removed.
+        Files no receipt references are moved too.
+        """
+        stats = {"files": 0, "receipts": 0}
+        for path in list(self._legacy_files()):
+            stats["files"] += 1
+            owner = path.parent.name
+            # Stored paths may be absolute or relative to wherever the server ran
+            query = {"user_id": owner, "file_path": {"$regex": re.escape(f"{owner}/{path.name}") + "$"}}
+            if dry_run:
+                stats["receipts"] += receipts.count_documents(query)
+                continue
+            stored = self.put(path.read_bytes(), path.suffix)
+            mtime = path.stat().st_mtime
+            os.utime(stored.path, (mtime, mtime))
+            result = receipts.update_many(
+                query, {"$set": {"image_sha256": stored.sha256, "file_path": str(stored.path)}}
+            )
+            stats["receipts"] += result.modified_count
+            path.unlink()
+        return stats
+
+    def _legacy_files(self) -> Iterator[Path]:
+        if not self.root.exists():
+            return iter(())
+        skip = (*TIERS, _UNCOMPACTABLE)
+        return (
+            p for p in self.root.rglob("*")
+            if p.is_file() and p.relative_to(self.root).parts[0] not in skip and not p.name.startswith(".tmp-")
+        )
+
+    def _uncompactable_marker(self, sha256: str) -> Path:
+        return self.root / _UNCOMPACTABLE / sha256[:2] / sha256[2:4] / sha256
+
+    def _files(self, tier: str) -> Iterator[Path]:
+        base = self.root / tier
+        if not base.exists():
+            return iter(())
+        return (p for p in base.glob("*/*/*.*") if _is_digest(p.stem))
+
+    @staticmethod
+    def _size(path: Path) -> int:
+        try:
+            return path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    @staticmethod
+    def _older_than(path: Path, seconds: float, now: float) -> bool:
+        try:
+            return now - path.stat().st_mtime >= seconds
+        except FileNotFoundError:
+            return False
+
+    @staticmethod
+    def _write(path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def _write_webp(self, path: Path, image: Any, quality: int) -> None:
+        buf = io.BytesIO()
+        image.save(buf, format="WEBP", quality=quality, method=6)
+        self._write(path, buf.getvalue())
+
+
+class ImageCompactor:
+    """Background thread running `ImageStore.run_once` every `interval_seconds`."""
+
+    def __init__(self, store: ImageStore, interval_seconds: int):
+        self.store = store
+        self.interval_seconds = max(1, interval_seconds)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="image-compactor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                stats = self.store.run_once()
+                if any(stats.values()):
+                    print(f"Receipt image compaction: {stats}")
+            except Exception as e:
+                print(f"Warning: receipt image compaction failed: {e}")
+
+
+image_store = ImageStore(
+    root=config.UPLOAD_DIR / "receipts",
+    webp_quality=config.RECEIPT_WEBP_QUALITY,
+    thumbnail_px=config.RECEIPT_THUMBNAIL_PX,
+    original_retention_days=config.RECEIPT_ORIGINAL_RETENTION_DAYS,
+    compact_retention_days=config.RECEIPT_COMPACT_RETENTION_DAYS,
+)
+image_compactor = ImageCompactor(image_store, interval_seconds=config.RECEIPT_COMPACTOR_INTERVAL_SECONDS)
@@ -0,0 +1,111 @@
+"""Process-wide limits on LLM usage.
+
+Every model call takes one of LLM_MAX_CONCURRENCY slots. Background work
+(recipe pre-generation, cache refills) runs its calls inside
+`llm_limiter.background()` and may only use the slots left after
+LLM_INTERACTIVE_RESERVE, so however much of it is queued, that many slots stay
+free for calls made on behalf of a waiting user. (With a single slot nothing
+can be reserved.) Background work additionally checks an hourly call budget
+before starting; interactive calls are counted against it but never refused.
+
+These slots are the one model capacity. Routes that call the model are also
+admitted through admission.llm_ceiling, whose size is derived from
+LLM_MAX_CONCURRENCY (two requests per slot) so that excess requests get a
+quick 503 rather than waiting here.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from config import config
+
+_background: contextvars.ContextVar[bool] = contextvars.ContextVar("llm_background", default=False)
+
+
+class LLMBusy(Exception):
+    """No model-call slot freed up within the caller's timeout."""
+
+
+def _acquire(slots: threading.BoundedSemaphore, deadline: Optional[float]) -> bool:
+    if deadline is None:
+        return slots.acquire()
+    return slots.acquire(timeout=max(0.0, deadline - time.monotonic()))
+
+
+class LLMLimiter:
+    def __init__(self, max_concurrency: int, hourly_budget: int, interactive_reserve: int = 0):
+        self.max_concurrency = max(1, max_concurrency)
+        self.hourly_budget = hourly_budget
+        self.interactive_reserve = min(max(0, interactive_reserve), self.max_concurrency - 1)
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._background_slots = threading.BoundedSemaphore(self.max_concurrency - self.interactive_reserve)
+        self._lock = threading.Lock()
+        self._calls: deque[float] = deque()
+
+    @contextmanager
+    def background(self) -> Iterator[None]:
+        """Mark model calls made in this block as background work."""
+        token = _background.set(True)
+        try:
+            yield
+        finally:
+            _background.reset(token)
+
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None) -> Iterator[None]:
+        """Hold one of the global model-call slots for the duration of a call.
+
+        Raises LLMBusy if no slot frees up within `timeout` seconds (None waits forever).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        background = _background.get()
+        # Background calls queue on their own slots first, rather than on the shared ones
+        if background and not _acquire(self._background_slots, deadline):
+            raise LLMBusy("no background model-call slot freed up in time")
+        try:
+            if not _acquire(self._slots, deadline):
+                raise LLMBusy("no model-call slot freed up in time")
+            try:
+                self._record_call()
+                yield
+            finally:
+                self._slots.release()
+        finally:
+            if background:
+                self._background_slots.release()
+
+    def budget_available(self) -> bool:
+        """True if background work may spend another model call this hour."""
+        if self.hourly_budget <= 0:
+            return True
+        with self._lock:
+            self._trim(time.monotonic())
+            return len(self._calls) < self.hourly_budget
+
+    def calls_last_hour(self) -> int:
+        with self._lock:
+            self._trim(time.monotonic())
+            return len(self._calls)
+
+    def _record_call(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            self._calls.append(now)
+
+    def _trim(self, now: float) -> None:
+        while self._calls and now - self._calls[0] > 3600:
+            self._calls.popleft()
+
+
+llm_limiter = LLMLimiter(
+    max_concurrency=config.LLM_MAX_CONCURRENCY,
+    hourly_budget=config.LLM_HOURLY_BUDGET,
+    interactive_reserve=config.LLM_INTERACTIVE_RESERVE,
+)
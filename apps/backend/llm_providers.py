@@ -0,0 +1,426 @@
+"""Pluggable LLM providers with latency-aware routing.
+
+All model calls go through `llm_router.generate(prompt, ...)`, which returns
+the model's text. Providers are enabled with LLM_PROVIDERS (comma-separated,
+in order of preference):
+
+- `gemini`: google-generativeai, model LLM_MODEL
+- `anthropic`: the Anthropic Messages API, model ANTHROPIC_MODEL
+- `stub`: a local deterministic backend (no network) that answers the receipt
+  and recipe prompts with plausible JSON, so the whole pipeline can be run and
+  benchmarked offline. Optional artificial latency: LLM_STUB_LATENCY_MS.
+
+Each provider has its own deadline/retry/circuit-breaker guard (see
+llm_resilience.py). The router keeps a rolling window of each provider's call
+latencies and outcomes and tries providers in order of expected latency per
+successful call, p95 / (1 - error rate). Providers with an open breaker go
+last, and untried providers (no calls in the window) are tried first so every
+provider gets measured. A provider whose recent calls all failed has no
+latency to go by; those come after every provider with a success, ordered by
+error rate. If a provider fails the next one is tried.
+
+With LLM_HEDGE_AFTER_MS set, a call still running after that budget fires the
+same prompt at the next provider as well, and the first answer wins.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import functools
+import hashlib
+import importlib.util
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Optional
+
+from config import config
+from llm_resilience import OPEN, CircuitBreaker, LLMGuard, LLMProviderError, LLMUnavailable
+from metrics import llm_errors, record_tokens
+
+
+class LLMProvider:
+    """Base class: `generate` returns the model's text for `prompt`."""
+
+    name = "base"
+
+    def available(self) -> bool:
+        return True
+
+    def generate(self, prompt: str, *, temperature: float, max_tokens: int, timeout: float) -> str:
+        raise NotImplementedError
+
+
+@functools.lru_cache(maxsize=None)
+def _installed(module: str) -> bool:
+    """Whether `module` can be imported, without importing it.
+
+    `available()` is called from /health on the event loop; the SDKs take
+    seconds to import, so that happens in `generate()` on a worker thread.
+    """
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self, api_key: str, model: str):
+        self.api_key = api_key
+        self.model_name = model
+        self._model: Any = None
+        self._genai: Any = None
+
+    def available(self) -> bool:
+        return bool(self.api_key and self.model_name) and _installed("google.generativeai")
+
+    def _client(self) -> Any:
+        if self._genai is None:
+            try:
+                import google.generativeai as genai
+            except Exception:
+                return None
+            genai.configure(api_key=self.api_key)
+            self._genai = genai
+            self._model = genai.GenerativeModel(self.model_name)
+        return self._genai
+
+    def generate(self, prompt: str, *, temperature: float, max_tokens: int, timeout: float) -> str:
+        genai = self._client()
+        if genai is None:
+            raise LLMProviderError("google-generativeai could not be imported")
+        generation_config = genai.types.GenerationConfig(temperature=temperature, max_output_tokens=max_tokens)
+        resp = self._model.generate_content(
+            prompt, generation_config=generation_config, request_options={"timeout": timeout}
+        )
+        usage = getattr(resp, "usage_metadata", None)
+        if usage is not None:
+            record_tokens(self.name, getattr(usage, "prompt_token_count", 0), getattr(usage, "candidates_token_count", 0))
+        return _gemini_text(resp)
+
+
+def _gemini_text(resp: Any) -> str:
+    if isinstance(resp, str):
+        return resp
+    if getattr(resp, "text", None):
+        return resp.text
+    if getattr(resp, "content", None):
+        return resp.content
+    if getattr(resp, "candidates", None):
+        first = resp.candidates[0]
+        if isinstance(first, dict):
+            return first.get("content") or first.get("output") or json.dumps(first)
+        if hasattr(first, "content"):
+            return first.content
+    return str(resp)
+
+
+class AnthropicProvider(LLMProvider):
+    name = "anthropic"
+
+    def __init__(self, api_key: str, model: str):
+        self.api_key = api_key
+        self.model_name = model
+        self._anthropic: Any = None
+
+    def available(self) -> bool:
+        return bool(self.api_key and self.model_name) and _installed("anthropic")
+
+    def _client(self) -> Any:
+        if self._anthropic is None:
+            try:
+                import anthropic
+            except Exception:
+                return None
+            # Retries are handled by our guard, not the SDK
+            self._anthropic = anthropic.Anthropic(api_key=self.api_key, max_retries=0)
+        return self._anthropic
+
+    def generate(self, prompt: str, *, temperature: float, max_tokens: int, timeout: float) -> str:
+        import anthropic
+
+        try:
+            msg = self._client().messages.create(
+                model=self.model_name,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                messages=[{"role": "user", "content": prompt}],
+                timeout=timeout,
+            )
+        except (anthropic.APITimeoutError, anthropic.APIConnectionError) as e:
+            raise TimeoutError(str(e)) from e
+        except (anthropic.AuthenticationError, anthropic.PermissionDeniedError, anthropic.NotFoundError) as e:
+            # Bad key or unknown model: retrying won't help, but routing should move on
+            raise LLMProviderError(f"Anthropic API {e.status_code}: {e}") from e
+        except anthropic.APIStatusError as e:
+            if e.status_code == 429 or e.status_code >= 500:
+                raise ConnectionError(f"Anthropic API {e.status_code}: {e}") from e
+            raise
+        record_tokens(self.name, msg.usage.input_tokens, msg.usage.output_tokens)
+        return "".join(getattr(block, "text", "") for block in msg.content)
+
+
+# Shelf life (min, max days) for common items, so stub output looks realistic
+_STUB_SHELF_LIFE = {
+    "milk": (5, 7), "egg": (21, 35), "bread": (5, 7), "banana": (3, 7), "apple": (14, 30),
+    "chicken": (1, 2), "beef": (1, 3), "cheese": (14, 28), "yogurt": (7, 14), "lettuce": (5, 10),
+    "spinach": (3, 7), "tomato": (5, 10), "berry": (3, 6), "fish": (1, 2),
+}
+
+
+class StubProvider(LLMProvider):
+    """Deterministic, offline answers for the prompts this app sends.
+
+    Latency is log-normal around `latency_ms` (the median; `latency_sigma` 0
+    means fixed) and `error_rate` of calls fail with a transient error, both
+    drawn from a seeded RNG so load tests are repeatable.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency_ms: float = 0, latency_sigma: float = 0, error_rate: float = 0, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    def generate(self, prompt: str, *, temperature: float, max_tokens: int, timeout: float) -> str:
+        with self._rng_lock:
+            delay_ms = self.latency_ms * math.exp(self._rng.gauss(0, self.latency_sigma)) if self.latency_sigma else self.latency_ms
+            fail = self._rng.random() < self.error_rate
+        if delay_ms:
+            time.sleep(min(delay_ms / 1000, timeout))
+            if delay_ms / 1000 >= timeout:
+                raise TimeoutError("stub LLM timed out")
+        if fail:
+            raise ConnectionError("stub LLM injected failure")
+        if "RECEIPT_TEXT:" in prompt:
+            text = json.dumps(self._receipt_items(prompt))
+        elif "AVAILABLE_INGREDIENTS:" in prompt:
+            text = json.dumps(self._recipe(prompt))
+        else:
+            text = "[]"
+        # Rough token counts (~4 characters per token) so dashboards work offline too
+        record_tokens(self.name, len(prompt) // 4, len(text) // 4)
+        return text
+
+    @staticmethod
+    def _receipt_items(prompt: str) -> list[dict[str, Any]]:
+        from receipt_parser import fallback_parse
+
+        text = prompt.split("RECEIPT_TEXT:", 1)[1].split("JSON_OUTPUT:", 1)[0]
+        # Free-text input (analyze-text) has no prices; fall back to one item per line
+        items = fallback_parse(text) or [
+            {"name": line.strip()} for line in text.splitlines() if re.search(r"[A-Za-z]{3}", line)
+        ]
+        for item in items:
+            lower = item["name"].lower()
+            known = next((v for k, v in _STUB_SHELF_LIFE.items() if k in lower), None)
+            digest = int(hashlib.sha256(lower.encode()).hexdigest(), 16)
+            if known is None and digest % 3 == 0:
+                continue  # shelf-stable
+            item["min_days"], item["max_days"] = known or (3 + digest % 10, 3 + digest % 10 + digest % 7)
+        return items
+
+    @staticmethod
+    def _recipe(prompt: str) -> dict[str, Any]:
+        section = prompt.split("AVAILABLE_INGREDIENTS:", 1)[1].split("JSON_OUTPUT:", 1)[0]
+        ingredients = [line[2:].strip() for line in section.splitlines() if line.startswith("- ")]
+        # Previous titles are listed the same way; rotate the style past them
+        avoid = sum(1 for line in prompt.splitlines() if line.startswith("- ")) - len(ingredients)
+        main = ingredients[0] if ingredients else "Pantry"
+        styles = ["Skillet", "Bake", "Salad", "Soup", "Stir-Fry", "Bowl"]
+        title = f"{main} {styles[avoid % len(styles)]}"
+        return {
+            "title": title,
+            "ingredients": [{"name": i} for i in ingredients],
+            "steps": [f"Prepare the {', '.join(ingredients) or 'ingredients'}.", "Cook until done.", "Serve."],
+            "estimated_minutes": 10 + 5 * len(ingredients),
+        }
+
+
+class ProviderStats:
+    """Rolling latency/outcome window for one provider."""
+
+    def __init__(self, window: int = 100):
+        self._lock = threading.Lock()
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._outcomes: deque[bool] = deque(maxlen=window)
+
+    def record(self, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self._outcomes.append(ok)
+            if ok:
+                self._latencies.append(seconds)
+
+    def p95(self) -> Optional[float]:
+        with self._lock:
+            if not self._latencies:
+                return None
+            ordered = sorted(self._latencies)
+            return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self._outcomes:
+                return 0.0
+            return self._outcomes.count(False) / len(self._outcomes)
+
+    def calls(self) -> int:
+        with self._lock:
+            return len(self._outcomes)
+
+
+class LLMRouter:
+    def __init__(self, providers: list[LLMProvider], guards: dict[str, LLMGuard], hedge_after_seconds: float = 0):
+        self.providers = providers
+        self.guards = guards
+        self.hedge_after_seconds = hedge_after_seconds
+        self.stats = {p.name: ProviderStats() for p in providers}
+        self.hedges_fired = 0
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-hedge")
+
+    def available(self) -> bool:
+        return any(p.available() for p in self.providers)
+
+    def ranked(self) -> list[LLMProvider]:
+        """Available providers, best first."""
+        def score(item: tuple[int, LLMProvider]) -> tuple[int, int, float, int]:
+            index, provider = item
+            stats = self.stats[provider.name]
+            broken = self.guards[provider.name].breaker.state == OPEN
+            if stats.calls() == 0:
+                return (int(broken), 0, 0.0, index)
+            p95 = stats.p95()
+            if p95 is None:
+                # Every recent call failed
+                return (int(broken), 2, stats.error_rate(), index)
+            return (int(broken), 1, p95 / max(0.05, 1 - stats.error_rate()), index)
+
+        candidates = [(i, p) for i, p in enumerate(self.providers) if p.available()]
+        return [p for _, p in sorted(candidates, key=score)]
+
+    def generate(self, prompt: str, *, temperature: float, max_tokens: int) -> str:
+        """Text from the best provider; raises LLMUnavailable if none can answer."""
+        candidates = self.ranked()
+        if not candidates:
+            raise LLMUnavailable("No LLM provider is configured")
+        errors: list[str] = []
+        while candidates:
+            first = candidates.pop(0)
+            if self.hedge_after_seconds > 0 and candidates:
+                second = candidates.pop(0)
+                try:
+                    return self._hedged(first, second, prompt, temperature, max_tokens)
+                except Exception as e:
+                    errors.append(str(e))
+                    continue
+            try:
+                return self._call(first, prompt, temperature, max_tokens)
+            except Exception as e:
+                errors.append(f"{first.name}: {e}")
+        raise LLMUnavailable("All LLM providers failed: " + "; ".join(errors))
+
+    def _call(self, provider: LLMProvider, prompt: str, temperature: float, max_tokens: int) -> str:
+        start = time.monotonic()
+        try:
+            text = self.guards[provider.name].call(
+                lambda timeout: provider.generate(prompt, temperature=temperature, max_tokens=max_tokens, timeout=timeout)
+            )
+        except Exception:
+            self.stats[provider.name].record(time.monotonic() - start, False)
+            llm_errors.inc(provider=provider.name)
+            raise
+        self.stats[provider.name].record(time.monotonic() - start, True)
+        return text
+
+    def _submit(self, provider: LLMProvider, prompt: str, temperature: float, max_tokens: int) -> Any:
+        # Carry the caller's context (e.g. llm_limiter.background()) into the hedge thread
+        context = contextvars.copy_context()
+        return self._executor.submit(context.run, self._call, provider, prompt, temperature, max_tokens)
+
+    def _hedged(self, first: LLMProvider, second: LLMProvider, prompt: str, temperature: float, max_tokens: int) -> str:
+        pending = {self._submit(first, prompt, temperature, max_tokens)}
+        done, pending = wait(pending, timeout=self.hedge_after_seconds)
+        if not done:
+            self.hedges_fired += 1
+            pending.add(self._submit(second, prompt, temperature, max_tokens))
+        errors: list[str] = []
+        while done or pending:
+            for future in done:
+                try:
+                    return future.result()
+                except Exception as e:
+                    errors.append(str(e))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        if len(errors) == 1:
+            # The first provider failed fast, before the hedge budget: try the second normally
+            return self._call(second, prompt, temperature, max_tokens)
+        raise LLMUnavailable("Hedged LLM calls failed: " + "; ".join(errors))
+
+    def health(self) -> dict[str, Any]:
+        out: dict[str, Any] = {"hedges_fired": self.hedges_fired, "providers": {}}
+        for provider in self.providers:
+            stats = self.stats[provider.name]
+            p95 = stats.p95()
+            out["providers"][provider.name] = {
+                "available": provider.available(),
+                "calls": stats.calls(),
+                "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+                "error_rate": round(stats.error_rate(), 3),
+                "breaker": self.guards[provider.name].breaker.stats(),
+            }
+        return out
+
+
+def _build_provider(name: str) -> Optional[LLMProvider]:
+    if name == "gemini":
+        return GeminiProvider(config.GEMINI_API_KEY, config.LLM_MODEL)
+    if name == "anthropic":
+        return AnthropicProvider(config.ANTHROPIC_API_KEY, config.ANTHROPIC_MODEL)
+    if name == "stub":
+        return StubProvider(
+            latency_ms=config.LLM_STUB_LATENCY_MS,
+            latency_sigma=config.LLM_STUB_LATENCY_SIGMA,
+            error_rate=config.LLM_STUB_ERROR_RATE,
+            seed=config.LLM_STUB_SEED,
+        )
+    print(f"Warning: unknown LLM provider '{name}' ignored")
+    return None
+
+
+def _guard() -> LLMGuard:
+    return LLMGuard(
+        breaker=CircuitBreaker(
+            failure_rate_threshold=config.LLM_BREAKER_FAILURE_RATE,
+            min_calls=config.LLM_BREAKER_MIN_CALLS,
+            window_seconds=config.LLM_BREAKER_WINDOW_SECONDS,
+            open_seconds=config.LLM_BREAKER_OPEN_SECONDS,
+        ),
+        deadline_seconds=config.LLM_DEADLINE_SECONDS,
+        max_retries=config.LLM_MAX_RETRIES,
+        backoff_base_seconds=config.LLM_BACKOFF_BASE_SECONDS,
+        backoff_max_seconds=config.LLM_BACKOFF_MAX_SECONDS,
+    )
+
+
+def build_router(names: list[str]) -> LLMRouter:
+    providers = [p for p in (_build_provider(n) for n in names) if p is not None]
+    return LLMRouter(
+        providers,
+        guards={p.name: _guard() for p in providers},
+        hedge_after_seconds=config.LLM_HEDGE_AFTER_MS / 1000,
+    )
+
+
+llm_router = build_router(config.LLM_PROVIDERS)
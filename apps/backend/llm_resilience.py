@@ -0,0 +1,239 @@
+"""Deadlines, retries and a circuit breaker shared by every model call.
+
+`LLMGuard.call(fn)` runs `fn(timeout)` where `timeout` is what is left of the
+call's overall deadline; providers pass it on to their client (Gemini's
+`request_options={"timeout": ...}`). Each provider in llm_providers.py has
+its own guard and breaker. Transient failures (timeouts, 429, 5xx)
+are retried with full-jitter exponential backoff while the deadline allows.
+Each attempt holds a global model-call slot (see llm_limits.py); waiting for
+one counts against the deadline, and the attempt gets only what is left.
+
+The breaker watches the outcome of attempts over a rolling window. Once the
+failure rate crosses the threshold (with a minimum number of calls), it opens
+and every call fails immediately with `LLMUnavailable` for `open_seconds`.
+After that it half-opens: one probe call is let through, and its result closes
+the breaker again or re-opens it. Callers catch `LLMUnavailable` and fall
+back (heuristic receipt parsing, stored recipes, 503) instead of piling up
+behind a dead upstream. Non-transient errors such as bad requests don't count
+as failures, except `LLMProviderError` (and Gemini's auth/not-found errors):
+a rejected API key or an unknown model is not retried either, but it is the
+provider's failure, so the breaker and the router's stats see it.
+"""
+
+from __future__ import annotations
+
+import functools
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Optional, TypeVar
+
+from llm_limits import LLMBusy, llm_limiter
+
+T = TypeVar("T")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class LLMUnavailable(Exception):
+    """The model can't be used right now (breaker open, deadline hit or retries exhausted)."""
+
+
+class LLMProviderError(Exception):
+    """The provider rejected the call because of its own setup (credentials, permissions, model)."""
+
+
+@functools.lru_cache(maxsize=1)
+def _google_exceptions() -> Any:
+    # Imported lazily: google.api_core is slow to import and only Gemini raises its errors
+    try:
+        from google.api_core import exceptions
+    except Exception:  # pragma: no cover - google-api-core ships with google-generativeai
+        return None
+    return exceptions
+
+
+def is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    if not type(exc).__module__.startswith("google."):
+        return False
+    google_exceptions = _google_exceptions()
+    if google_exceptions is not None and isinstance(exc, (
+        google_exceptions.ServerError,
+        google_exceptions.TooManyRequests,
+        google_exceptions.ResourceExhausted,
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.Aborted,
+        google_exceptions.RetryError,
+    )):
+        return True
+    return False
+
+
+def is_provider_fault(exc: BaseException) -> bool:
+    if isinstance(exc, LLMProviderError):
+        return True
+    if not type(exc).__module__.startswith("google."):
+        return False
+    google_exceptions = _google_exceptions()
+    return google_exceptions is not None and isinstance(exc, (
+        google_exceptions.Unauthenticated,
+        google_exceptions.PermissionDenied,
+        google_exceptions.NotFound,
+    ))
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_rate_threshold: float = 0.5,
+        min_calls: int = 5,
+        window_seconds: float = 60,
+        open_seconds: float = 30,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_calls = max(1, min_calls)
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._outcomes: deque[tuple[float, bool]] = deque()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(self._clock())
+
+    def _current_state(self, now: float) -> str:
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow(self) -> bool:
+        """May a call go out now? In half-open state only one probe at a time."""
+        with self._lock:
+            state = self._current_state(self._clock())
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def cancel(self) -> None:
+        """An allowed call never went out; a half-open breaker may let another probe through."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probe_in_flight = False
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            now = self._clock()
+            if self._current_state(now) == HALF_OPEN:
+                self._probe_in_flight = False
+                if ok:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open(now)
+                return
+            self._outcomes.append((now, ok))
+            self._trim(now)
+            failures = sum(1 for _, good in self._outcomes if not good)
+            if (
+                self._state == CLOSED
+                and len(self._outcomes) >= self.min_calls
+                and failures / len(self._outcomes) >= self.failure_rate_threshold
+            ):
+                self._open(now)
+
+    def _open(self, now: float) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        self._outcomes.clear()
+        self.times_opened += 1
+
+    def _trim(self, now: float) -> None:
+        while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+            self._outcomes.popleft()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            now = self._clock()
+            state = self._current_state(now)
+            self._trim(now)
+            failures = sum(1 for _, good in self._outcomes if not good)
+            return {
+                "state": state,
+                "recent_calls": len(self._outcomes),
+                "recent_failures": failures,
+                "times_opened": self.times_opened,
+                "retry_in_seconds": (
+                    max(0.0, round(self.open_seconds - (now - self._opened_at), 1)) if state == OPEN else 0.0
+                ),
+            }
+
+
+class LLMGuard:
+    def __init__(
+        self,
+        breaker: CircuitBreaker,
+        deadline_seconds: float = 20,
+        max_retries: int = 2,
+        backoff_base_seconds: float = 0.5,
+        backoff_max_seconds: float = 4,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.breaker = breaker
+        self.deadline_seconds = deadline_seconds
+        self.max_retries = max(0, max_retries)
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self._sleep = sleep
+
+    def call(self, fn: Callable[[float], T], deadline_seconds: Optional[float] = None) -> T:
+        """Run `fn(timeout)` under the deadline, retry policy and breaker."""
+        deadline = time.monotonic() + (deadline_seconds or self.deadline_seconds)
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMUnavailable("LLM deadline exceeded")
+            if not self.breaker.allow():
+                raise LLMUnavailable("LLM circuit breaker is open")
+            try:
+                with llm_limiter.slot(timeout=remaining):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise LLMBusy("deadline reached while waiting")
+                    result = fn(remaining)
+            except LLMBusy as e:
+                # Our own queue, not the upstream: nothing for the breaker to record
+                self.breaker.cancel()
+                raise LLMUnavailable("LLM deadline exceeded waiting for a model slot") from e
+            except Exception as e:
+                if not is_transient(e):
+                    # Bad request, parsing, ... are our fault, not the upstream's;
+                    # bad credentials or an unknown model are the provider's
+                    self.breaker.record(not is_provider_fault(e))
+                    raise
+                self.breaker.record(False)
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise LLMUnavailable(f"LLM call failed after {attempt} attempts: {e}") from e
+                backoff = random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** attempt))
+                if time.monotonic() + backoff >= deadline:
+                    raise LLMUnavailable(f"LLM deadline exceeded after {attempt} attempts: {e}") from e
+                self._sleep(backoff)
+                continue
+            self.breaker.record(True)
+            return result
+
@@ -0,0 +1,333 @@
+"""Prometheus metrics: request latency per route, pipeline stage timings, counters.
+
+Served at GET /metrics in the Prometheus text format. The registry is
+in-process and dependency-free; each worker exposes its own numbers, the way
+prometheus_client does without multiprocess mode.
+
+Timing a new stage takes one line, as a context manager or a decorator:
+
+    with stage("tesseract"):
+        text = pytesseract.image_to_string(...)
+
+    @stage("json_parse")
+    def _parse_response(...): ...
+
+Values that already live elsewhere (admission queue depth, breaker state,
+recipe cache hits) are read when /metrics is scraped, via `on_collect`.
+"""
+
+from __future__ import annotations
+
+import bisect
+import math
+import threading
+import time
+from contextlib import ContextDecorator
+from typing import Any, Callable, Iterable, Optional
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from config import config
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; wide enough for both Mongo writes (ms) and Tesseract/LLM calls (s)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: dict[tuple[str, ...], Any] = {}
+
+    def _key(self, labels: dict[str, Any]) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key: tuple[str, ...], value: Any) -> list[str]:
+        return [f"{self.name}{_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value: float, **labels: Any) -> None:
+        """For counters kept elsewhere (e.g. cache hit counts), copied in at collect time."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, plus +Inf, sum and count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels: Any) -> int:
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state[2] if state else 0
+
+    def _samples(self, key: tuple[str, ...], state: Any) -> list[str]:
+        counts, total, n = state
+        lines = []
+        cumulative = 0
+        for bound, c in zip((*self.buckets, math.inf), counts):
+            cumulative += c
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {n}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: list[_Metric] = []
+        self._collectors: list[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> Any:
+        self._metrics.append(metric)
+        return metric
+
+    def on_collect(self, fn: Callable[[], None]) -> Callable[[], None]:
+        """Run `fn` before each render, to refresh gauges from their sources."""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        for fn in self._collectors:
+            try:
+                fn()
+            except Exception as e:
+                print(f"Warning: metrics collector {getattr(fn, '__name__', fn)} failed: {e}")
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status"),
+))
+stage_duration = registry.register(Histogram(
+    "pipeline_stage_duration_seconds", "Time spent in each receipt pipeline stage", ("stage",),
+))
+stage_errors = registry.register(Counter(
+    "pipeline_stage_errors_total", "Pipeline stages that raised", ("stage",),
+))
+llm_tokens = registry.register(Counter(
+    "llm_tokens_total", "Tokens used by model calls", ("provider", "kind"),
+))
+llm_errors = registry.register(Counter(
+    "llm_errors_total", "Model calls that failed after retries", ("provider",),
+))
+cache_requests = registry.register(Counter(
+    "cache_requests_total", "Cache lookups by cache and result", ("cache", "result"),
+))
+admission_queue_depth = registry.register(Gauge(
+    "admission_queue_depth", "Requests waiting for a slot in a concurrency pool", ("pool",),
+))
+admission_in_flight = registry.register(Gauge(
+    "admission_in_flight", "Requests holding a slot in a concurrency pool", ("pool",),
+))
+llm_breaker_state = registry.register(Gauge(
+    "llm_breaker_state", "Circuit breaker state per provider (0 closed, 1 half-open, 2 open)", ("provider",),
+))
+llm_breaker_opened = registry.register(Counter(
+    "llm_breaker_opened_total", "Times the provider's circuit breaker opened", ("provider",),
+))
+mongo_pool_connections = registry.register(Gauge(
+    "mongo_pool_connections", "Mongo connections by state (open, in_use, waiting for checkout)", ("state",),
+))
+mongo_pool_checkouts = registry.register(Counter(
+    "mongo_pool_checkouts_total", "Connections checked out of the Mongo pool",
+))
+mongo_pool_checkout_failures = registry.register(Counter(
+    "mongo_pool_checkout_failures_total", "Failed Mongo pool checkouts by reason", ("reason",),
+))
+mongo_checkout_wait = registry.register(Histogram(
+    "mongo_pool_checkout_wait_seconds", "Time spent waiting for a Mongo connection",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+))
+
+
+class stage(ContextDecorator):
+    """Time a block or function into `pipeline_stage_duration_seconds{stage=...}`."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._starts: list[float] = []
+
+    def __enter__(self) -> "stage":
+        self._starts.append(time.perf_counter())
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        elapsed = time.perf_counter() - self._starts.pop()
+        stage_duration.observe(elapsed, stage=self.name)
+        if exc_type is not None:
+            stage_errors.inc(stage=self.name)
+
+    def _recreate_cm(self) -> "stage":
+        # A fresh instance per decorated call, so concurrent calls don't share timers
+        return stage(self.name)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware observing request latency per route template.
+
+    The route template (`/api/groceries/{item_id}`), not the raw path, is the
+    label, so ids don't blow up the number of series.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message: dict) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - start,
+                method=scope.get("method", ""),
+                route=getattr(route, "path", None) or "unmatched",
+                status=str(status),
+            )
+
+
+_BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+@registry.on_collect
+def _collect_runtime_gauges() -> None:
+    from admission import llm_ceiling, ocr_ceiling
+    from llm_providers import llm_router
+    from password_hashing import password_hasher
+    from recipe_cache import recipe_cache
+
+    for ceiling in (ocr_ceiling, llm_ceiling):
+        stats = ceiling.stats()
+        admission_queue_depth.set(stats["waiting"], pool=ceiling.name)
+        admission_in_flight.set(stats["in_flight"], pool=ceiling.name)
+    hashing = password_hasher.stats()
+    admission_queue_depth.set(hashing["waiting"], pool="password_hash")
+    admission_in_flight.set(hashing["in_flight"], pool="password_hash")
+    for name, guard in llm_router.guards.items():
+        llm_breaker_state.set(_BREAKER_STATES.get(guard.breaker.state, 0), provider=name)
+        llm_breaker_opened.set_total(guard.breaker.times_opened, provider=name)
+    cache_requests.set_total(recipe_cache.hits, cache="recipe", result="hit")
+    cache_requests.set_total(recipe_cache.misses, cache="recipe", result="miss")
+
+
+@registry.on_collect
+def _collect_mongo_pool() -> None:
+    from database import pool_monitor
+
+    stats = pool_monitor.stats()
+    for state in ("open", "in_use", "waiting"):
+        mongo_pool_connections.set(stats[state], state=state)
+    mongo_pool_checkouts.set_total(stats["checkouts"])
+    for reason, count in stats["checkout_failures"].items():
+        mongo_pool_checkout_failures.set_total(count, reason=reason)
+
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics() -> PlainTextResponse:
+    if not config.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+
+
+def record_tokens(provider: str, prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> None:
+    if prompt_tokens:
+        llm_tokens.inc(prompt_tokens, provider=provider, kind="prompt")
+    if completion_tokens:
+        llm_tokens.inc(completion_tokens, provider=provider, kind="completion")
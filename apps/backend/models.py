@@ -15,6 +15,9 @@ class Receipt(BaseModel):
     file_path: str
     raw_text: str
     grocery_items: List[str] = []
+    created_at: Optional[datetime] = None
+    # Content hash of the receipt image in the image store (see image_store.py)
+    image_sha256: Optional[str] = None
 
 
 class Recipe(BaseModel):
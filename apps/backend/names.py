@@ -0,0 +1,123 @@
+"""Helpers for comparing grocery / ingredient names.
+
+Names come from OCR, the LLM and free-text input, so the same item shows up
+as "Milk", "milk", " MILK " or "Eggs" / "egg". `normalize_name` maps those
+variants to one canonical key (stored on groceries as `name_key`) that is used
+for upserts, lookups, hashing and indexing.
+"""
+
+import re
+from typing import Any, Iterable
+
+from pymongo import UpdateOne
+
+from expiry import expiry_fields
+
+_WHITESPACE_RE = re.compile(r"\s+")
+# Words where a trailing "s" is not a plural marker
+_NOT_PLURAL_ENDINGS = ("ss", "us", "is")
+# Singulars ending in "ie", whose plurals would otherwise become "-y" ("cookies" -> "cooky")
+_IE_SINGULARS = frozenset({
+    "brownie", "cookie", "veggie", "smoothie", "hoagie", "pastie", "beanie", "calorie", "movie", "rookie",
+})
+# Singulars ending in "che"/"she", whose plurals would otherwise lose the "e" ("quiches" -> "quich")
+_E_SINGULARS = frozenset({
+    "quiche", "brioche", "ganache", "cache", "niche", "tranche", "pastiche", "cliche", "creche", "moustache",
+    "mustache", "avalanche", "microfiche",
+})
+# Same form in singular and plural
+_INVARIANT = frozenset({"series", "species"})
+
+
+def singular(word: str) -> str:
+    """Cheap English singularization; only needs to be consistent, not perfect."""
+    if len(word) <= 3 or word in _INVARIANT:
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-1] if word[:-1] in _IE_SINGULARS else word[:-3] + "y"
+    if word.endswith("oes"):
+        return word[:-2]
+    if word.endswith(("ches", "shes", "sses", "xes", "zes")):
+        return word[:-1] if word[:-1] in _E_SINGULARS else word[:-2]
+    if word.endswith("s") and not word.endswith(_NOT_PLURAL_ENDINGS):
+        return word[:-1]
+    return word
+
+
+def normalize_name(name: str) -> str:
+    """Return the canonical comparison key for a grocery or ingredient name.
+
+    Case-folded, whitespace-collapsed, with the last word singularized, so
+    "Green Beans " and "green bean" share a key.
+    """
+    key = str(name or "").strip().strip("\"'").casefold()
+    words = _WHITESPACE_RE.sub(" ", key).strip().split(" ")
+    words[-1] = singular(words[-1])
+    return " ".join(words)
+
+
+def normalized_set(names: Iterable[str]) -> set[str]:
+    """Normalize every name and drop empties."""
+    return {k for k in (normalize_name(n) for n in names) if k}
+
+
+def backfill_name_keys(groceries: Any, receipts: Any = None, dry_run: bool = False) -> dict[str, int]:
+    """Set `name_key` on every grocery and merge per-user duplicates.
+
+    For each (user_id, name_key) group the oldest document is kept, counts are
+    summed into it and the others are deleted. Receipts that referenced a
+    merged-away grocery are repointed at the kept one. Returns counters.
+    """
+    stats = {"updated": 0, "merged": 0}
+    cursor = groceries.find(
+        {}, {"user_id": 1, "name": 1, "name_key": 1, "count": 1, "min_days": 1, "max_days": 1, "created_at": 1}
+    ).sort([("user_id", 1), ("_id", 1)])
+
+    def flush(groups: dict[str, list[dict[str, Any]]]) -> None:
+        ops: list[Any] = []
+        repoint: dict[str, str] = {}
+        drop_ids: list[Any] = []
+        for key, docs in groups.items():
+            keeper, dupes = docs[0], docs[1:]
+            fields: dict[str, Any] = {"name_key": key}
+            if dupes:
+                fields["count"] = sum(int(d.get("count", 1)) for d in docs)
+                if keeper.get("min_days") is None:
+                    # Keep shelf-life info if any duplicate had it
+                    donor = next((d for d in dupes if d.get("min_days") is not None), None)
+                    if donor is not None:
+                        fields["min_days"] = donor["min_days"]
+                        fields["max_days"] = donor.get("max_days")
+                        if keeper.get("created_at") is not None:
+                            fields.update(expiry_fields(keeper["created_at"], fields["min_days"], fields["max_days"]))
+            if dupes or keeper.get("name_key") != key:
+                ops.append(UpdateOne({"_id": keeper["_id"]}, {"$set": fields}))
+                stats["updated"] += 1
+            for d in dupes:
+                drop_ids.append(d["_id"])
+                repoint[str(d["_id"])] = str(keeper["_id"])
+            stats["merged"] += len(dupes)
+        if dry_run:
+            return
+        if ops:
+            groceries.bulk_write(ops, ordered=False)
+        if drop_ids:
+            groceries.delete_many({"_id": {"$in": drop_ids}})
+        if receipts is not None and repoint:
+            receipt_ops = []
+            for r in receipts.find({"grocery_items": {"$in": list(repoint)}}, {"grocery_items": 1}):
+                items = [repoint.get(g, g) for g in r.get("grocery_items", [])]
+                receipt_ops.append(UpdateOne({"_id": r["_id"]}, {"$set": {"grocery_items": items}}))
+            receipts.bulk_write(receipt_ops, ordered=False)
+
+    current_user = None
+    groups: dict[str, list[dict[str, Any]]] = {}
+    for doc in cursor:
+        if doc.get("user_id") != current_user:
+            flush(groups)
+            current_user, groups = doc.get("user_id"), {}
+        key = normalize_name(doc.get("name", ""))
+        if key:
+            groups.setdefault(key, []).append(doc)
+    flush(groups)
+    return stats
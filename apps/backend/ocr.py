@@ -1,12 +1,21 @@
+"""Receipt OCR with Tesseract.
+
+cv2, numpy, pytesseract and Pillow are imported on first use rather than at
+import time: together they are most of the app's cold-start cost, and only
+the upload endpoints need them.
+"""
+
+from __future__ import annotations
+
 import shutil
 import subprocess
 from pathlib import Path
-from typing import Literal
+from typing import TYPE_CHECKING, Literal
+
+from metrics import stage
 
-import cv2
-import numpy as np
-import pytesseract
-from PIL import Image
+if TYPE_CHECKING:
+    import numpy as np
 
 
 PreprocessMethod = Literal["thresh", "blur", "adaptive", "none"]
@@ -28,7 +37,17 @@ def check_tesseract_available() -> bool:
         return False
 
 
+def warm_up() -> None:
+    """Import the OCR stack ahead of the first upload (run in a background thread at startup)."""
+    import cv2  # noqa: F401
+    import numpy  # noqa: F401
+    import pytesseract  # noqa: F401
+    from PIL import Image  # noqa: F401
+
+
 def preprocess_image(image: np.ndarray, method: PreprocessMethod = "thresh") -> np.ndarray:
+    import cv2
+
     if len(image.shape) == 3:
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
     else:
@@ -54,25 +73,33 @@ def preprocess_image(image: np.ndarray, method: PreprocessMethod = "thresh") ->
 
 
 def ocr_image(file_path: Path | str, preprocess: PreprocessMethod = "thresh") -> str:
+    import cv2
+    import numpy as np
+    import pytesseract
+    from PIL import Image
+
     file_path = Path(file_path)
     
     if not file_path.exists():
         raise FileNotFoundError(f"Image file not found: {file_path}")
     
     try:
-        pil_image = Image.open(file_path)
-        image_array = np.array(pil_image)
-        if len(image_array.shape) == 3 and image_array.shape[2] == 3:
-            image_array = cv2.cvtColor(image_array, cv2.COLOR_RGB2BGR)
+        with stage("image_decode"):
+            pil_image = Image.open(file_path)
+            image_array = np.array(pil_image)
+            if len(image_array.shape) == 3 and image_array.shape[2] == 3:
+                image_array = cv2.cvtColor(image_array, cv2.COLOR_RGB2BGR)
         
     except Exception as e:
         raise ValueError(f"Failed to load image: {str(e)}")
     
     try:
-        processed_image = preprocess_image(image_array, preprocess)
-        pil_processed = Image.fromarray(processed_image)
+        with stage("preprocess"):
+            processed_image = preprocess_image(image_array, preprocess)
+            pil_processed = Image.fromarray(processed_image)
         custom_config = r'--oem 3 --psm 6'
-        text = pytesseract.image_to_string(pil_processed, config=custom_config)
+        with stage("tesseract"):
+            text = pytesseract.image_to_string(pil_processed, config=custom_config)
         
         return text.strip()
         
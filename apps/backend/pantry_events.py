@@ -0,0 +1,44 @@
+"""Single hook for "this user's data changed".
+
+Every grocery mutation (manual add/delete, receipt and text ingestion) calls
+`pantry_changed` so derived state stays in sync in one place. Recipe and
+receipt writes call `bump_version(user_id, "recipes")` / `"receipts"` directly.
+
+Each user has one document in the `pantry_versions` collection holding a
+counter per data collection (groceries, recipes, receipts), incremented
+atomically on every mutation of that collection. List endpoints expose their
+collection's counter as an ETag (see etag.py) so unchanged lists can be
+answered with 304 without reading the data collections, and a change to one
+collection (saving a recipe) leaves the others' tags and caches valid.
+"""
+
+from database import get_pantry_versions_collection
+from recipe_cache import recipe_cache
+from recipe_scheduler import recipe_scheduler
+
+KINDS = ("groceries", "recipes", "receipts")
+
+
+def bump_version(user_id: str, kind: str) -> None:
+    """Atomically increment the user's version of one data collection."""
+    if kind not in KINDS:
+        raise ValueError(f"Unknown data collection: {kind}")
+    get_pantry_versions_collection().update_one({"_id": str(user_id)}, {"$inc": {kind: 1}}, upsert=True)
+
+
+def current_versions(user_id: str) -> dict[str, int]:
+    """The user's version of every data collection, in one read."""
+    doc = get_pantry_versions_collection().find_one({"_id": str(user_id)}) or {}
+    return {kind: int(doc.get(kind, 0)) for kind in KINDS}
+
+
+def current_version(user_id: str, kind: str) -> int:
+    return current_versions(user_id)[kind]
+
+
+def pantry_changed(user_id: str) -> None:
+    """Call after mutating the groceries collection for this user."""
+    user_id = str(user_id)
+    bump_version(user_id, "groceries")
+    recipe_cache.invalidate(user_id)
+    recipe_scheduler.notify_pantry_changed(user_id)
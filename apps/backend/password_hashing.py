@@ -0,0 +1,96 @@
+"""bcrypt hashing on a dedicated executor.
+
+A bcrypt verify at a realistic cost takes ~250 ms of CPU. Run on FastAPI's
+shared threadpool, a burst of logins takes every slot and stalls all other
+sync endpoints. Here hashing runs on its own small thread pool
+(PASSWORD_HASH_WORKERS, default one per core; bcrypt releases the GIL) and
+login/register await it from the event loop. At most
+PASSWORD_HASH_MAX_QUEUE requests may wait for a worker; beyond that they get
+503 with Retry-After rather than queueing without bound.
+
+The work factor is BCRYPT_ROUNDS. Hashes made with a different factor still
+verify, and `verify_and_update` returns a replacement hash at the current
+factor so login can upgrade (or downgrade) stored hashes transparently.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from config import config
+
+T = TypeVar("T")
+
+
+def make_context(rounds: int) -> CryptContext:
+    # min == max == default: any hash at another factor "needs update"
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+class PasswordHasher:
+    def __init__(self, context: CryptContext, workers: int, max_queue: int):
+        self.context = context
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    async def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        with self._lock:
+            if self.in_flight >= self.workers + self.max_queue:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Server is busy (auth), please retry shortly",
+                    headers={"Retry-After": "1"},
+                )
+            self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed: str) -> tuple[bool, Optional[str]]:
+        """(valid, new_hash); new_hash is set when the stored hash uses another work factor."""
+        if not hashed:
+            return False, None
+        try:
+            return await self._run(self.context.verify_and_update, password, hashed)
+        except ValueError:
+            # Not a hash this context recognizes
+            return False, None
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            running = min(self.in_flight, self.workers)
+            return {
+                "workers": self.workers,
+                "in_flight": running,
+                "waiting": self.in_flight - running,
+                "max_queue": self.max_queue,
+            }
+
+
+pwd_context = make_context(config.BCRYPT_ROUNDS)
+password_hasher = PasswordHasher(
+    pwd_context,
+    workers=config.PASSWORD_HASH_WORKERS or os.cpu_count() or 2,
+    max_queue=config.PASSWORD_HASH_MAX_QUEUE,
+)
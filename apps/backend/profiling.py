@@ -0,0 +1,246 @@
+"""Opt-in sampling profiler for live requests.
+
+Off unless PROFILING_ENABLED is set. A request is profiled when:
+
+- an admin (ADMIN_EMAILS) sends `X-Profile: 1` or `?profile=1`, or
+- PROFILE_SAMPLE_EVERY_N is set and it is the Nth request since the last one.
+
+While a request runs, a sampler thread snapshots every thread's Python stack
+each PROFILE_INTERVAL_MS and counts identical stacks. OCR and parsing run in
+worker threads, so all busy threads are sampled, not just the one that
+accepted the request; idle threads (waiting on a lock, queue or selector) are
+skipped. Only one request is profiled at a time, so under concurrency the
+samples can include work from other requests.
+
+Profiles are written in the collapsed-stack format (`frame;frame;frame count`
+per line) that flamegraph.pl, speedscope and most flamegraph tools read. They
+are kept in a ring buffer of PROFILE_MAX_FILES files under PROFILE_DIR; the
+response carries `X-Profile-Id` and admins list and download profiles under
+/api/admin/profiles.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import sys
+import tempfile
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Optional
+from urllib.parse import parse_qs
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from jose import jwt
+
+from auth import User, get_admin_user
+from config import config
+
+# Frames a thread sits in while it has nothing to do
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+}
+_PROFILE_NAME_RE = re.compile(r"^\d{8}T\d{6}-\d{6}-[A-Z]+-[\w.-]*\.collapsed$")
+
+
+def _label(frame: Any) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples all threads' stacks from a background thread until stopped."""
+
+    def __init__(self, interval_seconds: float = 0.005):
+        self.interval_seconds = interval_seconds
+        self.samples: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Counter[str]:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.samples
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval_seconds):
+            if len(names) != threading.active_count():
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in _IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.samples[";".join(reversed(stack))] += 1
+
+    @staticmethod
+    def collapsed(samples: Counter[str]) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+
+class ProfileStore:
+    """Ring buffer of collapsed-stack files; the oldest are dropped past `max_files`."""
+
+    def __init__(self, root: Path, max_files: int = 50):
+        self.root = Path(root)
+        self.max_files = max(1, max_files)
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def new_id(self, method: str, route: str) -> str:
+        """Sortable, unique file name: time, sequence, method and route."""
+        with self._lock:
+            self._seq = (self._seq + 1) % 1_000_000
+            seq = self._seq
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        slug = re.sub(r"[^\w.-]+", "_", route.strip("/")).strip("_")[:60]
+        return f"{stamp}-{seq:06d}-{re.sub(r'[^A-Z]', '', method.upper()) or 'X'}-{slug}.collapsed"
+
+    def save(self, profile_id: str, body: str) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(body)
+            os.replace(tmp, self.root / profile_id)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        self._prune()
+
+    def _prune(self) -> None:
+        files = self._files()
+        for path in files[self.max_files:]:
+            path.unlink(missing_ok=True)
+
+    def _files(self) -> list[Path]:
+        """Newest first."""
+        if not self.root.exists():
+            return []
+        return sorted(
+            (p for p in self.root.iterdir() if _PROFILE_NAME_RE.match(p.name)),
+            key=lambda p: p.name,
+            reverse=True,
+        )
+
+    def list(self) -> list[dict[str, Any]]:
+        out = []
+        for path in self._files():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            out.append({
+                "id": path.name,
+                "bytes": stat.st_size,
+                "created_at": datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+            })
+        return out
+
+    def path(self, profile_id: str) -> Optional[Path]:
+        if not _PROFILE_NAME_RE.match(profile_id):
+            return None
+        path = self.root / profile_id
+        return path if path.exists() else None
+
+
+def _is_admin_token(headers: dict[bytes, bytes]) -> bool:
+    auth = headers.get(b"authorization", b"").decode("latin-1")
+    if not auth.lower().startswith("bearer "):
+        return False
+    try:
+        payload = jwt.decode(auth[7:], config.SECRET_KEY, algorithms=[config.ALGORITHM])
+    except Exception:
+        return False
+    return str(payload.get("email", "")).lower() in config.ADMIN_EMAILS
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware deciding which requests to profile and saving the result."""
+
+    def __init__(self, app: Any, store: ProfileStore, sample_every_n: int = 0, interval_seconds: float = 0.005):
+        self.app = app
+        self.store = store
+        self.sample_every_n = max(0, sample_every_n)
+        self.interval_seconds = interval_seconds
+        self._count = 0
+        self._busy = threading.Lock()
+
+    def _wanted(self, scope: dict) -> bool:
+        headers = dict(scope.get("headers") or [])
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        if headers.get(b"x-profile") == b"1" or query.get("profile") == ["1"]:
+            return _is_admin_token(headers)
+        if self.sample_every_n:
+            self._count += 1
+            if self._count >= self.sample_every_n:
+                self._count = 0
+                return True
+        return False
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or not self._wanted(scope) or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = SamplingProfiler(self.interval_seconds)
+        profile_id = ""
+
+        async def send_with_id(message: dict) -> None:
+            nonlocal profile_id
+            if message["type"] == "http.response.start":
+                # Routing has happened by now, so the route template is known
+                route = getattr(scope.get("route"), "path", None) or scope.get("path", "")
+                profile_id = self.store.new_id(scope.get("method", ""), route)
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            samples = profiler.stop()
+            self._busy.release()
+            if profile_id:
+                try:
+                    self.store.save(profile_id, SamplingProfiler.collapsed(samples))
+                except OSError as e:
+                    print(f"Warning: failed to save request profile: {e}")
+
+
+profile_store = ProfileStore(config.PROFILE_DIR, max_files=config.PROFILE_MAX_FILES)
+
+router = APIRouter(prefix="/api/admin/profiles", tags=["admin"])
+
+
+@router.get("")
+def list_profiles(admin: User = Depends(get_admin_user)) -> list[dict[str, Any]]:
+    """Stored profiles, newest first."""
+    return profile_store.list()
+
+
+@router.get("/{profile_id}")
+def download_profile(profile_id: str, admin: User = Depends(get_admin_user)) -> FileResponse:
+    path = profile_store.path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain; charset=utf-8", filename=profile_id)
@@ -0,0 +1,83 @@
+"""Purchase log: one event per grocery bought.
+
+Groceries are one document per name per user (see names.py), so buying milk
+again only `$inc`s the existing document and its `created_at` stays the first
+purchase. Purchase analytics need every purchase, so each add also appends
+an event to `grocery_purchases`:
+
+  user_id: ObjectId of the buyer
+  grocery_id: ObjectId of the grocery document it was added to
+  name / name_key: the name as entered and its canonical key
+  units: how many were added
+  created_at: datetime (UTC) of the purchase
+
+The log is append-only and written after the grocery upsert. A failed log
+write is reported but never fails the add itself.
+"""
+
+from datetime import datetime
+from typing import Any, Iterable
+
+from pymongo import InsertOne
+from pymongo.errors import PyMongoError
+
+from database import get_purchases_collection
+
+
+def purchase_event(user_id: Any, grocery: dict[str, Any], units: int, at: datetime) -> dict[str, Any]:
+    """The log entry for adding `units` of the grocery document `grocery`."""
+    return {
+        "user_id": user_id,
+        "grocery_id": grocery["_id"],
+        "name": grocery.get("name", ""),
+        "name_key": grocery.get("name_key"),
+        "units": int(units),
+        "created_at": at,
+    }
+
+
+def record_purchases(events: Iterable[dict[str, Any]]) -> None:
+    events = list(events)
+    if not events:
+        return
+    try:
+        get_purchases_collection().insert_many(events, ordered=False)
+    except PyMongoError as e:
+        print(f"Warning: could not record {len(events)} purchase(s): {e}")
+
+
+def backfill_purchases(groceries: Any, purchases: Any, batch_size: int = 500, dry_run: bool = False) -> int:
+    """Log one purchase per grocery document written before the log existed.
+
+    Each event is dated at the grocery's `created_at` with its current count,
+    the best the documents can tell. Documents that already have an event are
+    skipped, so the backfill can be re-run. Processes groceries in `_id`
+    order, `batch_size` at a time, with one bulk_write per batch. Returns the
+    number of events written (or that would be).
+    """
+    written = 0
+    last_id = None
+    while True:
+        query: dict[str, Any] = {} if last_id is None else {"_id": {"$gt": last_id}}
+        batch = list(
+            groceries.find(query, {"user_id": 1, "name": 1, "name_key": 1, "count": 1, "created_at": 1})
+            .sort("_id", 1)
+            .limit(batch_size)
+        )
+        if not batch:
+            return written
+        last_id = batch[-1]["_id"]
+
+        logged = set(purchases.distinct("grocery_id", {"grocery_id": {"$in": [d["_id"] for d in batch]}}))
+        ops = [
+            InsertOne({
+                **purchase_event(doc.get("user_id"), doc, doc.get("count", 1),
+                                 doc.get("created_at") or doc["_id"].generation_time),
+                "backfilled": True,
+            })
+            for doc in batch
+            if doc["_id"] not in logged
+        ]
+        if ops and not dry_run:
+            purchases.bulk_write(ops, ordered=False)
+        written += len(ops)
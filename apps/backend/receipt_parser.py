@@ -4,11 +4,39 @@ import json
 import re
 from typing import Any
 from config import config
+from llm_providers import llm_router
+from llm_resilience import LLMUnavailable
+from metrics import stage
 
-try:
-    import google.generativeai as genai
-except Exception:
-    genai = None
+
+# Receipt lines that are never items
+_NON_ITEM_RE = re.compile(
+    r"\b(sub\s*total|total|tax|change|cash|visa|mastercard|amex|debit|credit|card|balance|"
+    r"savings|discount|coupon|tender|auth|approval|receipt|thank|store|tel|phone|www)\b",
+    re.IGNORECASE,
+)
+# Trailing price, optionally followed by a tax flag ("3.49", "3.49 F", "$3.49-")
+_PRICE_RE = re.compile(r"\$?\d+[.,]\d{2}\s*-?\s*[A-Z]?\s*$")
+
+
+def fallback_parse(ocr_text: str) -> list[dict[str, Any]]:
+    """Heuristic, LLM-free item extraction used while the model is unavailable.
+
+    Keeps lines that end with a price and aren't totals/payment lines, and
+    strips prices, quantities and product codes. No shelf-life estimates.
+    """
+    items: list[dict[str, Any]] = []
+    for raw in ocr_text.splitlines():
+        line = raw.strip()
+        if not _PRICE_RE.search(line) or _NON_ITEM_RE.search(line):
+            continue
+        name = _PRICE_RE.sub("", line)
+        name = re.sub(r"\b\d+\s*[x@]\s*", " ", name, flags=re.IGNORECASE)  # "2 x", "3 @"
+        name = re.sub(r"[^A-Za-z\s'&-]", " ", name)  # codes, weights, stray symbols
+        name = re.sub(r"\s+", " ", name).strip(" -'&")
+        if len(name) >= 3:
+            items.append({"name": name.title()})
+    return items
 
 
 class ReceiptParser:
@@ -21,15 +49,9 @@ class ReceiptParser:
     """
 
     def __init__(self, user_id: str):
-        if not config.GEMINI_API_KEY:
-            raise ValueError("GEMINI_API_KEY is required")
-
-        if genai is None:
-            raise ImportError("google-generativeai is not installed.")
+        if not llm_router.available():
+            raise ValueError("No LLM provider is configured (see LLM_PROVIDERS)")
 
-        genai.configure(api_key=config.GEMINI_API_KEY)
-        # Broad typing to avoid issues when genai is mocked/unavailable at analysis time
-        self.model = genai.GenerativeModel(config.LLM_MODEL)
         self.max_tokens = int(config.LLM_MAX_TOKENS)
         self.temperature = float(config.LLM_TEMPERATURE)
         self.user_id = user_id
@@ -37,8 +59,11 @@ class ReceiptParser:
     def parse_receipt_text(self, ocr_text: str) -> list[dict[str, Any]]:
         """Return a list of item dicts parsed from the receipt text.
 
-        If the model call fails or the model returns invalid JSON, return an
-        empty list (caller will handle uploading if desired).
+        If the model is unavailable (circuit breaker open, deadline exceeded or
+        retries exhausted), fall back to a heuristic line parser so the upload
+        still yields item names, without shelf-life data. If the call fails
+        otherwise or the model returns invalid JSON, return an empty list
+        (caller will handle uploading if desired).
         """
         if not ocr_text or not ocr_text.strip():
             return []
@@ -47,6 +72,9 @@ class ReceiptParser:
 
         try:
             response_text = self._call_model(prompt)
+        except LLMUnavailable as e:
+            print(f"Warning: LLM unavailable, using heuristic receipt parsing: {e}")
+            return fallback_parse(ocr_text)
         except Exception:
             # Modeling service failed; treat as no items found.
             return []
@@ -57,30 +85,9 @@ class ReceiptParser:
         except Exception:
             return []
 
+    @stage("llm_call")
     def _call_model(self, prompt: str) -> str:
-        generation_config = genai.types.GenerationConfig(
-            temperature=self.temperature,
-            max_output_tokens=self.max_tokens,
-        )
-        resp = self.model.generate_content(
-            prompt,
-            generation_config=generation_config,
-        )
-        if isinstance(resp, str):
-            return resp
-
-        if hasattr(resp, "text") and resp.text:
-            return resp.text
-
-        if hasattr(resp, "content") and resp.content:
-            return resp.content
-        if hasattr(resp, "candidates") and getattr(resp, "candidates"):
-            first = resp.candidates[0]
-            if isinstance(first, dict):
-                return first.get("content") or first.get("output") or json.dumps(first)
-            if hasattr(first, "content"):
-                return first.content
-        return str(resp)
+        return llm_router.generate(prompt, temperature=self.temperature, max_tokens=self.max_tokens)
 
     def _build_prompt(self, ocr_text: str) -> str:
         """Construct the LLM prompt; include USER_ID and the receipt text.
@@ -125,6 +132,7 @@ class ReceiptParser:
 
         return "".join(parts)
 
+    @stage("mongo_write")
     def add_groceries_to_db(self, items: list[dict[str, Any]]) -> list[str]:
         """Insert parsed items into the groceries collection.
 
@@ -136,6 +144,9 @@ class ReceiptParser:
         from datetime import datetime, timezone
         from bson import ObjectId
         from database import get_groceries_collection
+        from expiry import expiry_fields
+        from names import normalize_name
+        from purchases import purchase_event, record_purchases
 
         col = get_groceries_collection()
         user_oid = ObjectId(self.user_id)
@@ -143,12 +154,16 @@ class ReceiptParser:
         from pymongo import ReturnDocument
 
         inserted_ids: list[str] = []
+        events: list[dict[str, Any]] = []
 
         for i in items:
             if not (isinstance(i, dict) and "name" in i):
                 continue
 
             name = str(i.get("name"))
+            name_key = normalize_name(name)
+            if not name_key:
+                continue
             # Determine increment amount; default to 1 if not provided/invalid
             try:
                 inc_by = int(i.get("count", 1))
@@ -171,11 +186,14 @@ class ReceiptParser:
                     set_on_insert["max_days"] = int(max_raw)
                 except (TypeError, ValueError):
                     pass
+            set_on_insert.update(expiry_fields(
+                now, set_on_insert.get("min_days"), set_on_insert.get("max_days")
+            ))
 
             # Atomically increment count and create doc if missing; return the doc after update
             try:
                 updated = col.find_one_and_update(
-                    {"user_id": user_oid, "name": name},
+                    {"user_id": user_oid, "name_key": name_key},
                     {"$inc": {"count": inc_by}, "$setOnInsert": set_on_insert},
                     upsert=True,
                     return_document=ReturnDocument.AFTER,
@@ -186,9 +204,16 @@ class ReceiptParser:
 
             if updated and updated.get("_id"):
                 inserted_ids.append(str(updated.get("_id")))
+                events.append(purchase_event(user_oid, updated, inc_by, now))
+
+        record_purchases(events)
+        if inserted_ids:
+            from pantry_events import pantry_changed
+            pantry_changed(self.user_id)
 
         return inserted_ids
 
+    @stage("json_parse")
     def _parse_response(self, response_text: str) -> list[dict[str, Any]]:
         """Extract and validate JSON array from model output.
 
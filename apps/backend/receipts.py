@@ -1,17 +1,54 @@
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from admission import rate_limit
 from auth import get_current_user, User
 from database import get_receipts_collection
+from etag import check_not_modified
+from fast_lists import list_response, projection
+from image_store import image_store
 from models import Receipt
 from typing import List
 
-router = APIRouter(prefix="/api/receipts", tags=["receipts"])
+router = APIRouter(prefix="/api/receipts", tags=["receipts"], dependencies=[Depends(rate_limit("crud"))])
+
+_RECEIPT_SHAPE = projection(
+    ("user_id", "file_path", "raw_text"), with_id=False, grocery_items=[], created_at=None, image_sha256=None
+)
 
 @router.get("/", response_model=List[Receipt])
-def list_receipts(current_user: User = Depends(get_current_user)):
+def list_receipts(request: Request, response: Response, current_user: User = Depends(get_current_user)):
     receipts_col = get_receipts_collection()
-    cursor = receipts_col.find({"user_id": current_user.id})
-    receipts = []
-    for doc in cursor:
-        receipts.append(Receipt(**doc))
-    return receipts
+    not_modified = check_not_modified(request, response, current_user.id, "receipts")
+    if not_modified is not None:
+        return not_modified
+    cursor = receipts_col.aggregate([{"$match": {"user_id": current_user.id}}, _RECEIPT_SHAPE])
+    return list_response(cursor, response)
+
+
+def _owned_image(sha256: str, current_user: User) -> None:
+    """404 unless one of the user's receipts references this image."""
+    found = get_receipts_collection().find_one(
+        {"user_id": current_user.id, "image_sha256": sha256.lower()}, {"_id": 1}
+    )
+    if not found:
+        raise HTTPException(status_code=404, detail="Receipt image not found")
+
+
+@router.get("/images/{sha256}")
+def get_receipt_image(sha256: str, current_user: User = Depends(get_current_user)):
+    """The best copy still stored: the original, or its grayscale WebP once originals expire."""
+    _owned_image(sha256, current_user)
+    path = image_store.best_image(sha256.lower())
+    if path is None:
+        raise HTTPException(status_code=404, detail="Receipt image no longer stored")
+    return FileResponse(path, headers={"Cache-Control": "private, max-age=86400, immutable"})
+
+
+@router.get("/images/{sha256}/thumbnail")
+def get_receipt_thumbnail(sha256: str, current_user: User = Depends(get_current_user)):
+    _owned_image(sha256, current_user)
+    path = image_store.thumbnail(sha256.lower())
+    if path is None:
+        raise HTTPException(status_code=404, detail="Thumbnail not available yet")
+    return FileResponse(path, media_type="image/webp", headers={"Cache-Control": "private, max-age=86400, immutable"})
@@ -0,0 +1,143 @@
+"""In-process cache of generated recipes.
+
+Generating a recipe costs a full LLM round trip, so for each user we keep a
+small pool of recipe variants generated for their current pantry. The pool is
+keyed by a hash of the normalized ingredient set: when the pantry's set of
+ingredients changes the key changes and the old pool is never served again.
+
+Each variant is handed out at most once ("unseen"). After serving, callers
+schedule a background refill so the next request is also instant.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Optional
+
+from config import config
+from names import normalized_set
+
+
+def ingredient_key(ingredients: Iterable[str]) -> str:
+    """Stable hash of the normalized ingredient set (order and case insensitive)."""
+    joined = "\n".join(sorted(normalized_set(ingredients)))
+    return hashlib.sha256(joined.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _Pool:
+    key: str
+    created_at: float = field(default_factory=time.monotonic)
+    variants: list[Any] = field(default_factory=list)
+    served_titles: list[str] = field(default_factory=list)
+    refilling: bool = False
+
+
+class RecipeCache:
+    """Per-user pool of unseen recipe variants for one ingredient set."""
+
+    def __init__(self, pool_size: int, ttl_seconds: int, refill_workers: int = 1):
+        self.pool_size = pool_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._pools: dict[str, _Pool] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, refill_workers), thread_name_prefix="recipe-refill"
+        )
+
+    def _pool_for(self, user_id: str, key: str) -> _Pool:
+        """Return the live pool for (user, key), replacing a stale or expired one.
+
+        Caller must hold the lock.
+        """
+        pool = self._pools.get(user_id)
+        expired = pool is not None and time.monotonic() - pool.created_at > self.ttl_seconds
+        if pool is None or pool.key != key or expired:
+            pool = _Pool(key=key)
+            self._pools[user_id] = pool
+        return pool
+
+    def take(self, user_id: str, key: str) -> Optional[Any]:
+        """Pop an unseen variant for this ingredient set, or None on a miss."""
+        with self._lock:
+            pool = self._pool_for(user_id, key)
+            if not pool.variants:
+                self.misses += 1
+                return None
+            self.hits += 1
+            recipe = pool.variants.pop(0)
+            pool.served_titles.append(getattr(recipe, "title", ""))
+            return recipe
+
+    def mark_served(self, user_id: str, key: str, recipe: Any) -> None:
+        """Record a recipe generated on the request path so refills avoid it."""
+        with self._lock:
+            self._pool_for(user_id, key).served_titles.append(getattr(recipe, "title", ""))
+
+    def put(self, user_id: str, key: str, recipe: Any) -> bool:
+        """Add a variant; dropped if the pool was invalidated or moved to a new key."""
+        with self._lock:
+            pool = self._pools.get(user_id)
+            if pool is None or pool.key != key or len(pool.variants) >= self.pool_size:
+                return False
+            pool.variants.append(recipe)
+            return True
+
+    def known_titles(self, user_id: str, key: str) -> list[str]:
+        """Titles already pooled or served for this ingredient set."""
+        with self._lock:
+            pool = self._pools.get(user_id)
+            if pool is None or pool.key != key:
+                return []
+            return pool.served_titles + [getattr(r, "title", "") for r in pool.variants]
+
+    def invalidate(self, user_id: str) -> None:
+        """Drop the user's pool (called whenever their pantry changes)."""
+        with self._lock:
+            self._pools.pop(user_id, None)
+
+    def schedule_refill(self, user_id: str, key: str, generate: Callable[[list[str]], Optional[Any]]) -> bool:
+        """Top the pool back up to `pool_size` in the background.
+
+        `generate` receives the titles to avoid and returns a recipe or None.
+        At most one refill runs per user at a time. Returns True if scheduled.
+        """
+        with self._lock:
+            pool = self._pools.get(user_id)
+            if pool is None or pool.key != key or pool.refilling or len(pool.variants) >= self.pool_size:
+                return False
+            pool.refilling = True
+
+        self._executor.submit(self._refill, user_id, key, generate)
+        return True
+
+    def _refill(self, user_id: str, key: str, generate: Callable[[list[str]], Optional[Any]]) -> None:
+        try:
+            # Bounded number of attempts so a failing model can't spin forever.
+            for _ in range(self.pool_size):
+                with self._lock:
+                    pool = self._pools.get(user_id)
+                    if pool is None or pool.key != key or len(pool.variants) >= self.pool_size:
+                        return
+                recipe = generate(self.known_titles(user_id, key))
+                if recipe is None or not self.put(user_id, key, recipe):
+                    return
+        except Exception as e:
+            print(f"Warning: recipe cache refill failed: {e}")
+        finally:
+            with self._lock:
+                pool = self._pools.get(user_id)
+                if pool is not None and pool.key == key:
+                    pool.refilling = False
+
+
+recipe_cache = RecipeCache(
+    pool_size=config.RECIPE_CACHE_POOL_SIZE,
+    ttl_seconds=config.RECIPE_CACHE_TTL_SECONDS,
+)
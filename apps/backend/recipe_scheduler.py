@@ -0,0 +1,134 @@
+"""Background recipe pre-generation.
+
+Pantry mutations notify the scheduler, which waits for the user's pantry to
+settle (debounce) and then generates a few recipes for the new ingredient set.
+Results are stored in the `recipes` collection with `source: "ai_generated"`
+and `pregenerated: True` so `generate_recipe` can answer from Mongo instead of
+waiting on the model. Pre-generated docs are hidden from the saved-recipe
+endpoints and are removed once served or when the ingredient set changes.
+"""
+
+from __future__ import annotations
+
+import threading
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from bson import ObjectId
+
+from config import config
+from database import get_recipes_collection
+from llm_limits import llm_limiter
+from names import normalized_set
+from recipe_cache import ingredient_key
+
+
+class RecipePregenScheduler:
+    def __init__(self, debounce_seconds: float, recipes_per_user: int, enabled: bool = True):
+        self.debounce_seconds = debounce_seconds
+        self.recipes_per_user = recipes_per_user
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._timers: dict[str, threading.Timer] = {}
+        self._running: set[str] = set()
+        # Users whose pantry changed while their run was in progress
+        self._dirty: set[str] = set()
+
+    def notify_pantry_changed(self, user_id: str) -> None:
+        """(Re)start the user's debounce timer; bursts of changes cause one run."""
+        if not self.enabled:
+            return
+        with self._lock:
+            timer = self._timers.pop(user_id, None)
+            if timer is not None:
+                timer.cancel()
+            timer = threading.Timer(self.debounce_seconds, self._fire, args=(user_id,))
+            timer.daemon = True
+            self._timers[user_id] = timer
+            timer.start()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            for timer in self._timers.values():
+                timer.cancel()
+            self._timers.clear()
+            self._dirty.clear()
+
+    def _fire(self, user_id: str) -> None:
+        with self._lock:
+            self._timers.pop(user_id, None)
+            if user_id in self._running:
+                # The running pass may have read the old pantry; go again once it ends.
+                self._dirty.add(user_id)
+                return
+            self._running.add(user_id)
+        try:
+            self.run_for_user(user_id)
+        except Exception as e:
+            print(f"Warning: recipe pre-generation failed for {user_id}: {e}")
+        finally:
+            with self._lock:
+                self._running.discard(user_id)
+                rerun = user_id in self._dirty
+                self._dirty.discard(user_id)
+            if rerun:
+                self.notify_pantry_changed(user_id)
+
+    def run_for_user(self, user_id: str) -> int:
+        """Top up the user's stored pool for their current pantry; returns recipes added."""
+        # Imported here: groceries imports this module via pantry_events.
+        from groceries import _generate_recipe, _pantry_ingredients, _previous_recipe_titles
+
+        col = get_recipes_collection()
+        ingredients = _pantry_ingredients(ObjectId(user_id))
+        if not ingredients:
+            col.delete_many({"user_id": user_id, "pregenerated": True})
+            return 0
+
+        key = ingredient_key(ingredients)
+        # Recipes generated for an older pantry are no longer cookable.
+        col.delete_many({"user_id": user_id, "pregenerated": True, "ingredient_key": {"$ne": key}})
+        stored = list(col.find(
+            {"user_id": user_id, "pregenerated": True, "ingredient_key": key}, {"title": 1}
+        ))
+        titles = [d.get("title", "") for d in stored]
+
+        added = 0
+        for _ in range(self.recipes_per_user - len(stored)):
+            if not llm_limiter.budget_available():
+                break
+            with llm_limiter.background():
+                recipe = _generate_recipe(ingredients, _previous_recipe_titles(user_id) + titles)
+            if recipe is None:
+                break
+            col.insert_one({
+                "user_id": user_id,
+                "title": recipe.title,
+                "ingredients": recipe.ingredients_used,
+                "ingredient_keys": sorted(normalized_set(recipe.ingredients_used)),
+                "steps": recipe.steps,
+                "estimated_minutes": recipe.estimated_minutes,
+                "source": "ai_generated",
+                "pregenerated": True,
+                "ingredient_key": key,
+                "created_at": datetime.now(timezone.utc),
+            })
+            titles.append(recipe.title)
+            added += 1
+        return added
+
+
+def take_pregenerated(user_id: str, key: str) -> Optional[dict[str, Any]]:
+    """Atomically claim one stored recipe for this ingredient set (oldest first)."""
+    col = get_recipes_collection()
+    return col.find_one_and_delete(
+        {"user_id": user_id, "pregenerated": True, "ingredient_key": key},
+        sort=[("created_at", 1)],
+    )
+
+
+recipe_scheduler = RecipePregenScheduler(
+    debounce_seconds=config.RECIPE_PREGEN_DEBOUNCE_SECONDS,
+    recipes_per_user=config.RECIPE_PREGEN_COUNT,
+    enabled=config.RECIPE_PREGEN_ENABLED,
+)
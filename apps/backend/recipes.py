@@ -1,13 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from bson import ObjectId
-from typing import List, Optional
+from typing import Any, List, Optional
+from admission import rate_limit
 from auth import get_current_user, User
-from database import get_recipes_collection
+from database import get_groceries_collection, get_recipes_collection
+from expiry import expiry_fields
 from models import Recipe
+from etag import check_not_modified
+from fast_lists import list_response, projection
+from names import normalized_set
+from pantry_events import bump_version
 from pydantic import BaseModel, Field
 from datetime import datetime, timezone
+import heapq
 
-router = APIRouter(prefix="/api/recipes", tags=["recipes"])
+router = APIRouter(prefix="/api/recipes", tags=["recipes"], dependencies=[Depends(rate_limit("crud"))])
+
+# Recipes pre-generated in the background (see recipe_scheduler.py) live in the
+# same collection but are not part of the user's saved list until served.
+_SAVED = {"pregenerated": {"$ne": True}}
 
 
 class RecipeCreate(BaseModel):
@@ -26,6 +37,29 @@ class RecipeUpdate(BaseModel):
     source: Optional[str] = None
 
 
+class RankedRecipe(BaseModel):
+    id: str
+    title: str
+    score: float = Field(..., description="Coverage plus a bonus for using soon-to-expire items; breaks coverage ties")
+    coverage: float = Field(..., ge=0, le=1, description="Share of the recipe's ingredients in the pantry")
+    matched_ingredients: List[str] = Field(default_factory=list)
+    missing_ingredients: List[str] = Field(default_factory=list)
+    soonest_expiry_days: Optional[float] = Field(None, description="Days until the first matched ingredient may expire")
+
+
+# How much using soon-to-expire ingredients counts relative to pantry coverage.
+_EXPIRY_WEIGHT = 0.5
+
+
+def _ingredient_keys(ingredients: List[str]) -> List[str]:
+    """Normalized ingredient names stored on each recipe.
+
+    The (user_id, ingredient_keys) multikey index turns this field into an
+    inverted index from ingredient to recipes.
+    """
+    return sorted(normalized_set(ingredients))
+
+
 def _oid(id_str: str) -> ObjectId:
     try:
         return ObjectId(id_str)
@@ -34,14 +68,24 @@ def _oid(id_str: str) -> ObjectId:
 
 
 @router.get("/", response_model=List[Recipe])
-def list_recipes(current_user: User = Depends(get_current_user)):
+def list_recipes(request: Request, response: Response, current_user: User = Depends(get_current_user)):
     col = get_recipes_collection()
-    cursor = col.find({"user_id": current_user.id}).sort("created_at", -1)
-    out: List[Recipe] = []
-    for doc in cursor:
-        doc["id"] = str(doc.get("_id"))
-        out.append(Recipe(**doc))
-    return out
+    not_modified = check_not_modified(request, response, current_user.id, "recipes")
+    if not_modified is not None:
+        return not_modified
+    cursor = col.aggregate([
+        {"$match": {"user_id": current_user.id, **_SAVED}},
+        {"$sort": {"created_at": -1}},
+        projection(
+            ("user_id", "title"),
+            ingredients=[],
+            steps=[],
+            estimated_minutes=20,
+            source=None,
+            created_at=datetime.now(timezone.utc),
+        ),
+    ])
+    return list_response(cursor, response)
 
 
 @router.post("/", response_model=Recipe, status_code=status.HTTP_201_CREATED)
@@ -54,18 +98,107 @@ def create_recipe(body: RecipeCreate, current_user: User = Depends(get_current_u
         "steps": body.steps,
         "estimated_minutes": body.estimated_minutes,
         "source": body.source or "manual",
+        "ingredient_keys": _ingredient_keys(body.ingredients),
         "created_at": datetime.now(timezone.utc),
     }
     inserted = col.insert_one(doc)
+    bump_version(current_user.id, "recipes")
     doc["id"] = str(inserted.inserted_id)
     doc["_id"] = inserted.inserted_id
     return Recipe(**doc)
 
 
+@router.get("/cookable", response_model=List[RankedRecipe])
+def rank_cookable_recipes(limit: int = 10, current_user: User = Depends(get_current_user)):
+    """Top saved recipes by how much of them the pantry covers.
+
+    Ties in coverage are broken in favour of recipes that use up ingredients
+    closest to expiring. Only recipes sharing at least one ingredient with the
+    pantry are read, via the ingredient_keys index.
+    """
+    if limit <= 0:
+        raise HTTPException(status_code=400, detail="'limit' must be a positive integer")
+
+    pantry = _pantry_expiry_days(current_user)
+    if not pantry:
+        return []
+
+    col = get_recipes_collection()
+    _backfill_ingredient_keys(col, current_user.id)
+    cursor = col.find(
+        {"user_id": current_user.id, "ingredient_keys": {"$in": list(pantry)}, **_SAVED},
+        {"title": 1, "ingredient_keys": 1},
+    )
+    ranked = (_score_recipe(doc, pantry) for doc in cursor)
+    # Coverage first; at equal coverage, score only differs by the expiry bonus
+    return heapq.nlargest(limit, ranked, key=lambda r: (r.coverage, r.score))
+
+
+def _pantry_expiry_days(current_user: User) -> dict[str, Optional[float]]:
+    """Map each pantry ingredient key to days until it may expire (None if shelf-stable)."""
+    try:
+        user_oid = ObjectId(current_user.id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid user id")
+
+    now = datetime.now(timezone.utc)
+    out: dict[str, Optional[float]] = {}
+    cursor = get_groceries_collection().find(
+        {"user_id": user_oid}, {"name": 1, "min_days": 1, "created_at": 1, "expires_earliest_at": 1}
+    )
+    for doc in cursor:
+        keys = normalized_set([doc.get("name", "")])
+        if not keys:
+            continue
+        key = keys.pop()
+        days: Optional[float] = None
+        expires = doc.get("expires_earliest_at")
+        if expires is None and doc.get("min_days") is not None and doc.get("created_at") is not None:
+            # Not yet backfilled by scripts/migrate_expiry_fields.py
+            expires = expiry_fields(doc["created_at"], doc["min_days"], None)["expires_earliest_at"]
+        if expires is not None:
+            if expires.tzinfo is None:
+                expires = expires.replace(tzinfo=timezone.utc)
+            days = (expires - now).total_seconds() / 86400
+        prev = out.get(key)
+        out[key] = days if prev is None else (prev if days is None else min(prev, days))
+    return out
+
+
+def _score_recipe(doc: dict[str, Any], pantry: dict[str, Optional[float]]) -> RankedRecipe:
+    keys = doc.get("ingredient_keys") or []
+    matched = [k for k in keys if k in pantry]
+    missing = [k for k in keys if k not in pantry]
+    coverage = len(matched) / len(keys) if keys else 0.0
+
+    # Each matched perishable adds up to 1 as it approaches (or passes) expiry.
+    expiry_days = [pantry[k] for k in matched if pantry[k] is not None]
+    urgency = sum(1 / (1 + max(d, 0.0)) for d in expiry_days) / len(keys) if keys else 0.0
+
+    return RankedRecipe(
+        id=str(doc.get("_id")),
+        title=doc.get("title", ""),
+        score=round(coverage + _EXPIRY_WEIGHT * urgency, 4),
+        coverage=round(coverage, 4),
+        matched_ingredients=matched,
+        missing_ingredients=missing,
+        soonest_expiry_days=round(min(expiry_days), 2) if expiry_days else None,
+    )
+
+
+def _backfill_ingredient_keys(col, user_id: str) -> None:
+    """Index recipes saved before ingredient_keys existed (no-op once done)."""
+    for doc in col.find({"user_id": user_id, "ingredient_keys": None}, {"ingredients": 1}):
+        col.update_one(
+            {"_id": doc["_id"]},
+            {"$set": {"ingredient_keys": _ingredient_keys(doc.get("ingredients") or [])}},
+        )
+
+
 @router.get("/{recipe_id}", response_model=Recipe)
 def get_recipe(recipe_id: str, current_user: User = Depends(get_current_user)):
     col = get_recipes_collection()
-    rec = col.find_one({"_id": _oid(recipe_id), "user_id": current_user.id})
+    rec = col.find_one({"_id": _oid(recipe_id), "user_id": current_user.id, **_SAVED})
     if not rec:
         raise HTTPException(status_code=404, detail="Recipe not found")
     rec["id"] = str(rec.get("_id"))
@@ -81,13 +214,16 @@ def update_recipe(recipe_id: str, body: RecipeUpdate, current_user: User = Depen
             update_fields[k] = v
     if not update_fields:
         raise HTTPException(status_code=400, detail="No fields to update")
+    if "ingredients" in update_fields:
+        update_fields["ingredient_keys"] = _ingredient_keys(update_fields["ingredients"])
     res = col.find_one_and_update(
-        {"_id": _oid(recipe_id), "user_id": current_user.id},
+        {"_id": _oid(recipe_id), "user_id": current_user.id, **_SAVED},
         {"$set": update_fields},
         return_document=True,
     )
     if not res:
         raise HTTPException(status_code=404, detail="Recipe not found")
+    bump_version(current_user.id, "recipes")
     res["id"] = str(res.get("_id"))
     return Recipe(**res)
 
@@ -95,7 +231,8 @@ def update_recipe(recipe_id: str, body: RecipeUpdate, current_user: User = Depen
 @router.delete("/{recipe_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_recipe(recipe_id: str, current_user: User = Depends(get_current_user)):
     col = get_recipes_collection()
-    result = col.delete_one({"_id": _oid(recipe_id), "user_id": current_user.id})
+    result = col.delete_one({"_id": _oid(recipe_id), "user_id": current_user.id, **_SAVED})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Recipe not found")
+    bump_version(current_user.id, "recipes")
     return None
@@ -0,0 +1,105 @@
+"""Long-lived, rotating, revocable refresh tokens.
+
+Login returns a short-lived JWT access token (ACCESS_TOKEN_EXPIRE_MINUTES)
+and an opaque refresh token (REFRESH_TOKEN_EXPIRE_DAYS). POST
+/api/auth/refresh trades the refresh token for a new pair without a bcrypt
+verify, so clients only send the password again when the refresh token is
+lost, expires or is revoked.
+
+Refresh tokens are random 256-bit strings. Only their SHA-256 is stored
+(`refresh_tokens.token_hash`, unique index); a fast hash is enough for
+high-entropy secrets and keeps lookup and revocation checks to one indexed
+read. Expired documents are removed by a TTL index on `expires_at`.
+
+Every refresh rotates the token: the presented one is marked revoked in the
+same atomic update that checks it is still valid, and a successor in the
+same `family_id` is issued. Presenting an already-rotated token means it
+leaked (or two clients share it), so the whole family is revoked and the
+user has to log in again. Logout revokes the family too.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import secrets
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from pymongo import ReturnDocument
+
+from config import config
+from database import get_refresh_tokens_collection
+
+
+class RefreshTokenError(Exception):
+    """The refresh token is unknown, expired or revoked."""
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def issue(user_id: str, family_id: Optional[str] = None) -> str:
+    """Create and store a refresh token for `user_id`; returns the plaintext token."""
+    token = secrets.token_urlsafe(32)
+    now = _now()
+    get_refresh_tokens_collection().insert_one({
+        "token_hash": hash_token(token),
+        "user_id": user_id,
+        "family_id": family_id or uuid.uuid4().hex,
+        "created_at": now,
+        "expires_at": now + timedelta(days=config.REFRESH_TOKEN_EXPIRE_DAYS),
+        "revoked_at": None,
+    })
+    return token
+
+
+def rotate(token: str) -> tuple[str, str]:
+    """Revoke `token` and issue its successor; returns (user_id, new_token).
+
+    Raises RefreshTokenError when the token is not currently valid. When it
+    was valid once but has already been rotated or revoked, its whole family
+    is revoked first.
+    """
+    tokens = get_refresh_tokens_collection()
+    token_hash = hash_token(token)
+    now = _now()
+    doc = tokens.find_one_and_update(
+        {"token_hash": token_hash, "revoked_at": None, "expires_at": {"$gt": now}},
+        {"$set": {"revoked_at": now}},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if doc is None:
+        stale = tokens.find_one({"token_hash": token_hash}, {"family_id": 1, "revoked_at": 1})
+        if stale and stale.get("revoked_at") is not None:
+            print(f"Warning: refresh token reuse detected; revoking family {stale['family_id']}")
+            revoke_family(stale["family_id"])
+        raise RefreshTokenError("Invalid refresh token")
+
+    new_token = issue(doc["user_id"], family_id=doc["family_id"])
+    tokens.update_one({"_id": doc["_id"]}, {"$set": {"replaced_by": hash_token(new_token)}})
+    return doc["user_id"], new_token
+
+
+def revoke_family(family_id: str) -> int:
+    result = get_refresh_tokens_collection().update_many(
+        {"family_id": family_id, "revoked_at": None}, {"$set": {"revoked_at": _now()}},
+    )
+    return result.modified_count
+
+
+def revoke(token: str) -> bool:
+    """Revoke `token` and every token rotated from the same login. False if unknown."""
+    doc: Optional[dict[str, Any]] = get_refresh_tokens_collection().find_one(
+        {"token_hash": hash_token(token)}, {"family_id": 1},
+    )
+    if doc is None:
+        return False
+    revoke_family(doc["family_id"])
+    return True
+
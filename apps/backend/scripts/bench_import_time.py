@@ -0,0 +1,89 @@
+"""Cold-start benchmark: how long does `import server` take, and what does it pull in?
+
+Runs `python -X importtime -c "import server"` in fresh interpreters, reports
+the median total and the slowest modules, and fails (exit status 1) when:
+
+* the median exceeds --budget-ms, or
+* any module in --forbid is imported at all. These are the heavy
+  dependencies that must only load on first use: the OCR stack and the LLM
+  SDKs.
+
+Use it as a CI guard so cold start stays fast for autoscaling:
+
+    python scripts/bench_import_time.py [--runs 5] [--budget-ms 700] [--top 15]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = (
+    "cv2",
+    "numpy",
+    "pytesseract",
+    "PIL",
+    "google.generativeai",
+    "google.api_core",
+    "anthropic",
+)
+
+
+def import_profile(module: str) -> dict[str, tuple[int, int]]:
+    """module -> (self µs, cumulative µs) for one cold `import module`."""
+    env = {**os.environ, "SECRET_KEY": os.environ.get("SECRET_KEY", "bench"),
+           "MONGO_URI": os.environ.get("MONGO_URI", "mongodb://localhost:27017")}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND, env=env, capture_output=True, text=True, check=True,
+    )
+    profile: dict[str, tuple[int, int]] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        profile[name.strip()] = (int(self_us), int(cumulative_us))
+    return profile
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="server")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=700)
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to list (by self time)")
+    parser.add_argument("--forbid", default=",".join(HEAVY_MODULES), help="comma-separated modules that must not load")
+    args = parser.parse_args()
+
+    import_profile(args.module)  # warm the filesystem cache and .pyc files
+    runs = [import_profile(args.module) for _ in range(args.runs)]
+    totals_ms = [run[args.module][1] / 1000 for run in runs]
+    median_ms = statistics.median(totals_ms)
+
+    print(f"import {args.module}: median {median_ms:.0f} ms over {args.runs} runs "
+          f"(min {min(totals_ms):.0f}, max {max(totals_ms):.0f}), budget {args.budget_ms:.0f} ms")
+    last = runs[-1]
+    print(f"\n{'self ms':>8} {'cum ms':>8}  module")
+    for name, (self_us, cumulative_us) in sorted(last.items(), key=lambda kv: -kv[1][0])[:args.top]:
+        print(f"{self_us / 1000:>8.1f} {cumulative_us / 1000:>8.1f}  {name}")
+
+    failed = False
+    forbidden = [m for m in filter(None, args.forbid.split(",")) if m in last]
+    if forbidden:
+        failed = True
+        print(f"\nFAIL: heavy modules imported at startup: {', '.join(forbidden)}")
+    if median_ms > args.budget_ms:
+        failed = True
+        print(f"\nFAIL: median import time {median_ms:.0f} ms exceeds the {args.budget_ms:.0f} ms budget")
+    if failed:
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Benchmark: Mongo connection pool size under concurrent load.
+
+For each pool size, N threads hammer a scratch collection with a read-heavy
+mix (indexed find_one, small insert_one, short find over an index range) for
+a fixed time. Reports throughput, operation latency percentiles, the time
+threads spent waiting for a pooled connection, and how many connections were
+opened. Too small a pool shows up as checkout waits; too large shows up as
+more connections for no extra throughput.
+
+Needs a real server (mongomock has no pool): MONGO_URI from the environment
+or --uri. Runs against a throwaway `bench_pool_<pid>` collection, dropped at
+the end. Uses the same TLS and compressor settings as the app.
+
+    python scripts/bench_mongo_pool.py [--pool-sizes 5,10,25,50,100]
+        [--threads 64] [--seconds 10] [--uri mongodb://...]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from pymongo import ASCENDING, MongoClient  # noqa: E402
+from pymongo.errors import PyMongoError  # noqa: E402
+
+from config import config  # noqa: E402
+from database import PoolMonitor, available_compressors  # noqa: E402
+
+
+class RecordingMonitor(PoolMonitor):
+    """PoolMonitor that also keeps every checkout wait, for percentiles."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.waits: list[float] = []
+        self.max_open = 0
+
+    def connection_created(self, event: Any) -> None:
+        super().connection_created(event)
+        self.max_open = max(self.max_open, self.open)
+
+    def _record_wait(self, event: Any) -> None:
+        if getattr(event, "duration", None) is not None:
+            self.waits.append(event.duration)
+
+
+def _pct(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] * 1000
+
+
+def run(uri: str, pool_size: int, threads: int, seconds: float, collection_name: str) -> dict[str, Any]:
+    monitor = RecordingMonitor()
+    options: dict[str, Any] = {
+        "maxPoolSize": pool_size,
+        "serverSelectionTimeoutMS": config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "event_listeners": [monitor],
+    }
+    compressors = available_compressors(config.MONGO_COMPRESSORS)
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    client = MongoClient(uri, **options)
+    col = client.get_database(config.MONGO_DB_NAME)[collection_name]
+
+    latencies: list[list[float]] = [[] for _ in range(threads)]
+    errors = [0] * threads
+    stop = time.perf_counter() + seconds
+
+    def worker(i: int) -> None:
+        rng = random.Random(i)
+        local = latencies[i]
+        while time.perf_counter() < stop:
+            op = rng.random()
+            start = time.perf_counter()
+            try:
+                if op < 0.7:
+                    col.find_one({"k": rng.randrange(10_000)})
+                elif op < 0.9:
+                    list(col.find({"k": {"$gte": rng.randrange(10_000)}}).limit(20))
+                else:
+                    col.insert_one({"k": rng.randrange(10_000), "payload": "x" * 200})
+            except PyMongoError:
+                errors[i] += 1
+                continue
+            local.append(time.perf_counter() - start)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+    client.close()
+
+    all_latencies = [v for chunk in latencies for v in chunk]
+    return {
+        "pool": pool_size,
+        "ops_per_s": len(all_latencies) / elapsed,
+        "p50_ms": _pct(all_latencies, 50),
+        "p95_ms": _pct(all_latencies, 95),
+        "p99_ms": _pct(all_latencies, 99),
+        "wait_p95_ms": _pct(monitor.waits, 95),
+        "wait_max_ms": _pct(monitor.waits, 100),
+        "connections": monitor.max_open,
+        "errors": sum(errors),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=os.environ.get("MONGO_URI", ""))
+    parser.add_argument("--pool-sizes", default="5,10,25,50,100")
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--docs", type=int, default=10_000, help="documents seeded before the runs")
+    args = parser.parse_args()
+    if not args.uri:
+        parser.error("set MONGO_URI or pass --uri")
+
+    name = f"bench_pool_{os.getpid()}"
+    setup = MongoClient(args.uri, serverSelectionTimeoutMS=config.MONGO_SERVER_SELECTION_TIMEOUT_MS)
+    col = setup.get_database(config.MONGO_DB_NAME)[name]
+    try:
+        col.create_index([("k", ASCENDING)])
+        col.insert_many([{"k": i, "payload": "x" * 200} for i in range(args.docs)])
+    except PyMongoError as e:
+        print(f"Cannot reach Mongo at the given URI: {e}")
+        sys.exit(2)
+
+    print(f"{args.threads} threads, {args.seconds:.0f}s per pool size, "
+          f"compressors: {','.join(available_compressors(config.MONGO_COMPRESSORS)) or 'none'}")
+    header = f"{'pool':>5}{'ops/s':>10}{'p50':>8}{'p95':>8}{'p99':>8}{'wait p95':>10}{'wait max':>10}{'conns':>7}{'errs':>6}"
+    print(header)
+    print("-" * len(header))
+    try:
+        for size in (int(s) for s in args.pool_sizes.split(",") if s.strip()):
+            r = run(args.uri, size, args.threads, args.seconds, name)
+            print(f"{r['pool']:>5}{r['ops_per_s']:>10.0f}{r['p50_ms']:>8.1f}{r['p95_ms']:>8.1f}{r['p99_ms']:>8.1f}"
+                  f"{r['wait_p95_ms']:>10.1f}{r['wait_max_ms']:>10.1f}{r['connections']:>7}{r['errors']:>6}")
+    finally:
+        col.drop()
+        setup.close()
+    print("(latencies in ms)")
+
+
+if __name__ == "__main__":
+    main()
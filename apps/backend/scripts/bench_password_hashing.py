@@ -0,0 +1,101 @@
+"""Benchmark: bcrypt cost and login throughput on the password-hash executor.
+
+Part 1 times one verify per bcrypt work factor, to help choose BCRYPT_ROUNDS
+(each extra round doubles the cost).
+
+Part 2 sends --logins concurrent verifies through a PasswordHasher with
+different worker counts at --rounds. It reports logins/s, logins/s per worker
+thread, and p50/p95 login latency, including time spent queued. bcrypt
+releases the GIL, so throughput should grow with workers until they exceed
+the number of cores.
+
+    python scripts/bench_password_hashing.py [--rounds 12] [--cost-rounds 10,11,12,13]
+        [--workers 1,2,4,8] [--logins 64]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from password_hashing import PasswordHasher, make_context  # noqa: E402
+
+PASSWORD = "correct horse battery staple"
+
+
+def _pct(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] * 1000
+
+
+def verify_cost_ms(rounds: int, repeats: int) -> float:
+    context = make_context(rounds)
+    hashed = context.hash(PASSWORD)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        context.verify(PASSWORD, hashed)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+async def login_burst(rounds: int, workers: int, logins: int) -> dict[str, float]:
+    context = make_context(rounds)
+    hashed = context.hash(PASSWORD)
+    hasher = PasswordHasher(context, workers=workers, max_queue=logins)
+    latencies: list[float] = []
+
+    async def one() -> None:
+        start = time.perf_counter()
+        valid, _ = await hasher.verify_and_update(PASSWORD, hashed)
+        assert valid
+        latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    hasher._executor.shutdown()
+    rate = logins / elapsed
+    return {
+        "workers": workers,
+        "logins_per_s": rate,
+        "per_worker": rate / workers,
+        "p50_ms": _pct(latencies, 50),
+        "p95_ms": _pct(latencies, 95),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=12, help="work factor for the throughput runs")
+    parser.add_argument("--cost-rounds", default="10,11,12,13")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--logins", type=int, default=64, help="concurrent logins per run")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs\n")
+    print(f"{'rounds':>6}{'verify ms':>11}{'logins/s/core':>15}")
+    for rounds in (int(r) for r in args.cost_rounds.split(",") if r.strip()):
+        ms = verify_cost_ms(rounds, args.repeats)
+        print(f"{rounds:>6}{ms:>11.1f}{1000 / ms:>15.1f}")
+
+    print(f"\n{args.logins} concurrent logins at {args.rounds} rounds")
+    header = f"{'workers':>8}{'logins/s':>10}{'per worker':>12}{'p50 ms':>9}{'p95 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for workers in (int(w) for w in args.workers.split(",") if w.strip()):
+        r = asyncio.run(login_burst(args.rounds, workers, args.logins))
+        print(f"{r['workers']:>8}{r['logins_per_s']:>10.1f}{r['per_worker']:>12.1f}{r['p50_ms']:>9.0f}{r['p95_ms']:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
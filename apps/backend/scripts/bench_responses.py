@@ -0,0 +1,140 @@
+"""Benchmark: list response rendering and bytes on the wire.
+
+Builds a synthetic large pantry (groceries plus receipts with OCR text) and
+times a GET through real FastAPI routes declared with the app's
+`response_model` (list[GroceryItem], list[Receipt]), so every timing includes
+FastAPI's response_model validation and serialization:
+
+* stdlib:  the route returns the documents, rendered by JSONResponse;
+* fast:    the same route with FastJSONResponse as default_response_class;
+* shaped:  the route returns fast_lists.list_response, as the list endpoints
+           do, which skips the response_model pass.
+
+Then the raw body size is compared against gzip / brotli as negotiated by
+CompressionMiddleware.
+
+    python scripts/bench_responses.py [--groceries 2000] [--receipts 200] [--repeat 20]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# Allow running from the repo root or from apps/backend
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+from bson import ObjectId  # noqa: E402
+from fastapi import FastAPI, Response  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import compression  # noqa: E402
+from fast_lists import list_response  # noqa: E402
+from groceries import GroceryItem  # noqa: E402
+from models import Receipt  # noqa: E402
+from responses import FastJSONResponse, orjson  # noqa: E402
+
+_WORDS = ["milk", "bread", "eggs", "apple", "banana", "chicken", "rice", "tomato", "cheese", "yogurt", "spinach"]
+
+
+def make_groceries(n: int) -> list[dict]:
+    now = datetime.now(timezone.utc)
+    items = []
+    for i in range(n):
+        name = f"{random.choice(_WORDS).title()} {i}"
+        items.append({
+            "id": str(ObjectId()),
+            "user_id": str(ObjectId()),
+            "name": name,
+            "count": random.randint(1, 6),
+            "created_at": now,
+            "min_days": 3,
+            "max_days": 10,
+            "expires_earliest_at": now + timedelta(days=3),
+            "expires_latest_at": now + timedelta(days=10),
+        })
+    return items
+
+
+def make_receipts(n: int) -> list[dict]:
+    receipts = []
+    for _ in range(n):
+        lines = [f"{random.choice(_WORDS).upper():<20}{random.uniform(0.5, 20):>8.2f}" for _ in range(40)]
+        receipts.append({
+            "id": str(ObjectId()),
+            "user_id": str(ObjectId()),
+            "file_path": "uploads/receipts/x/receipt.jpg",
+            "raw_text": "\n".join(lines),
+            "grocery_items": [str(ObjectId()) for _ in range(20)],
+            "created_at": datetime.now(timezone.utc),
+        })
+    return receipts
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def _client(model: type, payload: list[dict], response_class: type) -> TestClient:
+    app = FastAPI(default_response_class=response_class)
+
+    @app.get("/list", response_model=list[model])
+    def full_list():
+        return payload
+
+    @app.get("/shaped", response_model=list[model])
+    def shaped_list(response: Response):
+        return list_response(payload, response)
+
+    return TestClient(app)
+
+
+def bench(name: str, model: type, payload: list[dict], repeat: int) -> None:
+    stdlib = _client(model, payload, JSONResponse)
+    fast = _client(model, payload, FastJSONResponse)
+    stdlib_ms = _time(lambda: stdlib.get("/list"), repeat)
+    fast_ms = _time(lambda: fast.get("/list"), repeat)
+    shaped_ms = _time(lambda: fast.get("/shaped"), repeat)
+    body = fast.get("/list").content
+
+    print(f"{name}: {len(payload)} docs, GET through a response_model route")
+    print(f"  render     stdlib {stdlib_ms:8.2f} ms   fast {fast_ms:8.2f} ms   ({stdlib_ms / fast_ms:.1f}x)")
+    print(f"  render     shaped {shaped_ms:8.2f} ms   ({stdlib_ms / shaped_ms:.1f}x, skips response_model)")
+    print(f"  bytes      raw    {len(body):>10,}")
+    for encoding in ("gzip", "br"):
+        if encoding == "br" and compression.brotli is None:
+            print("  brotli     (install the Brotli package to measure)")
+            continue
+        ms = _time(lambda: compression.compress(body, encoding), repeat)
+        size = len(compression.compress(body, encoding))
+        print(f"  bytes      {encoding:<6} {size:>10,}  ({size / len(body):.0%} of raw, {ms:.2f} ms)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark list response rendering and compression")
+    parser.add_argument("--groceries", type=int, default=2000)
+    parser.add_argument("--receipts", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(0)
+    print(f"orjson: {'yes' if orjson is not None else 'no (stdlib fallback)'}")
+    bench("groceries", GroceryItem, make_groceries(args.groceries), args.repeat)
+    bench("receipts", Receipt, make_receipts(args.receipts), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Benchmark: search latency over large synthetic receipt histories.
+
+For each dataset size, one user gets N synthetic receipts (about 20 item
+lines each, drawn from a Zipf-like product vocabulary, plus prices and store
+names) and N/10 groceries. Then random one- and two-word queries are timed:
+
+* scan:   what a client has to do today: read every receipt's raw_text and
+          substring-match it (documents already in memory, so this is a
+          lower bound);
+* local:  search.InvertedIndex (SEARCH_BACKEND=local); index build time is
+          reported separately, since it is paid once per data change;
+* write:  the local backend's latency for the first query after a receipt
+          or grocery write, which rebuilds the user's index (documents in
+          memory, so the Mongo read of the user's data comes on top);
+* mongo:  `$text` on the real text indexes, only with --uri (mongomock has
+          no `$text`). Data goes to a throwaway `bench_search_<pid>`
+          database that is dropped at the end.
+
+    python scripts/bench_search.py [--sizes 1000,10000,50000] [--queries 200]
+        [--mutations 10] [--uri mongodb://...]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+from bson import ObjectId  # noqa: E402
+
+from search import KINDS, InvertedIndex  # noqa: E402
+
+USER_ID = "507f1f77bcf86cd799439011"
+STORES = ["FRESHMART", "CORNER STORE", "FISH MARKET", "GREEN GROCER", "SUPERMART", "BULK BARN"]
+BASE = [
+    "milk", "bread", "eggs", "butter", "cheese", "yogurt", "apples", "bananas", "oranges", "lemons",
+    "tomatoes", "potatoes", "onions", "garlic", "carrots", "spinach", "lettuce", "chicken", "beef", "pork",
+    "salmon", "tuna", "shrimp", "rice", "pasta", "flour", "sugar", "coffee", "tea", "juice",
+    "cereal", "oats", "honey", "jam", "peanut", "almonds", "walnuts", "chocolate", "cookies", "crackers",
+    "beans", "lentils", "chickpeas", "tofu", "avocado", "peppers", "mushrooms", "broccoli", "cucumber", "saffron",
+]
+QUALIFIERS = ["organic", "smoked", "fresh", "frozen", "whole", "sliced", "large", "greek", "wild", "free range"]
+
+
+def _product(rng: random.Random) -> str:
+    # Zipf-ish: common staples show up far more often than rare items
+    name = BASE[min(len(BASE) - 1, int(rng.paretovariate(1.2)) - 1)]
+    return f"{rng.choice(QUALIFIERS)} {name}" if rng.random() < 0.3 else name
+
+
+def make_receipts(n: int, seed: int) -> list[dict[str, Any]]:
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        lines = [rng.choice(STORES), f"{rng.randint(1, 999)} MAIN ST"]
+        lines += [f"{_product(rng).upper()} {rng.uniform(0.5, 30):.2f}" for _ in range(rng.randint(10, 30))]
+        lines.append(f"TOTAL {rng.uniform(10, 300):.2f}")
+        out.append({"_id": ObjectId(), "user_id": USER_ID, "raw_text": "\n".join(lines)})
+    return out
+
+
+def make_groceries(n: int, seed: int) -> list[dict[str, Any]]:
+    rng = random.Random(seed + 1)
+    return [{"_id": ObjectId(), "user_id": ObjectId(USER_ID), "name": _product(rng).title()} for _ in range(n)]
+
+
+def make_queries(n: int, seed: int) -> list[str]:
+    rng = random.Random(seed + 2)
+    return [" ".join(rng.sample(BASE, rng.choice((1, 1, 2)))) for _ in range(n)]
+
+
+def _pcts(fn: Callable[[str], Any], queries: list[str]) -> tuple[float, float, float]:
+    times = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    pick = lambda p: times[min(len(times) - 1, int(p / 100 * len(times)))] * 1000  # noqa: E731
+    return pick(50), pick(95), pick(99)
+
+
+def _scan(receipts: list[dict[str, Any]]) -> Callable[[str], list]:
+    def run(q: str) -> list:
+        words = q.lower().split()
+        return [r for r in receipts if any(w in r["raw_text"].lower() for w in words)]
+    return run
+
+
+def _after_write(receipts: list[dict[str, Any]], groceries: list[dict[str, Any]], seed: int) -> Callable[[str], Any]:
+    rng = random.Random(seed + 3)
+    receipts = list(receipts)
+
+    def run(q: str) -> Any:
+        # A new receipt bumps the receipts version, so this search rebuilds the index
+        receipts.append(make_receipts(1, rng.randrange(1 << 30))[0])
+        index = InvertedIndex(
+            [("receipt", r, r["raw_text"]) for r in receipts] + [("grocery", g, g["name"]) for g in groceries]
+        )
+        return index.search(q, KINDS, 20)
+    return run
+
+
+def _mongo(uri: str, receipts: list[dict], groceries: list[dict]) -> tuple[Callable[[str], Any], Callable[[], None]]:
+    from pymongo import ASCENDING, TEXT, MongoClient
+
+    from search import MongoTextSearch
+
+    client = MongoClient(uri, serverSelectionTimeoutMS=5000)
+    db = client[f"bench_search_{os.getpid()}"]
+    db.receipts.insert_many([dict(r) for r in receipts])
+    db.groceries.insert_many([dict(g) for g in groceries])
+    db.receipts.create_index([("user_id", ASCENDING), ("raw_text", TEXT)])
+    db.groceries.create_index([("user_id", ASCENDING), ("name", TEXT)])
+
+    backend = MongoTextSearch()
+    backend._target = lambda kind, user_id: (  # type: ignore[method-assign]
+        (db.receipts, {"user_id": user_id}, {"raw_text": 1})
+        if kind == "receipt" else (db.groceries, {"user_id": ObjectId(user_id)}, {"name": 1})
+    )
+
+    def cleanup() -> None:
+        client.drop_database(db.name)
+        client.close()
+
+    return (lambda q: backend.search(USER_ID, q, KINDS, 20)), cleanup
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,50000", help="receipts per dataset")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--mutations", type=int, default=10, help="queries timed right after a write")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--uri", default="", help="also time Mongo $text against this server")
+    args = parser.parse_args()
+
+    queries = make_queries(args.queries, args.seed)
+    header = f"{'receipts':>9} {'backend':<7}{'build ms':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        receipts = make_receipts(size, args.seed)
+        groceries = make_groceries(max(1, size // 10), args.seed)
+
+        p50, p95, p99 = _pcts(_scan(receipts), queries)
+        print(f"{size:>9} {'scan':<7}{'-':>10}{p50:>9.2f}{p95:>9.2f}{p99:>9.2f}")
+
+        start = time.perf_counter()
+        index = InvertedIndex(
+            [("receipt", r, r["raw_text"]) for r in receipts] + [("grocery", g, g["name"]) for g in groceries]
+        )
+        build_ms = (time.perf_counter() - start) * 1000
+        p50, p95, p99 = _pcts(lambda q: index.search(q, KINDS, 20), queries)
+        print(f"{size:>9} {'local':<7}{build_ms:>10.0f}{p50:>9.2f}{p95:>9.2f}{p99:>9.2f}")
+
+        if args.mutations > 0:
+            p50, p95, p99 = _pcts(_after_write(receipts, groceries, args.seed), queries[:args.mutations])
+            print(f"{size:>9} {'write':<7}{'-':>10}{p50:>9.2f}{p95:>9.2f}{p99:>9.2f}")
+
+        if args.uri:
+            run, cleanup = _mongo(args.uri, receipts, groceries)
+            try:
+                p50, p95, p99 = _pcts(run, queries)
+                print(f"{size:>9} {'mongo':<7}{'-':>10}{p50:>9.2f}{p95:>9.2f}{p99:>9.2f}")
+            finally:
+                cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Benchmark: grocery name autocomplete latency.
+
+Builds grocery_catalog.PrefixIndex over the shipped seed list plus N
+synthetic names (a qualifier and a seed name, often after a made-up brand,
+with Zipf-like popularity) and times `suggest()` for random prefixes of 1 to 5 characters,
+against a linear scan over all names (what filtering on the client would
+cost). One- and two-letter prefixes are served from the per-index cache
+after their first lookup; "cold" times each prefix on a fresh index.
+
+    python scripts/bench_suggest.py [--sizes 1000,10000,100000] [--queries 2000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+from grocery_catalog import PrefixIndex, load_seed  # noqa: E402
+
+QUALIFIERS = ["Organic", "Smoked", "Fresh", "Frozen", "Whole", "Sliced", "Wild", "Greek", "Baby", "Red", "Green"]
+
+
+def _brand(rng: random.Random) -> str:
+    return "".join(rng.choice("bcdfgklmnprstv") + rng.choice("aeiou") for _ in range(rng.randint(2, 3))).title()
+
+
+def make_entries(n: int, seed: int) -> list[tuple[str, int]]:
+    rng = random.Random(seed)
+    base = load_seed()
+    names = {name: max(1, int(1000 / (rank + 1))) for rank, name in enumerate(base)}
+    while len(names) < n + len(base):
+        words = [rng.choice(QUALIFIERS), rng.choice(base)]
+        if rng.random() < 0.5:
+            words.insert(0, _brand(rng))
+        names.setdefault(" ".join(words), int(rng.paretovariate(1.1)))
+    return list(names.items())
+
+
+def _pcts(fn: Callable[[str], object], prefixes: list[str]) -> tuple[float, float]:
+    times = []
+    for p in prefixes:
+        start = time.perf_counter()
+        fn(p)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return times[len(times) // 2] * 1000, times[min(len(times) - 1, int(0.99 * len(times)))] * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="synthetic names on top of the seed list")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    header = f"{'names':>8}{'build ms':>10}{'len':>5}{'p50 ms':>9}{'p99 ms':>9}{'cold p50':>10}{'scan p50':>10}"
+    print(header)
+    print("-" * len(header))
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        entries = make_entries(size, args.seed)
+        start = time.perf_counter()
+        index = PrefixIndex(entries)
+        build_ms = (time.perf_counter() - start) * 1000
+        folded = [(name.casefold(), w) for name, w in entries]
+        sources = [name.casefold() for name, _ in rng.sample(entries, min(len(entries), 500))]
+
+        def scan(prefix: str) -> list:
+            hits = [(w, n) for n, w in folded if n.startswith(prefix) or f" {prefix}" in n]
+            return sorted(hits, reverse=True)[:8]
+
+        for length in range(1, 6):
+            prefixes = [s[:length] for s in (rng.choice(sources) for _ in range(args.queries)) if len(s) >= length]
+            p50, p99 = _pcts(index.suggest, prefixes)
+            cold = PrefixIndex(entries) if length <= 2 else index
+            cold_p50, _ = _pcts(cold.suggest, sorted(set(prefixes)))
+            scan_p50, _ = _pcts(scan, prefixes[:50])
+            print(f"{len(entries):>8}{build_ms:>10.0f}{length:>5}{p50:>9.3f}{p99:>9.3f}{cold_p50:>10.3f}{scan_p50:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
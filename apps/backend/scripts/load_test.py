@@ -0,0 +1,286 @@
+"""Offline load test: drive mixed concurrent traffic through the real app.
+
+Runs entirely in-process with no network:
+
+* the `database` module is pointed at a mongomock client;
+* model calls go to the deterministic stub provider (LLM_PROVIDERS=stub) with
+  configurable log-normal latency and failure rate;
+* uploads are synthetic receipt images drawn with Pillow. They are OCR'd by
+  Tesseract when it is installed; otherwise (or with --ocr fake) a fake OCR
+  decodes the image and returns the text it was drawn from after --ocr-ms.
+
+Virtual users log in, then loop over a weighted mix of requests (login, list
+groceries/recipes/receipts, upload, analyze-text, recipe) through an
+in-process ASGI transport. At the end it prints throughput and latency
+percentiles per endpoint.
+
+    python scripts/load_test.py [--users 20] [--duration 30] [--llm-ms 800]
+        [--llm-sigma 0.4] [--llm-error-rate 0.02] [--ocr auto|real|fake]
+        [--ocr-ms 300] [--mix login=1,groceries=6,...] [--json out.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+DEFAULT_MIX = {
+    "login": 1,
+    "list_groceries": 6,
+    "list_recipes": 2,
+    "list_receipts": 2,
+    "upload": 1,
+    "analyze_text": 1,
+    "recipe": 2,
+}
+PRODUCTS = [
+    "WHOLE MILK", "LARGE EGGS", "BANANAS", "SOURDOUGH BREAD", "CHEDDAR CHEESE", "GREEK YOGURT",
+    "BABY SPINACH", "ROMA TOMATOES", "CHICKEN BREAST", "GROUND BEEF", "STRAWBERRIES", "PASTA",
+    "RICE", "BLACK BEANS", "PEANUT BUTTER", "OLIVE OIL", "APPLES", "CARROTS", "ONIONS", "BUTTER",
+]
+
+
+def _configure_env(args: argparse.Namespace) -> None:
+    """Must run before the app is imported: config is read at import time."""
+    os.environ.update({
+        "MONGO_URI": "mongodb://localhost:27017",
+        "MONGO_DB_NAME": "load_test",
+        "SECRET_KEY": "load-test-secret",
+        "LLM_PROVIDERS": "stub",
+        "LLM_MAX_TOKENS": "1024",
+        "LLM_TEMPERATURE": "0.7",
+        "LLM_STUB_LATENCY_MS": str(args.llm_ms),
+        "LLM_STUB_LATENCY_SIGMA": str(args.llm_sigma),
+        "LLM_STUB_ERROR_RATE": str(args.llm_error_rate),
+        "LLM_STUB_SEED": str(args.seed),
+        "LLM_HOURLY_BUDGET": "0",
+        "RATE_LIMIT_ENABLED": "false" if not args.rate_limits else "true",
+        "EXPIRY_SWEEP_ENABLED": "false",
+        "RECEIPT_COMPACTOR_ENABLED": "false",
+    })
+
+
+def _receipt(rng: random.Random) -> tuple[str, bytes]:
+    """A synthetic receipt: its text and a PNG rendering of it."""
+    from PIL import Image, ImageDraw
+
+    lines = ["FRESH MARKET #%d" % rng.randint(100, 999), "DATE: 2025-11-%02d" % rng.randint(1, 28), ""]
+    total = 0.0
+    for name in rng.sample(PRODUCTS, rng.randint(4, 12)):
+        price = rng.randint(99, 1299) / 100
+        total += price
+        lines.append(f"{name:<24}{price:>7.2f}")
+    lines += ["", f"{'SUBTOTAL':<24}{total:>7.2f}", f"{'TOTAL':<24}{total:>7.2f}"]
+    text = "\n".join(lines)
+
+    image = Image.new("L", (640, 40 + 22 * len(lines)), 255)
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((30, 20 + 22 * i), line, fill=0)
+    buf = io.BytesIO()
+    image.save(buf, format="PNG")
+    return text, buf.getvalue()
+
+
+def _install_fake_ocr(server: Any, texts: dict[str, str], latency_ms: float) -> None:
+    import hashlib
+
+    from PIL import Image
+
+    from metrics import stage
+
+    def fake_ocr_image(file_path: Path | str, preprocess: str = "thresh") -> str:
+        data = Path(file_path).read_bytes()
+        with stage("image_decode"):
+            Image.open(io.BytesIO(data)).load()
+        with stage("tesseract"):
+            time.sleep(latency_ms / 1000)
+        return texts.get(hashlib.sha256(data).hexdigest(), "")
+
+    server.ocr_image = fake_ocr_image
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+
+    async def timed(self, name: str, call: Awaitable[Any], ok_statuses: tuple[int, ...] = (200, 201)) -> Any:
+        start = time.perf_counter()
+        response = await call
+        self.latencies.setdefault(name, []).append(time.perf_counter() - start)
+        if response.status_code not in ok_statuses:
+            self.errors[name] = self.errors.get(name, 0) + 1
+        return response
+
+    def report(self, elapsed: float) -> dict[str, Any]:
+        out: dict[str, Any] = {}
+        for name in sorted(self.latencies):
+            values = sorted(self.latencies[name])
+            pct = lambda p: values[min(len(values) - 1, int(p / 100 * len(values)))] * 1000  # noqa: E731
+            out[name] = {
+                "requests": len(values),
+                "errors": self.errors.get(name, 0),
+                "rps": round(len(values) / elapsed, 2),
+                "p50_ms": round(pct(50), 1),
+                "p90_ms": round(pct(90), 1),
+                "p95_ms": round(pct(95), 1),
+                "p99_ms": round(pct(99), 1),
+                "max_ms": round(values[-1] * 1000, 1),
+            }
+        return out
+
+
+async def _run(args: argparse.Namespace) -> dict[str, Any]:
+    import httpx
+    import mongomock
+
+    import database
+    from config import config
+
+    database.client = mongomock.MongoClient()
+    database.db = database.client.get_database(config.MONGO_DB_NAME)
+
+    import server
+    from image_store import image_store
+    from ocr import check_tesseract_available
+
+    workdir = Path(tempfile.mkdtemp(prefix="load-test-"))
+    image_store.root = workdir / "receipts"
+    database.ensure_indexes()
+
+    rng = random.Random(args.seed)
+    receipts = [_receipt(rng) for _ in range(args.receipts)]
+    use_fake_ocr = args.ocr == "fake" or (args.ocr == "auto" and not check_tesseract_available())
+    if use_fake_ocr:
+        import hashlib
+
+        _install_fake_ocr(server, {hashlib.sha256(png).hexdigest(): text for text, png in receipts}, args.ocr_ms)
+
+    transport = httpx.ASGITransport(app=server.app)
+    recorder = Recorder()
+    mix = list(args.mix.items())
+    names, weights = [n for n, _ in mix], [w for _, w in mix]
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=120) as client:
+        async def login(email: str) -> dict[str, str]:
+            r = await recorder.timed("login", client.post(
+                "/api/auth/login", json={"email": email, "password": "load-test-pw"}
+            ))
+            return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+        accounts = []
+        for i in range(args.users):
+            email = f"user{i}@example.com"
+            await client.post("/api/auth/register", json={
+                "username": f"load{i:04d}", "email": email, "password": "load-test-pw",
+            })
+            headers = await login(email)
+            # Seed a small pantry so lists and recipes have something to work with
+            for name in rng.sample(PRODUCTS, 6):
+                await client.post("/api/groceries/", json={"name": name.title(), "min_days": 3, "max_days": 7}, headers=headers)
+            accounts.append((email, headers))
+        recorder.latencies.pop("login", None)
+
+        actions: dict[str, Callable[[str, dict[str, str], random.Random], Awaitable[Any]]] = {
+            "login": lambda email, h, r: login(email),
+            "list_groceries": lambda email, h, r: recorder.timed("list_groceries", client.get("/api/groceries/", headers=h)),
+            "list_recipes": lambda email, h, r: recorder.timed("list_recipes", client.get("/api/recipes/", headers=h)),
+            "list_receipts": lambda email, h, r: recorder.timed("list_receipts", client.get("/api/receipts/", headers=h)),
+            "upload": lambda email, h, r: recorder.timed("upload", client.post(
+                "/api/receipt/upload", headers=h, files={"file": ("receipt.png", r.choice(receipts)[1], "image/png")},
+            )),
+            "analyze_text": lambda email, h, r: recorder.timed("analyze_text", client.post(
+                "/api/receipt/analyze-text", headers=h,
+                json={"text": "\n".join(f"{r.randint(1, 3)} {p.title()}" for p in r.sample(PRODUCTS, 4))},
+            )),
+            "recipe": lambda email, h, r: recorder.timed("recipe", client.get("/api/groceries/recipe", headers=h)),
+        }
+
+        deadline = time.perf_counter() + args.duration
+
+        async def virtual_user(index: int) -> None:
+            email, headers = accounts[index]
+            user_rng = random.Random(args.seed * 1000 + index)
+            while time.perf_counter() < deadline:
+                action = user_rng.choices(names, weights)[0]
+                result = await actions[action](email, headers, user_rng)
+                if action == "login":
+                    headers = result
+                if args.think_ms:
+                    await asyncio.sleep(user_rng.expovariate(1000 / args.think_ms))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(virtual_user(i) for i in range(args.users)))
+        elapsed = time.perf_counter() - start
+
+    from recipe_scheduler import recipe_scheduler
+
+    recipe_scheduler.shutdown()
+    shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "users": args.users,
+        "duration_seconds": round(elapsed, 2),
+        "ocr": "fake" if use_fake_ocr else "tesseract",
+        "total_rps": round(sum(len(v) for v in recorder.latencies.values()) / elapsed, 2),
+        "endpoints": recorder.report(elapsed),
+    }
+
+
+def _parse_mix(value: str) -> dict[str, int]:
+    mix = dict(DEFAULT_MIX)
+    for part in filter(None, value.split(",")):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown endpoint '{name}', expected one of {', '.join(DEFAULT_MIX)}")
+        mix[name] = int(weight)
+    return {k: v for k, v in mix.items() if v > 0}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of mixed traffic")
+    parser.add_argument("--think-ms", type=float, default=0, help="mean pause between a user's requests")
+    parser.add_argument("--mix", type=_parse_mix, default=dict(DEFAULT_MIX), help="endpoint weights, e.g. upload=3,recipe=0")
+    parser.add_argument("--llm-ms", type=float, default=800, help="median fake LLM latency")
+    parser.add_argument("--llm-sigma", type=float, default=0.4, help="log-normal spread of LLM latency (0 = fixed)")
+    parser.add_argument("--llm-error-rate", type=float, default=0.02, help="fraction of LLM calls that fail")
+    parser.add_argument("--ocr", choices=("auto", "real", "fake"), default="auto")
+    parser.add_argument("--ocr-ms", type=float, default=300, help="fake OCR latency")
+    parser.add_argument("--receipts", type=int, default=20, help="distinct synthetic receipt images")
+    parser.add_argument("--rate-limits", action="store_true", help="keep per-user rate limits on")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", type=Path, help="also write the report here")
+    args = parser.parse_args()
+
+    _configure_env(args)
+    report = asyncio.run(_run(args))
+
+    print(f"{args.users} users, {report['duration_seconds']}s, OCR: {report['ocr']}, "
+          f"total {report['total_rps']} req/s")
+    header = f"{'endpoint':<16}{'reqs':>7}{'errs':>6}{'req/s':>8}{'p50':>9}{'p90':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, row in report["endpoints"].items():
+        print(f"{name:<16}{row['requests']:>7}{row['errors']:>6}{row['rps']:>8}"
+              f"{row['p50_ms']:>9}{row['p90_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}{row['max_ms']:>9}")
+    print("(latencies in ms)")
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Backfill expires_earliest_at / expires_latest_at on existing groceries.
+
+New groceries get these fields on write; this one-off migration fills them in
+for documents created before that, and gives items with only `max_days` the
+`expires_earliest_at` they were written without. It then ensures the
+supporting indexes exist.
+
+    python scripts/migrate_expiry_fields.py [--batch-size 500] [--dry-run]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+# Allow running from the repo root or from apps/backend
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import config  # noqa: E402
+from database import ensure_indexes, get_groceries_collection  # noqa: E402
+from expiry import backfill_expiry_fields  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backfill absolute expiry fields on groceries")
+    parser.add_argument("--batch-size", type=int, default=500, help="Documents per bulk write")
+    parser.add_argument("--dry-run", action="store_true", help="Count documents that need updating without writing")
+    args = parser.parse_args()
+
+    # Batches and index builds can outlast a socket timeout set for the API
+    config.MONGO_SOCKET_TIMEOUT_MS = 0
+
+    col = get_groceries_collection()
+    count = backfill_expiry_fields(col, batch_size=args.batch_size, dry_run=args.dry_run)
+    if args.dry_run:
+        print(f"{count} grocery documents need expiry fields.")
+        return
+
+    print(f"Updated {count} grocery documents.")
+    ensure_indexes()
+    print("Indexes ensured.")
+
+
+if __name__ == "__main__":
+    main()
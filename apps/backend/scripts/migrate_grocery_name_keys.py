@@ -0,0 +1,76 @@
+"""Add name_key to groceries and merge per-user duplicates.
+
+Before name_key existed groceries were upserted on the exact name, so "Milk",
+"milk" and "Milk " could each have their own document. This one-off migration:
+
+1. sets name_key on every grocery and merges duplicates by summing counts
+   (receipts pointing at merged documents are repointed),
+2. recomputes recipes' ingredient_keys with the same normalization,
+3. ensures indexes, including the unique (user_id, name_key) index.
+
+    python scripts/migrate_grocery_name_keys.py [--dry-run]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+from pymongo import UpdateOne
+
+# Allow running from the repo root or from apps/backend
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import config  # noqa: E402
+from database import (  # noqa: E402
+    ensure_indexes,
+    get_groceries_collection,
+    get_receipts_collection,
+    get_recipes_collection,
+)
+from names import backfill_name_keys, normalized_set  # noqa: E402
+
+
+def rekey_recipes(batch_size: int, dry_run: bool) -> int:
+    col = get_recipes_collection()
+    ops = []
+    changed = 0
+    for doc in col.find({}, {"ingredients": 1, "ingredient_keys": 1}):
+        keys = sorted(normalized_set(doc.get("ingredients") or []))
+        if keys == doc.get("ingredient_keys"):
+            continue
+        changed += 1
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"ingredient_keys": keys}}))
+        if len(ops) >= batch_size:
+            if not dry_run:
+                col.bulk_write(ops, ordered=False)
+            ops = []
+    if ops and not dry_run:
+        col.bulk_write(ops, ordered=False)
+    return changed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Add grocery name_key and merge duplicate groceries")
+    parser.add_argument("--batch-size", type=int, default=500, help="Recipe updates per bulk write")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+    args = parser.parse_args()
+
+    # Batches and index builds can outlast a socket timeout set for the API
+    config.MONGO_SOCKET_TIMEOUT_MS = 0
+
+    stats = backfill_name_keys(get_groceries_collection(), get_receipts_collection(), dry_run=args.dry_run)
+    print(f"Groceries: {stats['updated']} updated, {stats['merged']} duplicates merged.")
+    recipes = rekey_recipes(args.batch_size, args.dry_run)
+    print(f"Recipes: {recipes} ingredient key sets updated.")
+
+    if args.dry_run:
+        print("Dry run: nothing written.")
+        return
+    ensure_indexes()
+    print("Indexes ensured.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Backfill the grocery purchase log from existing groceries.
+
+New purchases are logged on every add (see purchases.py); this one-off
+migration logs one purchase per grocery document written before that, dated
+at its created_at with its current count, then ensures the supporting
+indexes exist. Documents that already have a logged purchase are skipped.
+
+    python scripts/migrate_purchase_log.py [--batch-size 500] [--dry-run]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+# Allow running from the repo root or from apps/backend
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import config  # noqa: E402
+from database import ensure_indexes, get_groceries_collection, get_purchases_collection  # noqa: E402
+from purchases import backfill_purchases  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backfill the grocery purchase log")
+    parser.add_argument("--batch-size", type=int, default=500, help="Groceries per bulk write")
+    parser.add_argument("--dry-run", action="store_true", help="Count purchases to log without writing")
+    args = parser.parse_args()
+
+    # Batches and index builds can outlast a socket timeout set for the API
+    config.MONGO_SOCKET_TIMEOUT_MS = 0
+
+    count = backfill_purchases(
+        get_groceries_collection(), get_purchases_collection(), batch_size=args.batch_size, dry_run=args.dry_run
+    )
+    if args.dry_run:
+        print(f"{count} grocery documents need a logged purchase.")
+        return
+
+    print(f"Logged {count} purchases.")
+    ensure_indexes()
+    print("Indexes ensured.")
+
+
+if __name__ == "__main__":
+    main()
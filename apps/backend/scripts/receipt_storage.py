@@ -0,0 +1,62 @@
+"""Disk-usage report for the receipt image store, optionally running a compaction pass.
+
+    python scripts/receipt_storage.py [--migrate-legacy [--dry-run]] [--compact] [--json]
+
+`--migrate-legacy` moves uploads stored before the content-addressed layout
+(`<user_id>/receipt_*` files) into the store and points their receipts at
+the new copies. `--compact` compacts any originals that still need it and
+applies the configured retention (the same pass the background compactor
+runs).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Allow running from the repo root or from apps/backend
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database import get_receipts_collection  # noqa: E402
+from image_store import TIERS, image_store  # noqa: E402
+
+
+def _human(n: int) -> str:
+    size = float(n)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{int(size)} B"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Report receipt image store disk usage")
+    parser.add_argument("--compact", action="store_true", help="Run one compaction and retention pass first")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--migrate-legacy", action="store_true", help="Move legacy uploads into the store first")
+    parser.add_argument("--dry-run", action="store_true", help="With --migrate-legacy: only count what would move")
+    args = parser.parse_args()
+
+    if args.migrate_legacy:
+        stats = image_store.migrate_legacy(get_receipts_collection(), dry_run=args.dry_run)
+        print(f"Legacy migration{' (dry run)' if args.dry_run else ''}: {stats}")
+
+    if args.compact:
+        stats = image_store.run_once()
+        print(f"Compaction: {stats}")
+
+    report = image_store.disk_usage()
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"Receipt image store: {image_store.root}")
+    for tier in (*TIERS, "legacy"):
+        print(f"  {tier:<10} {report[tier]['files']:>8} files  {_human(report[tier]['bytes']):>10}")
+    print(f"  {'total':<10} {'':>8}        {_human(report['total_bytes']):>10}")
+
+
+if __name__ == "__main__":
+    main()
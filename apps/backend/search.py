@@ -0,0 +1,298 @@
+"""Full-text search over the user's receipts (`raw_text`) and groceries (`name`).
+
+GET /api/search?q=salmon returns the best matches first, with a snippet for
+receipts, paginated with `offset`/`limit`. Terms are OR'ed, as in Mongo's
+`$text`; documents matching more (and rarer) terms rank higher.
+
+Two backends, chosen by SEARCH_BACKEND:
+
+* `mongo` (default): `$text` queries on the compound text indexes
+  `(user_id, raw_text)` and `(user_id, name)` (see database.ensure_indexes),
+  ranked by `textScore`. The `user_id` prefix keeps each query inside one
+  user's documents.
+* `local`: an in-process inverted index per user with BM25 ranking, for
+  deployments without text indexes (some Mongo-compatible services, mongomock
+  in tests). A user's index is built from Mongo on first search and rebuilt
+  when their receipts or groceries version (pantry_events.py) changes, so it
+  is never stale; recipe saves don't touch it. The freshness check is the
+  same primary-key read the list ETags use. The least recently searched
+  users are evicted past SEARCH_LOCAL_MAX_USERS. A rebuild costs time
+  linear in the user's history (about a second per 10k receipts, see
+  scripts/bench_search.py), paid by the first search after a write, so this
+  backend suits modest histories; large deployments should use `mongo`.
+
+If a `$text` query fails (e.g. the text index is missing), the request is
+answered by the local backend and a warning is logged.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Iterable, Literal, Optional
+
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+from pymongo.errors import OperationFailure
+
+from admission import rate_limit
+from auth import get_current_user, User
+from config import config
+from database import get_groceries_collection, get_receipts_collection
+from names import singular
+from pantry_events import current_versions
+
+router = APIRouter(prefix="/api/search", tags=["search"], dependencies=[Depends(rate_limit("crud"))])
+
+Kind = Literal["receipt", "grocery"]
+KINDS: tuple[str, ...] = ("receipt", "grocery")
+_TYPE_KINDS = {"all": KINDS, "receipts": ("receipt",), "groceries": ("grocery",)}
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+# Small English stop list, roughly what Mongo's text index drops
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it of on or that the to was with".split()
+)
+_SNIPPET_CHARS = 120
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower-cased, singularized word tokens without stop words."""
+    return [singular(t) for t in _TOKEN_RE.findall(str(text or "").casefold()) if t not in _STOPWORDS]
+
+
+def snippet(text: str, terms: Iterable[str], width: int = _SNIPPET_CHARS) -> str:
+    """About `width` characters of `text` around the first query term, whitespace collapsed."""
+    flat = " ".join(str(text or "").split())
+    wanted = set(terms)
+    start = 0
+    for m in _TOKEN_RE.finditer(flat):
+        if singular(m.group().casefold()) in wanted:
+            start = max(0, m.start() - width // 3)
+            break
+    out = flat[start:start + width]
+    if start > 0:
+        out = "…" + out
+    if start + width < len(flat):
+        out += "…"
+    return out
+
+
+def _receipt_title(raw_text: str) -> str:
+    # The first printed line is usually the store name
+    for line in str(raw_text or "").splitlines():
+        if line.strip():
+            return line.strip()[:80]
+    return "Receipt"
+
+
+class SearchHit(BaseModel):
+    kind: Kind
+    id: str
+    score: float
+    title: str
+    snippet: str = ""
+    created_at: Optional[datetime] = None
+
+
+class SearchResponse(BaseModel):
+    query: str
+    backend: str
+    total: int
+    offset: int
+    limit: int
+    took_ms: float
+    results: list[SearchHit]
+
+
+def _hit(kind: str, doc: dict[str, Any], score: float, terms: list[str]) -> SearchHit:
+    if kind == "receipt":
+        text = doc.get("raw_text", "")
+        return SearchHit(kind="receipt", id=str(doc["_id"]), score=round(score, 4), title=_receipt_title(text),
+                         snippet=snippet(text, terms), created_at=doc.get("created_at"))
+    return SearchHit(kind="grocery", id=str(doc["_id"]), score=round(score, 4), title=doc.get("name", ""),
+                     created_at=doc.get("created_at"))
+
+
+class MongoTextSearch:
+    name = "mongo"
+
+    def search(self, user_id: str, query: str, kinds: tuple[str, ...], limit: int) -> tuple[list[SearchHit], int]:
+        """Top `limit` hits across `kinds`, and the total number of matches."""
+        terms = tokenize(query)
+        hits: list[SearchHit] = []
+        total = 0
+        for kind in kinds:
+            col, user_filter, fields = self._target(kind, user_id)
+            filt = {**user_filter, "$text": {"$search": query}}
+            total += col.count_documents(filt)
+            cursor = col.find(filt, {"score": {"$meta": "textScore"}, **fields}) \
+                .sort([("score", {"$meta": "textScore"})]).limit(limit)
+            hits.extend(_hit(kind, doc, doc.get("score", 0.0), terms) for doc in cursor)
+        hits.sort(key=lambda h: -h.score)
+        return hits[:limit], total
+
+    @staticmethod
+    def _target(kind: str, user_id: str) -> tuple[Any, dict[str, Any], dict[str, int]]:
+        if kind == "receipt":
+            # Receipts store the user id as a string, groceries as an ObjectId
+            return get_receipts_collection(), {"user_id": user_id}, {"raw_text": 1, "created_at": 1}
+        return get_groceries_collection(), {"user_id": ObjectId(user_id)}, {"name": 1, "created_at": 1}
+
+
+class InvertedIndex:
+    """BM25 over a fixed set of documents; rebuilt, not updated, when they change.
+
+    Each kind (receipts, groceries) gets its own postings and length
+    statistics, as the two Mongo collections do. BM25 weights are computed at
+    build time and every posting list is sorted by weight, so a query only
+    sums precomputed floats, and a one-word query is just the head of a list.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, docs: Iterable[tuple[str, dict[str, Any], str]]):
+        """`docs`: (kind, mongo doc, searchable text)."""
+        self.docs: list[tuple[str, dict[str, Any]]] = []
+        # kind -> term -> (doc indexes, weights), by descending weight
+        self.postings: dict[str, dict[str, tuple[list[int], list[float]]]] = {}
+        raw: dict[str, dict[str, list[tuple[int, int]]]] = {}
+        lengths: dict[int, int] = {}
+        for kind, doc, text in docs:
+            i = len(self.docs)
+            tokens = tokenize(text)
+            self.docs.append((kind, doc))
+            lengths[i] = len(tokens)
+            counts: dict[str, int] = {}
+            for t in tokens:
+                counts[t] = counts.get(t, 0) + 1
+            terms = raw.setdefault(kind, {})
+            for t, tf in counts.items():
+                terms.setdefault(t, []).append((i, tf))
+
+        for kind, terms in raw.items():
+            members = [i for i, (k, _) in enumerate(self.docs) if k == kind]
+            n = len(members)
+            avg_length = (sum(lengths[i] for i in members) / n) or 1.0
+            out = self.postings[kind] = {}
+            for t, postings in terms.items():
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                weighted = sorted(
+                    ((idf * tf * (self.K1 + 1) / (tf + self.K1 * (1 - self.B + self.B * lengths[i] / avg_length)), i)
+                     for i, tf in postings),
+                    reverse=True,
+                )
+                out[t] = ([i for _, i in weighted], [w for w, _ in weighted])
+
+    def search(self, query: str, kinds: tuple[str, ...], limit: int) -> tuple[list[SearchHit], int]:
+        terms = list(dict.fromkeys(tokenize(query)))
+        lists = [self.postings[k][t] for k in kinds if k in self.postings for t in terms if t in self.postings[k]]
+        if len(lists) == 1:
+            ids, weights = lists[0]
+            top = list(zip(weights[:limit], ids[:limit]))
+            total = len(ids)
+        else:
+            scores: dict[int, float] = {}
+            get = scores.get
+            for ids, weights in lists:
+                for i, w in zip(ids, weights):
+                    scores[i] = get(i, 0.0) + w
+            top = heapq.nlargest(limit, ((s, i) for i, s in scores.items()))
+            total = len(scores)
+        return [_hit(self.docs[i][0], self.docs[i][1], s, terms) for s, i in top], total
+
+
+class LocalIndexSearch:
+    name = "local"
+
+    def __init__(self, max_users: int):
+        self.max_users = max(1, max_users)
+        self._lock = threading.Lock()
+        self._indexes: OrderedDict[str, tuple[tuple[int, int], InvertedIndex]] = OrderedDict()
+        self.builds = 0
+
+    def search(self, user_id: str, query: str, kinds: tuple[str, ...], limit: int) -> tuple[list[SearchHit], int]:
+        return self.index_for(user_id).search(query, kinds, limit)
+
+    def index_for(self, user_id: str) -> InvertedIndex:
+        groceries = get_groceries_collection()
+        versions = current_versions(user_id)
+        version = (versions["receipts"], versions["groceries"])
+        with self._lock:
+            cached = self._indexes.get(user_id)
+            if cached is not None and cached[0] == version:
+                self._indexes.move_to_end(user_id)
+                return cached[1]
+        # Build outside the lock; a concurrent build for the same user just wins or loses the store
+        index = InvertedIndex(self._user_docs(user_id, groceries))
+        with self._lock:
+            self.builds += 1
+            self._indexes[user_id] = (version, index)
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+        return index
+
+    @staticmethod
+    def _user_docs(user_id: str, groceries: Any) -> Iterable[tuple[str, dict[str, Any], str]]:
+        for doc in get_receipts_collection().find({"user_id": user_id}, {"raw_text": 1, "created_at": 1}):
+            yield "receipt", doc, doc.get("raw_text", "")
+        for doc in groceries.find({"user_id": ObjectId(user_id)}, {"name": 1, "created_at": 1}):
+            yield "grocery", doc, doc.get("name", "")
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        with self._lock:
+            if user_id is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(user_id, None)
+
+
+mongo_search = MongoTextSearch()
+local_search = LocalIndexSearch(max_users=config.SEARCH_LOCAL_MAX_USERS)
+
+
+def get_backend() -> Any:
+    return local_search if config.SEARCH_BACKEND == "local" else mongo_search
+
+
+@router.get("", response_model=SearchResponse)
+def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    type: Literal["all", "receipts", "groceries"] = "all",
+    offset: int = Query(0, ge=0, le=1000),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_user),
+):
+    if not tokenize(q):
+        raise HTTPException(status_code=400, detail="Query has no searchable words")
+    if not ObjectId.is_valid(current_user.id):
+        raise HTTPException(status_code=400, detail="Invalid user id")
+    kinds = _TYPE_KINDS[type]
+
+    start = time.perf_counter()
+    backend = get_backend()
+    try:
+        hits, total = backend.search(current_user.id, q, kinds, offset + limit)
+    except (OperationFailure, NotImplementedError) as e:
+        if backend is local_search:
+            raise
+        print(f"Warning: text search failed ({e}); using the local index")
+        backend = local_search
+        hits, total = backend.search(current_user.id, q, kinds, offset + limit)
+    return SearchResponse(
+        query=q,
+        backend=backend.name,
+        total=total,
+        offset=offset,
+        limit=limit,
+        took_ms=round((time.perf_counter() - start) * 1000, 2),
+        results=hits[offset:offset + limit],
+    )
@@ -1,23 +1,41 @@
+import json
+import threading
 import time
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any
+from typing import Any, AsyncIterator
 from fastapi import FastAPI, File, HTTPException, UploadFile, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import StreamingResponse
 from config import config
-from ocr import ocr_image, check_tesseract_available
+from compression import CompressionMiddleware
+from responses import FastJSONResponse
+from ocr import ocr_image, check_tesseract_available, warm_up as ocr_warm_up
 from receipt_parser import ReceiptParser
 from auth import router as auth_router, get_current_user, User
+from password_hashing import password_hasher
 from groceries import router as groceries_router
 from receipts import router as receipts_router
+from analytics import router as analytics_router
+from search import router as search_router
+from image_store import image_compactor, image_store
+from admission import llm_ceiling, ocr_ceiling, rate_limit
+from llm_providers import llm_router
+from metrics import MetricsMiddleware, router as metrics_router, stage
+from profiling import ProfilingMiddleware, profile_store, router as profiling_router
 from pydantic import BaseModel
 import re
 
 
-app = FastAPI(title="grocery-backend")
+app = FastAPI(title="grocery-backend", default_response_class=FastJSONResponse)
 app.include_router(auth_router)
 app.include_router(groceries_router)
 app.include_router(receipts_router)
+app.include_router(analytics_router)
+app.include_router(search_router)
+app.include_router(metrics_router)
+app.include_router(profiling_router)
     
 # Dynamically import recipes router to avoid static import path issues
 try:
@@ -34,6 +52,20 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=config.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=config.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=config.COMPRESSION_BROTLI_QUALITY,
+)
+if config.PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=profile_store,
+        sample_every_n=config.PROFILE_SAMPLE_EVERY_N,
+        interval_seconds=config.PROFILE_INTERVAL_MS / 1000,
+    )
+app.add_middleware(MetricsMiddleware)
 
 
 
@@ -51,10 +83,42 @@ async def startup_event():
             "Install Tesseract OCR before running"
         )
     config.ensure_upload_dir()
+
+    import database
+    database.connect()
+    # Import the OCR stack now, off the event loop, so the first upload doesn't pay for it
+    threading.Thread(target=ocr_warm_up, name="ocr-warm-up", daemon=True).start()
+
+    try:
+        from database import ensure_indexes
+        ensure_indexes()
+    except Exception as e:
+        print(f"Warning: failed to ensure indexes: {e}")
+
+    if config.EXPIRY_SWEEP_ENABLED:
+        from expiry_sweeper import expiry_sweeper
+        expiry_sweeper.start()
+    if config.RECEIPT_COMPACTOR_ENABLED:
+        image_compactor.start()
+    from grocery_catalog import grocery_catalog
+    grocery_catalog.start()
     
     print("API started successfully")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    from expiry_sweeper import expiry_sweeper
+    from grocery_catalog import grocery_catalog
+    from recipe_scheduler import recipe_scheduler
+    expiry_sweeper.stop()
+    grocery_catalog.stop()
+    image_compactor.stop()
+    recipe_scheduler.shutdown()
+    import database
+    database.close()
+
+
 @app.get("/")
 async def root():
     return {
@@ -62,8 +126,10 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "upload": "/api/receipt/upload",
+            "upload_stream": "/api/receipt/upload/stream",
             "analyze_text": "/api/receipt/analyze-text",
             "health": "/health",
+            "metrics": "/metrics",
             "docs": "/docs",
         },
     }
@@ -74,30 +140,52 @@ async def health_check():
     """Health check endpoint."""
     return {
         "status": "healthy",
-        "tesseract_available": check_tesseract_available()
+        "tesseract_available": check_tesseract_available(),
+        "admission": {"ocr": ocr_ceiling.stats(), "llm": llm_ceiling.stats(), "password_hash": password_hasher.stats()},
+        "llm": llm_router.health(),
+        "mongo_pool": _mongo_pool_health(),
+    }
+
+
+def _mongo_pool_health() -> dict[str, Any]:
+    import database
+    return {
+        **database.pool_monitor.stats(),
+        "max_pool_size": config.MONGO_MAX_POOL_SIZE,
+        "compressors": database.available_compressors(config.MONGO_COMPRESSORS),
+        "connected": database.client is not None,
     }
 
 
-@app.post("/api/receipt/upload")
-async def upload_receipt(file: UploadFile = File(...), current_user: User = Depends(get_current_user)) -> JSONResponse:
+@app.post("/api/receipt/upload", dependencies=[Depends(rate_limit("ocr"))])
+async def upload_receipt(file: UploadFile = File(...), current_user: User = Depends(get_current_user)) -> FastJSONResponse:
     start_time = time.time()
     try:
         validate_file(file)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     
-    file_path = save_upload_file(file, current_user.id)
+    file_path = save_upload_file(file)
     try:
-        ocr_text = ocr_image(file_path, preprocess=config.OCR_PREPROCESS_METHOD)
+        async with ocr_ceiling.async_slot():
+            ocr_text = await run_in_threadpool(
+                ocr_image, _receipt_image(file_path.stem), preprocess=config.OCR_PREPROCESS_METHOD
+            )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"OCR processing failed: {str(e)}"
         )
+    image_store.schedule_compaction(file_path.stem)
 
     try:
         receipt_parser = ReceiptParser(user_id=current_user.id)
-        items = receipt_parser.parse_receipt_text(ocr_text)
+        async with llm_ceiling.async_slot():
+            items = await run_in_threadpool(receipt_parser.parse_receipt_text, ocr_text)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -112,22 +200,8 @@ async def upload_receipt(file: UploadFile = File(...), current_user: User = Depe
         # Don't fail the request if persistence fails; just continue and return OCR result
         print(f"Warning: failed to persist groceries: {e}")
 
-    # Create receipt document
-    try:
-        from database import get_receipts_collection
-        from models import Receipt
-        receipts_col = get_receipts_collection()
-        receipt = Receipt(
-            user_id=current_user.id,
-            file_path=str(file_path),
-            raw_text=ocr_text,
-            grocery_items=grocery_item_ids
-        )
-        receipts_col.insert_one(receipt.dict())
-    except Exception as e:
-        # Don't fail the request if persistence fails
-        print(f"Warning: failed to persist receipt doc: {e}")
-
+    # Create receipt document (best-effort)
+    _persist_receipt(current_user.id, str(file_path), ocr_text, grocery_item_ids, image_sha256=file_path.stem)
 
     processing_time_ms = int((time.time() - start_time) * 1000)
 
@@ -139,15 +213,89 @@ async def upload_receipt(file: UploadFile = File(...), current_user: User = Depe
         "processing_time_ms": processing_time_ms
     }
     
-    return JSONResponse(content=response_data)
+    return FastJSONResponse(content=response_data)
+
+
+@app.post("/api/receipt/upload/stream", dependencies=[Depends(rate_limit("ocr"))])
+async def upload_receipt_stream(file: UploadFile = File(...), current_user: User = Depends(get_current_user)) -> StreamingResponse:
+    """
+    Same pipeline as /api/receipt/upload, but reports progress as Server-Sent
+    Events so clients can render partial results while later stages run.
+
+    Events, in order: `uploaded`, `ocr_done`, `items_parsed`, `persisted`.
+    If a stage fails an `error` event is sent instead and the stream ends.
+    """
+    try:
+        validate_file(file)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Save before streaming starts; the upload is closed once the handler returns.
+    file_path = save_upload_file(file)
+    return StreamingResponse(
+        _receipt_progress_events(file_path, current_user.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _receipt_progress_events(file_path: Path, user_id: str) -> AsyncIterator[str]:
+    start_time = time.time()
+    yield _sse_event("uploaded", {"file_name": file_path.name})
+
+    try:
+        async with ocr_ceiling.async_slot():
+            ocr_text = await run_in_threadpool(
+                ocr_image, _receipt_image(file_path.stem), preprocess=config.OCR_PREPROCESS_METHOD
+            )
+    except HTTPException as e:
+        yield _sse_event("error", {"stage": "ocr", "detail": e.detail})
+        return
+    except Exception as e:
+        yield _sse_event("error", {"stage": "ocr", "detail": f"OCR processing failed: {str(e)}"})
+        return
+    image_store.schedule_compaction(file_path.stem)
+    yield _sse_event("ocr_done", {"raw_text": ocr_text})
+
+    try:
+        receipt_parser = ReceiptParser(user_id=user_id)
+        async with llm_ceiling.async_slot():
+            items = await run_in_threadpool(receipt_parser.parse_receipt_text, ocr_text)
+    except HTTPException as e:
+        yield _sse_event("error", {"stage": "parse", "detail": e.detail})
+        return
+    except Exception as e:
+        yield _sse_event("error", {"stage": "parse", "detail": f"Receipt parsing failed: {str(e)}"})
+        return
+    yield _sse_event("items_parsed", {"items": items, "total_items": len(items)})
+
+    grocery_item_ids: list[str] = []
+    try:
+        grocery_item_ids = await run_in_threadpool(receipt_parser.add_groceries_to_db, items)
+    except Exception as e:
+        print(f"Warning: failed to persist groceries (stream): {e}")
+    receipt_id = await run_in_threadpool(
+        _persist_receipt, user_id, str(file_path), ocr_text, grocery_item_ids, file_path.stem
+    )
+
+    yield _sse_event("persisted", {
+        "grocery_item_ids": grocery_item_ids,
+        "receipt_id": receipt_id,
+        "processing_time_ms": int((time.time() - start_time) * 1000),
+    })
+
+
+def _sse_event(event: str, data: dict[str, Any]) -> str:
+    """Format one Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
 
 
 class AnalyzeTextRequest(BaseModel):
     text: str
 
 
-@app.post("/api/receipt/analyze-text")
-async def analyze_text(body: AnalyzeTextRequest, current_user: User = Depends(get_current_user)) -> JSONResponse:
+@app.post("/api/receipt/analyze-text", dependencies=[Depends(rate_limit("llm"))])
+async def analyze_text(body: AnalyzeTextRequest, current_user: User = Depends(get_current_user)) -> FastJSONResponse:
     """
     Accepts multi-line text input with one grocery per line, optionally including a count.
     The text is parsed for item names, which are then passed to an LLM to enrich
@@ -162,7 +310,10 @@ async def analyze_text(body: AnalyzeTextRequest, current_user: User = Depends(ge
     try:
         receipt_parser = ReceiptParser(user_id=current_user.id)
         # The parser expects a single block of text.
-        parsed_items_from_llm = receipt_parser.parse_receipt_text(text)
+        async with llm_ceiling.async_slot():
+            parsed_items_from_llm = await run_in_threadpool(receipt_parser.parse_receipt_text, text)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -233,24 +384,12 @@ async def analyze_text(body: AnalyzeTextRequest, current_user: User = Depends(ge
             print(f"Warning: failed to persist groceries (text analysis): {e}")
 
     # Persist a receipt document
-    try:
-        from database import get_receipts_collection
-        from models import Receipt
-        receipts_col = get_receipts_collection()
-        synthetic_path = f"text://{int(time.time() * 1000)}"
-        receipt = Receipt(
-            user_id=current_user.id,
-            file_path=synthetic_path,
-            raw_text=text,
-            grocery_items=grocery_item_ids,
-        )
-        receipts_col.insert_one(receipt.dict())
-    except Exception as e:
-        print(f"Warning: failed to persist receipt doc (text analysis): {e}")
+    synthetic_path = f"text://{int(time.time() * 1000)}"
+    _persist_receipt(current_user.id, synthetic_path, text, grocery_item_ids)
 
     processing_time_ms = int((time.time() - start_time) * 1000)
     total_units = sum(i.get("count", 1) for i in final_items)
-    return JSONResponse(
+    return FastJSONResponse(
         content={
             "success": True,
             "items": final_items,
@@ -261,6 +400,40 @@ async def analyze_text(body: AnalyzeTextRequest, current_user: User = Depends(ge
     )
 
 
+def _persist_receipt(
+    user_id: str,
+    file_path: str,
+    raw_text: str,
+    grocery_item_ids: list[str],
+    image_sha256: str | None = None,
+) -> str | None:
+    """Insert a receipt document; returns its id, or None if persistence failed.
+
+    Failures are logged rather than raised so an OCR result is never lost
+    because of a database hiccup.
+    """
+    try:
+        from database import get_receipts_collection
+        from models import Receipt
+        receipts_col = get_receipts_collection()
+        receipt = Receipt(
+            user_id=user_id,
+            file_path=file_path,
+            raw_text=raw_text,
+            grocery_items=grocery_item_ids,
+            created_at=datetime.now(timezone.utc),
+            image_sha256=image_sha256,
+        )
+        from pantry_events import bump_version
+        with stage("mongo_write"):
+            result = receipts_col.insert_one(receipt.dict())
+            bump_version(user_id, "receipts")
+        return str(result.inserted_id)
+    except Exception as e:
+        print(f"Warning: failed to persist receipt doc: {e}")
+        return None
+
+
 def validate_file(file: UploadFile) -> None:
     if not file.filename:
         raise ValueError("No filename provided")
@@ -277,21 +450,22 @@ def validate_file(file: UploadFile) -> None:
         )
 
 
-def save_upload_file(file: UploadFile, user_id: str) -> Path:
-    timestamp = int(time.time() * 1000)
-    file_ext = Path(file.filename).suffix
-    filename = f"receipt_{timestamp}{file_ext}"
-    
-    user_receipt_dir = config.UPLOAD_DIR / "receipts" / user_id
-    user_receipt_dir.mkdir(parents=True, exist_ok=True)
-    
-    file_path = user_receipt_dir / filename
+def _receipt_image(image_sha256: str) -> Path:
+    """The receipt's image as stored now: the original, or its compact copy once retention dropped it."""
+    path = image_store.best_image(image_sha256)
+    if path is None:
+        raise FileNotFoundError(f"Receipt image {image_sha256} is no longer stored")
+    return path
 
-    with open(file_path, "wb") as f:
-        content = file.file.read()
-        f.write(content)
-    
-    return file_path
+
+def save_upload_file(file: UploadFile) -> Path:
+    """Store the upload in the content-addressed image store; returns the original's path.
+
+    The file name is the sha256 of the bytes (see image_store.py), so it
+    doubles as the receipt's image id.
+    """
+    with stage("file_save"):
+        return image_store.put(file.file.read(), Path(file.filename).suffix).path
 
 
 if __name__ == "__main__":
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+from unittest.mock import patch
+
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from mongomock import MongoClient
+from pymongo.errors import ServerSelectionTimeoutError
+
+from admission import (
+    Bucket,
+    ConcurrencyCeiling,
+    MemoryBucketStore,
+    MongoBucketStore,
+    RateLimiter,
+    rate_limit,
+)
+from auth import User, get_current_user
+
+
+USER = User(id="507f1f77bcf86cd799439011", email="tester@example.com", username="tester")
+
+
+def test_memory_bucket_allows_burst_then_refills():
+    bucket = Bucket(per_minute=60, burst=3)  # one token per second
+    store = MemoryBucketStore()
+
+    assert [store.take("ocr:u", bucket, now=100.0) for _ in range(3)] == [0, 0, 0]
+    assert store.take("ocr:u", bucket, now=100.0) == pytest.approx(1.0)
+    assert store.take("ocr:u", bucket, now=100.5) == pytest.approx(0.5)
+    assert store.take("ocr:u", bucket, now=101.0) == 0
+    # Other users and classes have their own buckets
+    assert store.take("ocr:v", bucket, now=101.0) == 0
+
+
+def test_memory_store_is_bounded():
+    store = MemoryBucketStore(max_keys=2)
+    bucket = Bucket(per_minute=1, burst=1)
+    for key in ("a", "b", "c"):
+        store.take(key, bucket, now=0.0)
+    # "a" was evicted, so it starts with a full bucket again
+    assert store.take("a", bucket, now=0.0) == 0
+
+
+def test_mongo_buckets_are_shared_between_workers():
+    col = MongoClient()["test_db"]["rate_limits"]
+    bucket = Bucket(per_minute=60, burst=2)
+    worker_a, worker_b = MongoBucketStore(lambda: col), MongoBucketStore(lambda: col)
+
+    assert worker_a.take("llm:u", bucket, now=10.0) == 0
+    assert worker_b.take("llm:u", bucket, now=10.0) == 0
+    assert worker_a.take("llm:u", bucket, now=10.0) == pytest.approx(1.0)
+    assert worker_b.take("llm:u", bucket, now=11.0) == 0
+    assert col.find_one({"_id": "llm:u"})["expires_at"] is not None
+
+
+def test_limiter_fails_open_when_store_is_down():
+    class DownStore:
+        def take(self, *args):
+            raise ServerSelectionTimeoutError("no servers")
+
+    limiter = RateLimiter({"crud": Bucket(1, 1)}, DownStore())
+    assert limiter.check("u", "crud") == 0
+
+
+def test_dependency_returns_429_with_retry_after():
+    limiter = RateLimiter({"ocr": Bucket(per_minute=2, burst=1)}, MemoryBucketStore())
+    with patch("admission.rate_limiter", limiter):
+        app = FastAPI()
+
+        @app.get("/ocr", dependencies=[Depends(rate_limit("ocr"))])
+        def ocr():
+            return {"ok": True}
+
+        app.dependency_overrides[get_current_user] = lambda: USER
+        client = TestClient(app)
+        assert client.get("/ocr").status_code == 200
+        resp = client.get("/ocr")
+
+    assert resp.status_code == 429
+    assert 1 <= int(resp.headers["retry-after"]) <= 30
+
+
+def test_ceiling_rejects_when_saturated():
+    ceiling = ConcurrencyCeiling("ocr", max_concurrency=1, queue_timeout=0.05)
+    release = threading.Event()
+    holding = threading.Event()
+
+    def hold():
+        with ceiling.slot():
+            holding.set()
+            release.wait(2)
+
+    t = threading.Thread(target=hold)
+    t.start()
+    assert holding.wait(2)
+    assert ceiling.stats()["in_flight"] == 1
+
+    with pytest.raises(HTTPException) as exc:
+        with ceiling.slot():
+            pass
+    assert exc.value.status_code == 503
+    assert exc.value.headers["Retry-After"] == "1"
+
+    release.set()
+    t.join()
+
+    async def run():
+        async with ceiling.async_slot():
+            return ceiling.stats()
+
+    assert asyncio.run(run()) == {"max": 1, "in_flight": 1, "waiting": 0}
+    assert ceiling.stats()["in_flight"] == 0
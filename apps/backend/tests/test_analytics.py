@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from mongomock import MongoClient
+
+import analytics
+from auth import User
+
+
+USER_ID = "507f1f77bcf86cd799439011"
+USER = User(id=USER_ID, email="tester@example.com", username="tester")
+
+
+@pytest.fixture
+def db():
+    db = MongoClient()["test_db"]
+    oid = ObjectId(USER_ID)
+    db["groceries"].insert_many([
+        {"user_id": oid, "name": "Milk", "count": 2, "min_days": 5, "max_days": 7, "created_at": datetime(2025, 3, 1, 9)},
+        {"user_id": oid, "name": "Apple", "count": 3, "min_days": 14, "max_days": 21, "created_at": datetime(2025, 3, 1, 18)},
+        {"user_id": oid, "name": "Rice", "count": 1, "min_days": None, "max_days": None, "created_at": datetime(2025, 3, 2)},
+        {"user_id": oid, "name": "Berries", "count": 1, "min_days": 1, "max_days": 2, "created_at": datetime(2025, 3, 5)},
+        {"user_id": ObjectId(), "name": "Milk", "count": 9, "max_days": 7, "created_at": datetime(2025, 3, 1)},
+    ])
+    # Milk was bought twice; its grocery document only remembers the first time
+    db["grocery_purchases"].insert_many([
+        {"user_id": oid, "name": "Milk", "name_key": "milk", "units": 1, "created_at": datetime(2025, 3, 1, 9)},
+        {"user_id": oid, "name": "Apple", "name_key": "apple", "units": 3, "created_at": datetime(2025, 3, 1, 18)},
+        {"user_id": oid, "name": "Rice", "name_key": "rice", "units": 1, "created_at": datetime(2025, 3, 2)},
+        {"user_id": oid, "name": "Berries", "name_key": "berry", "units": 1, "created_at": datetime(2025, 3, 5)},
+        {"user_id": oid, "name": "milk", "name_key": "milk", "units": 1, "created_at": datetime(2025, 3, 5, 8)},
+        {"user_id": ObjectId(), "name": "Milk", "name_key": "milk", "units": 9, "created_at": datetime(2025, 3, 1)},
+    ])
+    db["receipts"].insert_many([
+        {"user_id": USER_ID, "raw_text": "a", "created_at": datetime(2025, 3, 1, 10)},
+        {"user_id": USER_ID, "raw_text": "b", "created_at": datetime(2025, 3, 3)},
+        {"user_id": USER_ID, "raw_text": "legacy"},
+    ])
+    with patch("analytics.get_groceries_collection", return_value=db["groceries"]), \
+         patch("analytics.get_receipts_collection", return_value=db["receipts"]), \
+         patch("analytics.get_purchases_collection", return_value=db["grocery_purchases"]):
+        yield db
+
+
+def test_daily_purchases(db):
+    rows = analytics.daily_purchases(start=None, end=None, current_user=USER)
+    assert [(r.date, r.grocery_items, r.units, r.receipts) for r in rows] == [
+        ("2025-03-01", 2, 4, 1),
+        ("2025-03-02", 1, 1, 0),
+        ("2025-03-03", 0, 0, 1),
+        ("2025-03-05", 2, 2, 0),
+    ]
+
+    rows = analytics.daily_purchases(start=datetime(2025, 3, 2), end=datetime(2025, 3, 4), current_user=USER)
+    assert [r.date for r in rows] == ["2025-03-02", "2025-03-03"]
+
+    with pytest.raises(HTTPException):
+        analytics.daily_purchases(start=datetime(2025, 3, 4), end=datetime(2025, 3, 2), current_user=USER)
+
+
+def test_mixed_naive_and_aware_bounds(db):
+    # Naive start is UTC; 2025-03-04T01:00+02:00 is 2025-03-03T23:00Z
+    end = datetime(2025, 3, 4, 1, tzinfo=timezone(timedelta(hours=2)))
+    rows = analytics.daily_purchases(start=datetime(2025, 3, 2), end=end, current_user=USER)
+    assert [r.date for r in rows] == ["2025-03-02", "2025-03-03"]
+
+    with pytest.raises(HTTPException):
+        analytics.daily_purchases(start=datetime(2025, 3, 4, tzinfo=timezone.utc), end=datetime(2025, 3, 2),
+                                  current_user=USER)
+
+
+def test_perishability(db):
+    out = analytics.perishability(start=None, end=None, current_user=USER)
+    assert (out.perishable_items, out.perishable_units) == (3, 6)
+    assert (out.shelf_stable_items, out.shelf_stable_units) == (1, 1)
+    assert [(b.min_days, b.max_days, b.items) for b in out.shelf_life] == [(0, 2, 1), (7, 13, 1), (14, 29, 1)]
+
+
+def test_item_frequency(db):
+    rows = analytics.item_frequency(start=None, end=None, limit=2, current_user=USER)
+    assert [(r.name, r.items, r.units) for r in rows] == [("Apple", 1, 3), ("milk", 2, 2)]
+
+    rows = analytics.item_frequency(start=datetime(2025, 3, 2), end=None, limit=5, current_user=USER)
+    assert [(r.name, r.items) for r in rows] == [("Berries", 1), ("milk", 1), ("Rice", 1)]
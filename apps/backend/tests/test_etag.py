@@ -0,0 +1,84 @@
+import json
+from unittest.mock import patch
+
+import pytest
+from fastapi import Request, Response
+from mongomock import MongoClient
+
+import groceries
+import receipts
+import recipes
+from auth import User
+from groceries import GroceryCreate
+from recipes import RecipeCreate
+
+
+USER_ID = "507f1f77bcf86cd799439011"
+USER = User(id=USER_ID, email="tester@example.com", username="tester")
+OTHER = User(id="507f1f77bcf86cd799439012", email="other@example.com", username="other")
+
+
+def _request(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "headers": headers})
+
+
+@pytest.fixture
+def db():
+    db = MongoClient()["test_db"]
+    with patch("groceries.get_groceries_collection", return_value=db["groceries"]), \
+         patch("recipes.get_recipes_collection", return_value=db["recipes"]), \
+         patch("receipts.get_receipts_collection", return_value=db["receipts"]), \
+         patch("pantry_events.get_pantry_versions_collection", return_value=db["pantry_versions"]), \
+         patch("purchases.get_purchases_collection", return_value=db["grocery_purchases"]), \
+         patch("pantry_events.recipe_scheduler"):
+        yield db
+
+
+def test_list_groceries_answers_304_until_pantry_changes(db):
+    groceries.add_grocery(GroceryCreate(name="Milk"), current_user=USER)
+
+    response = Response()
+    listed = groceries.list_groceries(request=_request(), response=response, current_user=USER)
+    etag = response.headers["etag"]
+    assert listed.headers["etag"] == etag
+    assert len(json.loads(listed.body)) == 1
+
+    with patch.object(db["groceries"], "aggregate") as aggregate:
+        cached = groceries.list_groceries(request=_request(etag), response=Response(), current_user=USER)
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    aggregate.assert_not_called()
+
+    groceries.add_grocery(GroceryCreate(name="Milk"), current_user=USER)
+    response = Response()
+    listed = groceries.list_groceries(request=_request(etag), response=response, current_user=USER)
+    assert json.loads(listed.body)[0]["count"] == 2
+    assert response.headers["etag"] != etag
+
+
+def test_etag_is_per_user(db):
+    response = Response()
+    groceries.list_groceries(request=_request(), response=response, current_user=USER)
+    etag = response.headers["etag"]
+
+    result = groceries.list_groceries(request=_request(etag), response=Response(), current_user=OTHER)
+    assert result.status_code == 200
+    assert json.loads(result.body) == []
+
+
+def test_each_list_has_its_own_version(db):
+    response = Response()
+    recipes.list_recipes(request=_request(), response=response, current_user=USER)
+    recipe_etag = response.headers["etag"]
+    response = Response()
+    receipts.list_receipts(request=_request(), response=response, current_user=USER)
+    receipt_etag = response.headers["etag"]
+    # A recipes tag never validates the receipts list
+    assert receipts.list_receipts(request=_request(recipe_etag), response=Response(), current_user=USER).status_code == 200
+
+    recipes.create_recipe(RecipeCreate(title="Toast", ingredients=["Bread"]), current_user=USER)
+    listed = recipes.list_recipes(request=_request(f"W/{recipe_etag}"), response=Response(), current_user=USER)
+    assert [r["title"] for r in json.loads(listed.body)] == ["Toast"]
+    # Saving a recipe doesn't invalidate the receipt list
+    assert receipts.list_receipts(request=_request(receipt_etag), response=Response(), current_user=USER).status_code == 304
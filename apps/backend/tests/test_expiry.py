@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from mongomock import MongoClient
+
+import groceries
+from auth import User, get_current_user
+from expiry import backfill_expiry_fields, expiry_fields
+from groceries import GroceryCreate
+
+
+USER_ID = "507f1f77bcf86cd799439011"
+USER = User(id=USER_ID, email="tester@example.com", username="tester")
+
+
+@pytest.fixture
+def col():
+    col = MongoClient()["test_db"]["groceries"]
+    with patch("groceries.get_groceries_collection", return_value=col), \
+         patch("groceries.pantry_changed"), \
+         patch("purchases.get_purchases_collection", return_value=col.database["grocery_purchases"]):
+        yield col
+
+
+def test_expiry_fields():
+    created = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    assert expiry_fields(created, 3, 5) == {
+        "expires_earliest_at": datetime(2025, 1, 4, tzinfo=timezone.utc),
+        "expires_latest_at": datetime(2025, 1, 6, tzinfo=timezone.utc),
+    }
+    assert expiry_fields(created, None, None) == {"expires_earliest_at": None, "expires_latest_at": None}
+    # Only max_days: still found by the expiring range query
+    assert expiry_fields(created, None, 5) == {
+        "expires_earliest_at": datetime(2025, 1, 6, tzinfo=timezone.utc),
+        "expires_latest_at": datetime(2025, 1, 6, tzinfo=timezone.utc),
+    }
+
+
+def test_add_grocery_persists_expiry_fields(col):
+    item = groceries.add_grocery(GroceryCreate(name="Milk", min_days=5, max_days=7), current_user=USER)
+    doc = col.find_one({"_id": ObjectId(item.id)})
+    assert doc["expires_earliest_at"] - doc["created_at"] == timedelta(days=5)
+    assert doc["expires_latest_at"] - doc["created_at"] == timedelta(days=7)
+    assert item.expires_earliest_at is not None
+
+
+def test_expiring_returns_window_sorted_by_urgency(col):
+    now = datetime.now(timezone.utc)
+    for name, earliest in [("Yogurt", 3), ("Milk", 1), ("Spoiled", -2), ("Cheese", 20), ("Rice", None)]:
+        col.insert_one({
+            "user_id": ObjectId(USER_ID),
+            "name": name,
+            "created_at": now,
+            "count": 1,
+            "expires_earliest_at": now + timedelta(days=earliest) if earliest is not None else None,
+            "expires_latest_at": now + timedelta(days=earliest + 1) if earliest is not None else None,
+        })
+    col.insert_one({"user_id": ObjectId(), "name": "Other", "created_at": now, "expires_earliest_at": now})
+
+    items = groceries.list_expiring_groceries(within_days=7, current_user=USER)
+    assert [i.name for i in items] == ["Spoiled", "Milk", "Yogurt"]
+
+
+
+def test_expiring_window_is_bounded(col):
+    app = FastAPI()
+    app.include_router(groceries.router)
+    app.dependency_overrides[get_current_user] = lambda: USER
+    client = TestClient(app)
+
+    assert client.get("/api/groceries/expiring?within_days=3650").status_code == 200
+    assert client.get("/api/groceries/expiring?within_days=-1").status_code == 422
+    assert client.get("/api/groceries/expiring?within_days=3000000").status_code == 422
+
+
+def test_backfill_in_batches(col):
+    created = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    for i in range(5):
+        col.insert_one({"user_id": ObjectId(USER_ID), "name": f"Item {i}", "created_at": created, "min_days": i, "max_days": i + 1})
+    col.insert_one({"user_id": ObjectId(USER_ID), "name": "Beans", "created_at": created})
+    # Written before max_days-only items got an earliest bound
+    col.insert_one({"user_id": ObjectId(USER_ID), "name": "Jam", "created_at": created, "max_days": 30,
+                    "expires_earliest_at": None, "expires_latest_at": datetime(2025, 1, 31)})
+
+    assert backfill_expiry_fields(col, batch_size=2, dry_run=True) == 7
+    assert col.count_documents({"expires_earliest_at": {"$exists": True}}) == 1
+
+    assert backfill_expiry_fields(col, batch_size=2) == 7
+    assert backfill_expiry_fields(col, batch_size=2) == 0
+    doc = col.find_one({"name": "Item 3"})
+    assert doc["expires_earliest_at"] == datetime(2025, 1, 4)
+    assert col.find_one({"name": "Beans"})["expires_earliest_at"] is None
+    assert col.find_one({"name": "Jam"})["expires_earliest_at"] == datetime(2025, 1, 31)
@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from mongomock import MongoClient
+
+import groceries
+from auth import User
+from expiry_sweeper import ExpirySweeper
+
+
+USER_A = "507f1f77bcf86cd799439011"
+USER_B = "507f1f77bcf86cd799439012"
+NOW = datetime(2025, 6, 10, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def db():
+    db = MongoClient()["test_db"]
+    with patch("expiry_sweeper.get_groceries_collection", return_value=db["groceries"]), \
+         patch("expiry_sweeper.get_expiry_digests_collection", return_value=db["expiry_digests"]), \
+         patch("expiry_sweeper.get_sweeper_leases_collection", return_value=db["sweeper_leases"]):
+        yield db
+
+
+def _grocery(db, user_id, name, earliest_days, latest_days=None):
+    db["groceries"].insert_one({
+        "user_id": ObjectId(user_id),
+        "name": name,
+        "count": 1,
+        "expires_earliest_at": NOW + timedelta(days=earliest_days),
+        "expires_latest_at": NOW + timedelta(days=latest_days if latest_days is not None else earliest_days),
+    })
+
+
+def _sweeper(**kw):
+    opts = dict(interval_seconds=900, lead_days=3, lookback_days=3, shards=4, batch_size=2)
+    opts.update(kw)
+    return ExpirySweeper(**opts)
+
+
+def test_sweep_writes_one_digest_per_user(db):
+    _grocery(db, USER_A, "Milk", 1, 2)
+    _grocery(db, USER_A, "Yogurt", 2)
+    _grocery(db, USER_A, "Bread", -2, -1)      # already spoiled
+    _grocery(db, USER_A, "Cheese", 20)         # outside the lead window
+    _grocery(db, USER_B, "Fish", 0.5)
+    _grocery(db, USER_B, "Old Fish", -10)      # outside the lookback window
+
+    assert _sweeper().run_once(now=NOW) == 4
+
+    digest_a = db["expiry_digests"].find_one({"_id": f"{USER_A}:2025-06-10"})
+    statuses = {i["name"]: i["status"] for i in digest_a["items"].values()}
+    assert statuses == {"Milk": "expiring", "Yogurt": "expiring", "Bread": "expired"}
+    digest_b = db["expiry_digests"].find_one({"_id": f"{USER_B}:2025-06-10"})
+    assert [i["name"] for i in digest_b["items"].values()] == ["Fish"]
+
+
+def test_each_shard_is_swept_once_per_tick(db):
+    for i in range(5):
+        _grocery(db, USER_A, f"Item {i}", i * 0.5)
+
+    first, second = _sweeper(), _sweeper()
+    assert first.run_once(now=NOW) == 5
+    assert second.run_once(now=NOW) == 0
+    # Four shards and the prune pass
+    assert db["sweeper_leases"].count_documents({}) == 5
+
+    # Next tick: shards are free again
+    assert second.run_once(now=NOW + timedelta(seconds=900)) == 5
+
+
+def test_gone_groceries_drop_out_of_the_digest(db):
+    _grocery(db, USER_A, "Milk", 1)
+    _grocery(db, USER_A, "Yogurt", 2)
+    _grocery(db, USER_B, "Fish", 0.5)
+    sweeper = _sweeper()
+    sweeper.run_once(now=NOW)
+
+    # Yogurt is eaten and user B's only item is deleted
+    db["groceries"].delete_many({"name": {"$in": ["Yogurt", "Fish"]}})
+    sweeper.run_once(now=NOW + timedelta(seconds=900))
+    digest_a = db["expiry_digests"].find_one({"_id": f"{USER_A}:2025-06-10"})
+    # Kept for one missed interval, in case a tick was skipped
+    assert len(digest_a["items"]) == 2
+
+    sweeper.run_once(now=NOW + timedelta(seconds=1800))
+    digest_a = db["expiry_digests"].find_one({"_id": f"{USER_A}:2025-06-10"})
+    digest_b = db["expiry_digests"].find_one({"_id": f"{USER_B}:2025-06-10"})
+    assert [i["name"] for i in digest_a["items"].values()] == ["Milk"]
+    assert digest_b["items"] == {}
+
+
+def test_prune_pages_through_todays_digests(db):
+    digests = db["expiry_digests"]
+    stale = NOW - timedelta(hours=1)
+    for i in range(5):
+        digests.insert_one({"_id": f"user{i}:2025-06-10", "user_id": f"user{i}", "date": "2025-06-10",
+                            "items": {"g": {"name": "Milk", "swept_at": stale}}})
+    digests.insert_one({"_id": "user0:2025-06-09", "user_id": "user0", "date": "2025-06-09",
+                        "items": {"g": {"name": "Milk", "swept_at": stale}}})
+
+    real_find = digests.find
+    limits = []
+
+    def find(*args, **kwargs):
+        cursor = real_find(*args, **kwargs)
+        real_limit = cursor.limit
+        cursor.limit = lambda n: limits.append(n) or real_limit(n)
+        return cursor
+
+    with patch.object(digests, "find", side_effect=find), \
+         patch.object(digests, "bulk_write", wraps=digests.bulk_write) as bulk:
+        assert _sweeper(batch_size=2)._prune(NOW) == 5
+    assert limits == [2, 2, 2, 2] and bulk.call_count == 3
+    assert all(d["items"] == {} for d in digests.find({"date": "2025-06-10"}))
+    assert digests.find_one({"date": "2025-06-09"})["items"]
+
+
+def test_digest_endpoint_returns_latest_sorted(db):
+    _grocery(db, USER_A, "Yogurt", 2)
+    _grocery(db, USER_A, "Milk", 1)
+    _sweeper().run_once(now=NOW)
+
+    user = User(id=USER_A, email="tester@example.com", username="tester")
+    with patch("expiry_sweeper.get_expiry_digests_collection", return_value=db["expiry_digests"]):
+        digest = groceries.get_expiry_digest(current_user=user)
+    assert digest["date"] == "2025-06-10"
+    assert [i["name"] for i in digest["items"]] == ["Milk", "Yogurt"]
+
+    other = User(id=USER_B, email="other@example.com", username="other")
+    with pytest.raises(HTTPException) as excinfo:
+        groceries.get_expiry_digest(current_user=other)
+    assert excinfo.value.status_code == 404
@@ -0,0 +1,87 @@
+import json
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import pytest
+from bson import ObjectId
+from fastapi import Request, Response
+from mongomock import MongoClient
+
+import groceries
+import receipts
+import recipes
+from auth import User
+from groceries import GroceryItem, _grocery_item
+from models import Receipt, Recipe
+
+
+USER_ID = "507f1f77bcf86cd799439011"
+USER = User(id=USER_ID, email="tester@example.com", username="tester")
+CREATED = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def db():
+    db = MongoClient()["test_db"]
+    with patch("groceries.get_groceries_collection", return_value=db["groceries"]), \
+         patch("recipes.get_recipes_collection", return_value=db["recipes"]), \
+         patch("receipts.get_receipts_collection", return_value=db["receipts"]), \
+         patch("pantry_events.get_pantry_versions_collection", return_value=db["pantry_versions"]):
+        yield db
+
+
+def _call(endpoint):
+    response = Response()
+    result = endpoint(request=Request({"type": "http", "headers": []}), response=response, current_user=USER)
+    assert result.headers["etag"] == response.headers["etag"]
+    return json.loads(result.body)
+
+
+def test_grocery_list_matches_per_document_models(db):
+    db["groceries"].insert_many([
+        {"user_id": ObjectId(USER_ID), "name": "Milk", "name_key": "milk", "count": 2,
+         "min_days": 5, "max_days": 7, "created_at": CREATED},
+        # Legacy document: no count, no shelf life
+        {"user_id": ObjectId(USER_ID), "name": "Salt", "created_at": CREATED},
+        {"user_id": ObjectId(), "name": "Other user's", "created_at": CREATED},
+    ])
+    expected = [
+        json.loads(_grocery_item(doc).model_dump_json())
+        for doc in db["groceries"].find({"user_id": ObjectId(USER_ID)})
+    ]
+
+    listed = _call(groceries.list_groceries)
+
+    assert listed == expected
+    assert listed[1]["count"] == 1
+    assert "name_key" not in listed[0]
+    # Still valid against the declared response model
+    assert [GroceryItem(**item).name for item in listed] == ["Milk", "Salt"]
+
+
+def test_recipe_list_is_sorted_and_hides_pregenerated(db):
+    db["recipes"].insert_many([
+        {"user_id": USER_ID, "title": "Old", "ingredients": ["Bread"], "created_at": datetime(2024, 1, 1)},
+        {"user_id": USER_ID, "title": "New", "ingredients": ["Milk"], "ingredient_keys": ["milk"], "created_at": CREATED},
+        {"user_id": USER_ID, "title": "Hidden", "pregenerated": True, "created_at": CREATED},
+    ])
+
+    listed = _call(recipes.list_recipes)
+
+    assert [r["title"] for r in listed] == ["New", "Old"]
+    assert listed[0]["id"] == str(db["recipes"].find_one({"title": "New"})["_id"])
+    assert "ingredient_keys" not in listed[0]
+    # Missing optional fields come back with the model's defaults
+    assert listed[1] == json.loads(Recipe(id=listed[1]["id"], **db["recipes"].find_one({"title": "Old"}, {"_id": 0})).model_dump_json())
+
+
+def test_receipt_list_keeps_response_shape(db):
+    db["receipts"].insert_one({
+        "user_id": USER_ID, "file_path": "f.jpg", "raw_text": "MILK 3.50",
+        "grocery_items": ["g1"], "created_at": CREATED,
+    })
+
+    listed = _call(receipts.list_receipts)
+
+    stored = db["receipts"].find_one()
+    assert listed == [json.loads(Receipt(**stored).model_dump_json())]
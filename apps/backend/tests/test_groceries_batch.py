@@ -0,0 +1,162 @@
+from unittest.mock import patch
+
+import pytest
+from bson import ObjectId
+from mongomock import MongoClient
+from pydantic import ValidationError
+from pymongo.errors import DuplicateKeyError, WriteError
+
+import groceries
+from auth import User
+from groceries import GroceryBatchOp, GroceryBatchRequest, GroceryCreate
+
+
+USER_ID = "507f1f77bcf86cd799439011"
+USER = User(id=USER_ID, email="tester@example.com", username="tester")
+
+
+@pytest.fixture
+def col():
+    col = MongoClient()["test_db"]["groceries"]
+    with patch("groceries.get_groceries_collection", return_value=col), \
+         patch("purchases.get_purchases_collection", return_value=col.database["grocery_purchases"]), \
+         patch("groceries.pantry_changed") as changed:
+        col.changed = changed
+        yield col
+
+
+def _batch(*ops):
+    return groceries.batch_groceries(GroceryBatchRequest(ops=[GroceryBatchOp(**op) for op in ops]), current_user=USER)
+
+
+def test_batch_adds_consumes_and_deletes(col):
+    eggs = groceries.add_grocery(GroceryCreate(name="Eggs"), current_user=USER)
+    col.update_one({"_id": ObjectId(eggs.id)}, {"$set": {"count": 6}})
+    milk = groceries.add_grocery(GroceryCreate(name="Milk"), current_user=USER)
+    butter = groceries.add_grocery(GroceryCreate(name="Butter"), current_user=USER)
+    col.changed.reset_mock()
+
+    results = _batch(
+        {"op": "consume", "id": eggs.id, "by": 4},
+        {"op": "consume", "name": "milk"},
+        {"op": "delete", "id": butter.id},
+        {"op": "add", "name": "Flour", "by": 2, "min_days": 90, "max_days": 180},
+        {"op": "consume", "id": str(ObjectId())},
+    )
+    assert [(r.op, r.status, r.count) for r in results] == [
+        ("consume", "ok", 2),
+        ("consume", "removed", 0),
+        ("delete", "removed", 0),
+        ("add", "ok", 2),
+        ("consume", "not_found", 0),
+    ]
+    assert results[1].id == milk.id
+    assert {d["name"]: d["count"] for d in col.find()} == {"Eggs": 2, "Flour": 2}
+    assert col.find_one({"name": "Flour"})["expires_earliest_at"] is not None
+    col.changed.assert_called_once_with(USER_ID)
+
+
+def test_overconsume_removes_and_ops_apply_in_order(col):
+    groceries.add_grocery(GroceryCreate(name="Tomatoes"), current_user=USER)
+
+    results = _batch(
+        {"op": "add", "name": "tomato", "by": 2},
+        {"op": "consume", "name": "Tomato", "by": 5},
+    )
+    assert [(r.status, r.count) for r in results] == [("ok", 3), ("removed", 0)]
+    assert col.count_documents({}) == 0
+
+
+def test_each_result_reports_what_its_op_did(col):
+    groceries.add_grocery(GroceryCreate(name="Lemons"), current_user=USER)
+    groceries.add_grocery(GroceryCreate(name="Lemons"), current_user=USER)
+
+    results = _batch(
+        {"op": "consume", "name": "lemon"},
+        {"op": "add", "name": "Lemons"},
+        {"op": "consume", "name": "lemon", "by": 2},
+        {"op": "add", "name": "Lemons"},
+    )
+    assert [(r.status, r.count) for r in results] == [("ok", 1), ("ok", 2), ("removed", 0), ("ok", 1)]
+    assert results[0].id == results[1].id == results[2].id != results[3].id
+
+
+def test_emptied_items_are_removed_by_the_same_write(col):
+    groceries.add_grocery(GroceryCreate(name="Milk"), current_user=USER)
+    real_update = col.find_one_and_update
+
+    def find_one_and_update(*args, **kwargs):
+        result = real_update(*args, **kwargs)
+        # Nothing is left at zero for a follow-up delete to clean up
+        assert col.count_documents({"count": {"$lte": 0}}) == 0
+        return result
+
+    with patch.object(col, "find_one_and_update", side_effect=find_one_and_update), \
+         patch.object(col, "delete_many", side_effect=AssertionError("second write")):
+        results = _batch(
+            {"op": "consume", "name": "milk", "by": 3},
+            {"op": "add", "name": "Cream"},
+            {"op": "delete", "name": "cream"},
+        )
+    assert [r.status for r in results] == ["removed", "ok", "removed"]
+    assert col.count_documents({}) == 0
+
+
+def test_add_retries_after_a_duplicate_key_race(col):
+    real_update = col.find_one_and_update
+    calls = []
+
+    def racing_update(*args, **kwargs):
+        if not calls:
+            calls.append(1)
+            # Another request inserted the same item between our match and insert
+            col.insert_one({"user_id": ObjectId(USER_ID), "name": "Basil", "name_key": "basil", "count": 1})
+            raise DuplicateKeyError("E11000 duplicate key")
+        return real_update(*args, **kwargs)
+
+    with patch.object(col, "find_one_and_update", side_effect=racing_update):
+        results = _batch({"op": "add", "name": "Basil"})
+    assert [(r.status, r.count) for r in results] == [("ok", 2)]
+    assert col.count_documents({}) == 1
+
+
+def test_failed_write_reports_applied_failed_and_skipped_ops(col):
+    groceries.add_grocery(GroceryCreate(name="Oats"), current_user=USER)
+    col.changed.reset_mock()
+
+    def failing_delete(*args, **kwargs):
+        raise WriteError("boom")
+
+    results = _batch({"op": "add", "name": "Oats"})
+    with patch.object(col, "find_one_and_delete", side_effect=failing_delete):
+        results += _batch(
+            {"op": "consume", "name": "oats"},
+            {"op": "delete", "name": "oats"},
+            {"op": "add", "name": "Rye"},
+        )
+    assert [(r.status, r.count) for r in results] == [("ok", 2), ("ok", 1), ("error", 0), ("skipped", 0)]
+    assert results[2].detail
+    assert {d["name"]: d["count"] for d in col.find()} == {"Oats": 1}
+    assert col.changed.call_count == 2
+
+
+def test_batch_only_touches_own_items(col):
+    other = col.insert_one({"user_id": ObjectId(), "name": "Rice", "name_key": "rice", "count": 3}).inserted_id
+
+    results = _batch({"op": "delete", "id": str(other)}, {"op": "consume", "name": "rice"})
+    assert [r.status for r in results] == ["not_found", "not_found"]
+    assert col.find_one({"_id": other})["count"] == 3
+    col.changed.assert_not_called()
+
+
+def test_invalid_ops_rejected():
+    with pytest.raises(ValidationError):
+        GroceryBatchOp(op="add")
+    with pytest.raises(ValidationError):
+        GroceryBatchOp(op="consume")
+    with pytest.raises(ValidationError):
+        GroceryBatchOp(op="delete", id="not-an-id")
+    with pytest.raises(ValidationError):
+        GroceryBatchOp(op="consume", name="milk", by=0)
+    with pytest.raises(ValidationError):
+        GroceryBatchRequest(ops=[])
@@ -0,0 +1,113 @@
+import random
+from unittest.mock import patch
+
+import pytest
+from bson import ObjectId
+from mongomock import MongoClient
+
+import groceries
+from auth import User
+from grocery_catalog import GroceryCatalog, PrefixIndex, load_seed
+
+
+USER = User(id="507f1f77bcf86cd799439011", email="tester@example.com", username="tester")
+
+
+@pytest.fixture
+def col():
+    col = MongoClient()["test_db"]["groceries"]
+    with patch("grocery_catalog.get_groceries_collection", return_value=col):
+        yield col
+
+
+def _add(col, name, key, users):
+    col.insert_many([{"user_id": ObjectId(), "name": name, "name_key": key, "count": 1} for _ in range(users)])
+
+
+def test_prefix_index_ranks_by_popularity_and_matches_word_starts():
+    index = PrefixIndex([("Tomatoes", 5), ("Cherry Tomatoes", 9), ("Tofu", 5), ("Milk", 20), ("Tomato Paste", 1)])
+
+    assert index.suggest("tom") == [("Cherry Tomatoes", 9), ("Tomatoes", 5), ("Tomato Paste", 1)]
+    # Same popularity: name-start matches before later-word matches, then shorter names
+    assert [n for n, _ in index.suggest("to")] == ["Cherry Tomatoes", "Tofu", "Tomatoes", "Tomato Paste"]
+    assert index.suggest("  CHERRY   to") == [("Cherry Tomatoes", 9)]
+    assert index.suggest("x") == [] and index.suggest("") == []
+    assert index.suggest("t", limit=1) == [("Cherry Tomatoes", 9)]
+
+
+def test_wide_and_narrow_prefixes_agree_with_brute_force():
+    rng = random.Random(3)
+    words = ["red", "green", "rice", "ricotta", "radish", "grape", "garlic", "gouda", "rye"]
+    entries = {" ".join(rng.sample(words, rng.randint(1, 3))).title(): rng.randint(1, 5) for _ in range(400)}
+    index = PrefixIndex(entries.items())
+
+    def brute(prefix):
+        hits = [(n, w, n.casefold().startswith(prefix)) for n, w in entries.items()
+                if n.casefold().startswith(prefix) or f" {prefix}" in n.casefold()]
+        hits.sort(key=lambda h: (-h[1], not h[2], len(h[0]), h[0]))
+        return [(n, w) for n, w, _ in hits[:8]]
+
+    # "r"/"g" take the popularity walk, longer prefixes the bisect slice
+    for prefix in ["r", "g", "ri", "ric", "gre", "garlic r", "ry", "z"]:
+        assert index.suggest(prefix) == brute(prefix), prefix
+
+
+def test_seed_list_ships_with_the_app():
+    seed = load_seed()
+    assert "Milk" in seed and len(seed) > 100
+    assert not any(name.startswith("#") for name in seed)
+
+
+def test_catalog_combines_seed_and_popular_user_names(col):
+    _add(col, "Salmon", "salmon", 4)
+    _add(col, "salmon", "salmon", 2)
+    _add(col, "Gochujang", "gochujang", 3)
+    _add(col, "Grandma's Secret Sauce", "grandma's secret sauce", 1)
+    catalog = GroceryCatalog(refresh_seconds=60, rebuild_seconds=3600, min_users=3, seed=["Salmon", "Sardines"])
+
+    assert catalog.suggest("sa") == [("Salmon", 7), ("Sardines", 1)]
+    assert catalog.suggest("go") == [("Gochujang", 3)]
+    # Below SUGGEST_MIN_USERS and not seeded: kept private
+    assert catalog.suggest("gra") == []
+
+
+def test_refresh_reads_only_new_groceries(col):
+    _add(col, "Kimchi", "kimchi", 2)
+    catalog = GroceryCatalog(refresh_seconds=60, rebuild_seconds=3600, min_users=3, seed=[])
+    assert catalog.suggest("kim") == []
+
+    _add(col, "Kimchi", "kimchi", 1)
+    with patch.object(col, "aggregate", side_effect=AssertionError("full rebuild")):
+        assert catalog.refresh() == 1
+        assert catalog.refresh() == 0
+    assert catalog.suggest("kim") == [("Kimchi", 3)]
+
+
+def test_one_user_re_adding_an_item_counts_once(col):
+    user = ObjectId()
+    for _ in range(5):
+        col.insert_one({"user_id": user, "name": "Ghost Pepper Jam", "name_key": "ghost pepper jam", "count": 1})
+        col.delete_many({"user_id": user})
+    col.insert_one({"user_id": user, "name": "Ghost Pepper Jam", "name_key": "ghost pepper jam", "count": 1})
+    catalog = GroceryCatalog(refresh_seconds=60, rebuild_seconds=3600, min_users=2, seed=[])
+    assert catalog.suggest("gho") == []
+
+    # Re-adds picked up by refresh, and rows read by both a rebuild and a refresh, don't count again
+    for _ in range(3):
+        col.delete_many({"user_id": user})
+        col.insert_one({"user_id": user, "name": "Ghost Pepper Jam", "name_key": "ghost pepper jam", "count": 1})
+    catalog._last_id = None
+    catalog.refresh()
+    assert catalog.suggest("gho") == []
+
+    _add(col, "Ghost Pepper Jam", "ghost pepper jam", 1)
+    catalog.refresh()
+    assert catalog.suggest("gho") == [("Ghost Pepper Jam", 2)]
+
+
+def test_suggest_endpoint(col):
+    catalog = GroceryCatalog(refresh_seconds=60, rebuild_seconds=3600, min_users=1, seed=["Milk", "Mint"])
+    _add(col, "Milk", "milk", 2)
+    with patch("groceries.grocery_catalog", catalog):
+        result = groceries.suggest_groceries(q="mi", limit=8, current_user=USER)
+    assert [(s.name, s.popularity) for s in result] == [("Milk", 3), ("Mint", 1)]
@@ -0,0 +1,158 @@
+import io
+import os
+import time
+from unittest.mock import patch
+
+import pytest
+from fastapi import HTTPException
+from mongomock import MongoClient
+from PIL import Image
+
+import receipts
+from auth import User
+from image_store import ImageStore
+
+
+USER = User(id="507f1f77bcf86cd799439011", email="tester@example.com", username="tester")
+
+
+def _jpeg(color=(200, 30, 30), size=(1200, 1600)) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", size, color).save(buf, format="JPEG", quality=95)
+    return buf.getvalue()
+
+
+def _age(path, days):
+    old = time.time() - days * 24 * 60 * 60
+    os.utime(path, (old, old))
+
+
+def test_put_is_content_addressed_and_sharded(tmp_path):
+    store = ImageStore(tmp_path)
+    first = store.put(_jpeg(), ".JPG")
+    again = store.put(_jpeg(), "jpg")
+    other = store.put(_jpeg(color=(0, 0, 0)), "jpg")
+
+    assert first == again
+    assert first.sha256 != other.sha256
+    assert first.path == tmp_path / "originals" / first.sha256[:2] / first.sha256[2:4] / f"{first.sha256}.jpg"
+    assert store.disk_usage()["originals"]["files"] == 2
+
+
+def test_compact_writes_grayscale_webp_and_thumbnail(tmp_path):
+    store = ImageStore(tmp_path, thumbnail_px=100)
+    stored = store.put(_jpeg(), "jpg")
+
+    assert store.compact(stored.sha256)
+
+    with Image.open(store.path("compact", stored.sha256, "webp")) as img:
+        assert (img.format, img.size) == ("WEBP", (1200, 1600))
+        # WebP decodes as RGB; grayscale means (near-)equal channels
+        r, g, b = img.convert("RGB").getpixel((600, 800))
+        assert max(r, g, b) - min(r, g, b) <= 2
+    with Image.open(store.thumbnail(stored.sha256)) as thumb:
+        assert max(thumb.size) == 100
+    assert store.best_image(stored.sha256) == stored.path
+
+
+def test_undecodable_originals_are_kept(tmp_path):
+    store = ImageStore(tmp_path, original_retention_days=0)
+    stored = store.put(b"%PDF-1.4 not an image", "pdf")
+
+    assert not store.compact(stored.sha256)
+    _age(stored.path, 30)
+    # Marked once, so later passes don't try (and warn) again
+    with patch("PIL.Image.open", side_effect=AssertionError("retried")):
+        assert store.run_once()["originals_dropped"] == 0
+    assert stored.path.exists()
+    assert store.disk_usage()["legacy"]["files"] == 0
+
+
+def test_zero_day_retention_still_keeps_fresh_originals(tmp_path):
+    store = ImageStore(tmp_path, original_retention_days=0)
+    stored = store.put(_jpeg(), "jpg")
+
+    assert store.compact(stored.sha256)
+    # Another upload of the same bytes may still be reading it
+    assert stored.path.exists()
+    assert store.run_once()["originals_dropped"] == 0
+
+    _age(stored.path, 1 / 24)
+    assert store.run_once()["originals_dropped"] == 1
+    assert store.best_image(stored.sha256) == store.path("compact", stored.sha256, "webp")
+
+
+def test_retention_tiers(tmp_path):
+    store = ImageStore(tmp_path, original_retention_days=7, compact_retention_days=90)
+    fresh = store.put(_jpeg(), "jpg")
+    old = store.put(_jpeg(color=(0, 0, 255)), "jpg")
+    _age(old.path, 8)
+
+    # The compactor catches up on compaction, then drops the expired original
+    assert store.run_once() == {"compacted": 2, "originals_dropped": 1, "compact_dropped": 0}
+    assert fresh.path.exists() and not old.path.exists()
+    assert store.best_image(old.sha256) == store.path("compact", old.sha256, "webp")
+
+    _age(store.path("compact", old.sha256, "webp"), 91)
+    assert store.run_once()["compact_dropped"] == 1
+    assert store.best_image(old.sha256) is None
+    # Thumbnails are kept
+    assert store.thumbnail(old.sha256) is not None
+
+
+def test_disk_usage_counts_legacy_files(tmp_path):
+    store = ImageStore(tmp_path)
+    legacy = tmp_path / "507f1f77bcf86cd799439011" / "receipt_1.jpg"
+    legacy.parent.mkdir(parents=True)
+    legacy.write_bytes(b"x" * 10)
+    store.put(b"y" * 5, "jpg")
+
+    report = store.disk_usage()
+    assert report["legacy"] == {"files": 1, "bytes": 10}
+    assert report["total_bytes"] == 15
+
+
+def test_migrate_legacy_moves_uploads_into_the_store(tmp_path):
+    store = ImageStore(tmp_path)
+    user_dir = tmp_path / USER.id
+    user_dir.mkdir()
+    legacy = user_dir / "receipt_1700000000000.jpg"
+    legacy.write_bytes(_jpeg())
+    _age(legacy, 30)
+    orphan = user_dir / "receipt_1700000000001.jpg"
+    orphan.write_bytes(_jpeg(color=(0, 0, 0)))
+    col = MongoClient()["test_db"]["receipts"]
+    col.insert_one({"user_id": USER.id, "file_path": str(legacy), "raw_text": "MILK"})
+    col.insert_one({"user_id": USER.id, "file_path": f"uploads/receipts/{USER.id}/{legacy.name}", "raw_text": "MILK"})
+
+    assert store.migrate_legacy(col, dry_run=True) == {"files": 2, "receipts": 2}
+    assert legacy.exists()
+
+    assert store.migrate_legacy(col) == {"files": 2, "receipts": 2}
+    assert not legacy.exists() and not orphan.exists()
+    assert store.disk_usage()["legacy"]["files"] == 0
+    sha256s = {d["image_sha256"] for d in col.find()}
+    assert len(sha256s) == 1
+    path = store.best_image(sha256s.pop())
+    assert path is not None and col.find_one()["file_path"] == str(path)
+    # Retention sees the upload's real age, not the migration time
+    assert time.time() - path.stat().st_mtime > 29 * 24 * 60 * 60
+
+
+def test_image_endpoints_only_serve_the_owners_images(tmp_path):
+    store = ImageStore(tmp_path)
+    stored = store.put(_jpeg(), "jpg")
+    store.compact(stored.sha256)
+    db = MongoClient()["test_db"]
+    db["receipts"].insert_one({"user_id": USER.id, "image_sha256": stored.sha256})
+
+    with patch("receipts.get_receipts_collection", return_value=db["receipts"]), \
+         patch("receipts.image_store", store):
+        assert receipts.get_receipt_image(stored.sha256, current_user=USER).path == stored.path
+        thumb = receipts.get_receipt_thumbnail(stored.sha256, current_user=USER)
+        assert thumb.path == store.thumbnail(stored.sha256)
+
+        other = User(id="507f1f77bcf86cd799439012", email="o@example.com", username="other")
+        with pytest.raises(HTTPException) as exc:
+            receipts.get_receipt_image(stored.sha256, current_user=other)
+        assert exc.value.status_code == 404
@@ -0,0 +1,22 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+# Loaded on first use only (see scripts/bench_import_time.py)
+HEAVY_MODULES = ("cv2", "numpy", "pytesseract", "PIL", "google.generativeai", "google.api_core", "anthropic")
+
+
+def test_importing_server_skips_heavy_modules_and_mongo_client():
+    code = (
+        "import sys, server, database\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+        "print(database.client is None)\n"
+    )
+    env = {**os.environ, "SECRET_KEY": "test", "MONGO_URI": "mongodb://localhost:27017"}
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND, env=env, capture_output=True, text=True, check=True,
+    ).stdout.splitlines()
+
+    assert out == ["", "True"]
@@ -0,0 +1,179 @@
+import time
+from unittest.mock import patch
+
+import pytest
+
+from groceries import _build_recipe_prompt, _parse_recipe_response
+from llm_providers import AnthropicProvider, GeminiProvider, LLMProvider, LLMRouter, StubProvider
+from llm_resilience import CircuitBreaker, LLMGuard, LLMProviderError, LLMUnavailable
+from receipt_parser import ReceiptParser
+
+
+class FakeProvider(LLMProvider):
+    def __init__(self, name, latency=0.0, fail=False, text="ok"):
+        self.name = name
+        self.latency = latency
+        self.fail = fail
+        self.text = text
+        self.calls = 0
+
+    def generate(self, prompt, *, temperature, max_tokens, timeout):
+        self.calls += 1
+        time.sleep(self.latency)
+        if self.fail:
+            raise ConnectionError(f"{self.name} is down")
+        return self.text
+
+
+def _router(providers, hedge_after_seconds=0):
+    guards = {
+        p.name: LLMGuard(CircuitBreaker(min_calls=2), deadline_seconds=5, max_retries=0, sleep=lambda s: None)
+        for p in providers
+    }
+    return LLMRouter(providers, guards, hedge_after_seconds=hedge_after_seconds)
+
+
+def _generate(router):
+    return router.generate("hi", temperature=0, max_tokens=10)
+
+
+def test_stub_receipt_answers_are_deterministic_and_parseable():
+    parser = ReceiptParser.__new__(ReceiptParser)
+    parser.user_id = "u1"
+    prompt = parser._build_prompt("WHOLE MILK 3.49\nBANANAS 0.58\nPAPER TOWELS 5.99\nTOTAL 10.06")
+    stub = StubProvider()
+
+    first = stub.generate(prompt, temperature=0.7, max_tokens=100, timeout=1)
+    assert first == stub.generate(prompt, temperature=0.7, max_tokens=100, timeout=1)
+    items = parser._parse_response(first)
+    names = [i["name"] for i in items]
+    assert names == ["Whole Milk", "Bananas", "Paper Towels"]
+    assert (items[0]["min_days"], items[0]["max_days"]) == (5, 7)
+
+
+def test_stub_recipe_avoids_previous_titles():
+    stub = StubProvider()
+    first = _parse_recipe_response(
+        stub.generate(_build_recipe_prompt(["Eggs", "Spinach"], []), temperature=0, max_tokens=100, timeout=1)
+    )
+    second = _parse_recipe_response(
+        stub.generate(_build_recipe_prompt(["Eggs", "Spinach"], [first.title]), temperature=0, max_tokens=100, timeout=1)
+    )
+    assert first.ingredients_used == ["Eggs", "Spinach"]
+    assert first.title != second.title
+
+
+def test_router_tries_untried_then_prefers_lower_latency():
+    slow, fast = FakeProvider("slow", latency=0.03), FakeProvider("fast")
+    router = _router([slow, fast])
+
+    _generate(router)
+    assert router.ranked() == [fast, slow]  # fast is untried
+    _generate(router)
+    assert router.ranked() == [fast, slow]
+    for _ in range(3):
+        _generate(router)
+    assert (slow.calls, fast.calls) == (1, 4)
+
+
+def test_router_fails_over_and_demotes_erroring_provider():
+    broken, backup = FakeProvider("broken", fail=True), FakeProvider("backup", text="from backup")
+    router = _router([broken, backup])
+
+    assert _generate(router) == "from backup"
+    assert _generate(router) == "from backup"
+    assert router.ranked()[0] is backup
+    health = router.health()["providers"]
+    assert health["broken"]["error_rate"] == 1.0
+    assert health["backup"]["calls"] == 2
+
+
+def test_always_failing_provider_is_not_treated_as_untried():
+    broken, slow = FakeProvider("broken", fail=True), FakeProvider("slow", latency=0.01)
+    router = _router([broken, slow])
+
+    _generate(router)
+    # broken has calls but no successful latency; it must not rank like an untried provider
+    assert router.ranked() == [slow, broken]
+    _generate(router)
+    assert broken.calls == 1
+
+
+def test_auth_errors_count_as_provider_failures():
+    class Rejected(FakeProvider):
+        def generate(self, prompt, *, temperature, max_tokens, timeout):
+            self.calls += 1
+            raise LLMProviderError("401 invalid x-api-key")
+
+    rejected, backup = Rejected("rejected"), FakeProvider("backup", text="from backup")
+    router = _router([rejected, backup])
+
+    assert _generate(router) == "from backup"
+    assert rejected.calls == 1  # not retried
+    assert router.health()["providers"]["rejected"]["breaker"]["recent_failures"] == 1
+    assert router.ranked()[0] is backup
+
+
+def test_router_raises_when_every_provider_fails():
+    router = _router([FakeProvider("a", fail=True), FakeProvider("b", fail=True)])
+    with pytest.raises(LLMUnavailable):
+        _generate(router)
+    with pytest.raises(LLMUnavailable):
+        _generate(_router([]))
+
+
+def test_hedged_request_returns_faster_provider():
+    slow, fast = FakeProvider("slow", latency=0.5, text="slow"), FakeProvider("fast", text="fast")
+    router = _router([slow, fast], hedge_after_seconds=0.02)
+    router.stats["slow"].record(0.001, True)  # make slow look best so it goes first
+    router.stats["fast"].record(0.01, True)
+
+    start = time.monotonic()
+    assert _generate(router) == "fast"
+    assert time.monotonic() - start < 0.4
+    assert router.hedges_fired == 1
+
+
+def test_hedge_not_fired_when_first_answers_quickly():
+    first, second = FakeProvider("first", text="one"), FakeProvider("second", text="two")
+    router = _router([first, second], hedge_after_seconds=0.5)
+    assert _generate(router) == "one"
+    assert router.hedges_fired == 0 and second.calls == 0
+
+
+def test_hedged_first_fails_fast_falls_through_to_second():
+    router = _router([FakeProvider("a", fail=True), FakeProvider("b", text="b")], hedge_after_seconds=0.5)
+    assert _generate(router) == "b"
+
+
+def test_stub_failures_are_seeded_and_repeatable():
+    def outcomes(seed):
+        stub = StubProvider(error_rate=0.3, seed=seed)
+        result = []
+        for _ in range(20):
+            try:
+                stub.generate("hi", temperature=0, max_tokens=10, timeout=1)
+                result.append(True)
+            except ConnectionError:
+                result.append(False)
+        return result
+
+    assert outcomes(7) == outcomes(7)
+    assert 0 < outcomes(7).count(False) < 20
+
+
+def test_stub_latency_past_timeout_raises_timeout():
+    with pytest.raises(TimeoutError):
+        StubProvider(latency_ms=50).generate("hi", temperature=0, max_tokens=10, timeout=0.01)
+
+
+def test_availability_checks_config_without_importing_the_sdk():
+    with patch.object(GeminiProvider, "_client", side_effect=AssertionError("imported on health check")), \
+         patch.object(AnthropicProvider, "_client", side_effect=AssertionError("imported on health check")), \
+         patch("llm_providers._installed", return_value=True):
+        assert GeminiProvider("key", "gemini-model").available()
+        assert AnthropicProvider("key", "claude-model").available()
+        assert not GeminiProvider("", "gemini-model").available()
+        assert not AnthropicProvider("key", "").available()
+    with patch("llm_providers._installed", return_value=False):
+        assert not GeminiProvider("key", "gemini-model").available()
@@ -0,0 +1,125 @@
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from llm_limits import LLMLimiter
+from llm_resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, LLMGuard, LLMUnavailable
+from receipt_parser import ReceiptParser, fallback_parse
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _guard(breaker=None, **kwargs):
+    return LLMGuard(breaker or CircuitBreaker(min_calls=100), sleep=lambda s: None, **kwargs)
+
+
+def test_transient_errors_are_retried():
+    fn = MagicMock(side_effect=[google_exceptions.ServiceUnavailable("down"), TimeoutError(), "ok"])
+    assert _guard(max_retries=2).call(fn) == "ok"
+    assert fn.call_count == 3
+    # Each attempt gets the remaining deadline as its timeout
+    timeouts = [c.args[0] for c in fn.call_args_list]
+    assert all(0 < t <= 20 for t in timeouts)
+
+
+def test_retries_are_bounded():
+    fn = MagicMock(side_effect=google_exceptions.TooManyRequests("slow down"))
+    with pytest.raises(LLMUnavailable):
+        _guard(max_retries=1).call(fn)
+    assert fn.call_count == 2
+
+
+def test_non_transient_errors_propagate_without_retry():
+    breaker = CircuitBreaker(min_calls=1)
+    fn = MagicMock(side_effect=google_exceptions.InvalidArgument("bad prompt"))
+    with pytest.raises(google_exceptions.InvalidArgument):
+        _guard(breaker).call(fn)
+    assert fn.call_count == 1
+    assert breaker.state == CLOSED
+
+
+def test_auth_errors_propagate_without_retry_but_trip_the_breaker():
+    breaker = CircuitBreaker(min_calls=1)
+    fn = MagicMock(side_effect=google_exceptions.Unauthenticated("bad key"))
+    with pytest.raises(google_exceptions.Unauthenticated):
+        _guard(breaker).call(fn)
+    assert fn.call_count == 1
+    assert breaker.state == OPEN
+
+
+def test_waiting_for_a_model_slot_counts_against_the_deadline():
+    clock = FakeClock()
+    breaker = CircuitBreaker(min_calls=1, open_seconds=10, clock=clock)
+    breaker.record(False)
+    clock.now += 10  # half-open: the next call is the probe
+    limiter = LLMLimiter(max_concurrency=1, hourly_budget=0)
+    fn = MagicMock(return_value="ok")
+
+    with patch("llm_resilience.llm_limiter", limiter), limiter.slot():
+        start = time.monotonic()
+        with pytest.raises(LLMUnavailable, match="model slot"):
+            _guard(breaker).call(fn, deadline_seconds=0.05)
+        assert time.monotonic() - start < 1
+    fn.assert_not_called()
+    # The probe never went out, so the next call may probe
+    assert breaker.allow()
+
+
+def test_breaker_opens_fails_fast_and_recovers_through_a_probe():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_rate_threshold=0.5, min_calls=4, open_seconds=30, clock=clock)
+    guard = _guard(breaker, max_retries=0)
+
+    guard.call(lambda t: "ok")
+    for _ in range(3):
+        with pytest.raises(LLMUnavailable):
+            guard.call(MagicMock(side_effect=TimeoutError()))
+    assert breaker.state == OPEN
+
+    never = MagicMock()
+    with pytest.raises(LLMUnavailable, match="circuit breaker"):
+        guard.call(never)
+    never.assert_not_called()
+    assert breaker.stats()["retry_in_seconds"] == 30
+
+    clock.now += 30
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # one probe at a time
+    breaker.record(True)
+    assert breaker.state == CLOSED
+    assert breaker.stats()["times_opened"] == 1
+
+
+def test_failed_probe_reopens():
+    clock = FakeClock()
+    breaker = CircuitBreaker(min_calls=1, open_seconds=10, clock=clock)
+    breaker.record(False)
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == OPEN
+
+
+def test_fallback_parse_keeps_item_lines_only():
+    text = "STORE 42\nGV MILK 2% GAL 3.48 F\n2 x BANANAS 0.58\nSUBTOTAL 4.06\nTAX 0.10\nVISA 4.16"
+    assert fallback_parse(text) == [{"name": "Gv Milk Gal"}, {"name": "Bananas"}]
+
+
+def test_parser_falls_back_when_llm_unavailable():
+    with patch("receipt_parser.llm_router"), patch("receipt_parser.config") as cfg:
+        cfg.LLM_MAX_TOKENS = "100"
+        cfg.LLM_TEMPERATURE = "0.1"
+        parser = ReceiptParser(user_id="507f1f77bcf86cd799439011")
+
+    with patch("receipt_parser.llm_router") as router:
+        router.generate.side_effect = LLMUnavailable("breaker open")
+        assert parser.parse_receipt_text("EGGS 12CT 3.99") == [{"name": "Eggs Ct"}]
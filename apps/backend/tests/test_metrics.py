@@ -0,0 +1,80 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import metrics
+from metrics import Counter, Histogram, MetricsMiddleware, Registry, stage
+
+
+def _sample(text, prefix):
+    return [line for line in text.splitlines() if line.startswith(prefix)]
+
+
+def test_histogram_renders_cumulative_buckets():
+    reg = Registry()
+    h = reg.register(Histogram("op_seconds", "Op latency", ("op",), buckets=(0.1, 1.0)))
+    for v in (0.05, 0.5, 0.7, 3.0):
+        h.observe(v, op="read")
+
+    text = reg.render()
+    assert "# TYPE op_seconds histogram" in text
+    assert 'op_seconds_bucket{op="read",le="0.1"} 1' in text
+    assert 'op_seconds_bucket{op="read",le="1"} 3' in text
+    assert 'op_seconds_bucket{op="read",le="+Inf"} 4' in text
+    assert 'op_seconds_count{op="read"} 4' in text
+    assert _sample(text, 'op_seconds_sum{op="read"} 4.25')
+
+
+def test_counter_rejects_wrong_labels_and_escapes_values():
+    reg = Registry()
+    c = reg.register(Counter("things_total", "Things", ("kind",)))
+    c.inc(kind='a "quoted"\nvalue')
+    with pytest.raises(ValueError):
+        c.inc(other="x")
+    assert 'things_total{kind="a \\"quoted\\"\\nvalue"} 1' in reg.render()
+
+
+def test_stage_times_blocks_and_functions_and_counts_errors():
+    before = metrics.stage_duration.count(stage="unit_test")
+
+    with stage("unit_test"):
+        pass
+
+    @stage("unit_test")
+    def work(x):
+        return x * 2
+
+    assert work(2) == 4
+    with pytest.raises(RuntimeError):
+        with stage("unit_test"):
+            raise RuntimeError("boom")
+
+    assert metrics.stage_duration.count(stage="unit_test") == before + 3
+    assert metrics.stage_errors.value(stage="unit_test") >= 1
+
+
+def test_middleware_labels_by_route_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    def get_item(item_id: str):
+        return {"id": item_id}
+
+    client = TestClient(app)
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/nope")
+
+    h = metrics.http_request_duration
+    assert h.count(method="GET", route="/items/{item_id}", status="200") >= 2
+    assert h.count(method="GET", route="unmatched", status="404") >= 1
+
+
+def test_metrics_endpoint_includes_runtime_gauges():
+    response = metrics.metrics()
+    body = response.body.decode()
+    assert response.media_type.startswith("text/plain; version=0.0.4")
+    assert 'admission_queue_depth{pool="ocr"}' in body
+    assert 'cache_requests_total{cache="recipe",result="hit"}' in body
+    assert "llm_breaker_state{provider=" in body
@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+import database
+import metrics
+from config import config
+from database import PoolMonitor, available_compressors, client_options
+
+
+def test_compressors_without_packages_are_skipped():
+    with patch("database.importlib.util.find_spec", side_effect=lambda name: None if name == "zstandard" else object()):
+        assert available_compressors(["zstd", "snappy", "zlib"]) == ["snappy", "zlib"]
+    with patch("database.importlib.util.find_spec", return_value=None):
+        assert available_compressors(["zstd", "snappy", "zlib"]) == ["zlib"]
+    with pytest.warns(UserWarning):
+        assert available_compressors(["lz4"]) == []
+
+
+def test_client_options_follow_config(monkeypatch):
+    monkeypatch.setattr(config, "MONGO_MAX_POOL_SIZE", 25)
+    monkeypatch.setattr(config, "MONGO_WAIT_QUEUE_TIMEOUT_MS", 0)
+    monkeypatch.setattr(config, "MONGO_RETRY_WRITES", False)
+    monkeypatch.setattr(config, "MONGO_COMPRESSORS", ["zlib"])
+
+    options = client_options()
+
+    assert options["maxPoolSize"] == 25
+    assert options["waitQueueTimeoutMS"] is None
+    assert options["retryWrites"] is False
+    assert options["compressors"] == "zlib"
+    assert database.pool_monitor in options["event_listeners"]
+
+
+def test_connect_builds_client_once_with_options(monkeypatch):
+    monkeypatch.setattr(database, "client", None)
+    monkeypatch.setattr(database, "db", None)
+    with patch("database.MongoClient") as client_cls:
+        first = database.connect()
+        second = database.connect()
+    assert first is second
+    assert client_cls.call_count == 1
+    assert client_cls.call_args.kwargs["maxPoolSize"] == config.MONGO_MAX_POOL_SIZE
+    database.close()
+    assert database.client is None and database.db is None
+
+
+def test_pool_monitor_tracks_connections_and_waits():
+    monitor = PoolMonitor()
+    before = metrics.mongo_checkout_wait.count()
+    event = SimpleNamespace(duration=0.002, reason="timeout")
+
+    monitor.connection_created(event)
+    monitor.connection_created(event)
+    monitor.connection_check_out_started(event)
+    monitor.connection_check_out_started(event)
+    monitor.connection_checked_out(event)
+    assert monitor.stats()["waiting"] == 1
+    monitor.connection_check_out_failed(event)
+    monitor.connection_checked_in(event)
+    monitor.connection_closed(event)
+
+    stats = monitor.stats()
+    assert (stats["open"], stats["in_use"], stats["waiting"], stats["checkouts"]) == (1, 0, 0, 1)
+    assert stats["checkout_failures"] == {"timeout": 1}
+    assert stats["max_checkout_wait_ms"] == 2.0
+    assert metrics.mongo_checkout_wait.count() == before + 2
+
+
+def test_pool_stats_exported_to_metrics():
+    body = metrics.registry.render()
+    assert 'mongo_pool_connections{state="in_use"}' in body
+    assert "mongo_pool_checkouts_total " in body
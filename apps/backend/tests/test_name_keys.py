@@ -0,0 +1,114 @@
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import pytest
+from bson import ObjectId
+from mongomock import MongoClient
+
+import groceries
+from auth import User
+from groceries import GroceryCreate
+from names import backfill_name_keys, normalize_name
+from receipt_parser import ReceiptParser
+
+
+USER_ID = "507f1f77bcf86cd799439011"
+USER = User(id=USER_ID, email="tester@example.com", username="tester")
+
+
+@pytest.mark.parametrize("variants", [
+    ["Milk", "milk", " MILK ", "Milks"],
+    ["Eggs", "egg"],
+    ["Berries", "berry"],
+    ["Cookies", "cookie"],
+    ["Veggies", "veggie"],
+    ["Brownies", "brownie"],
+    ["Tomatoes", "tomato"],
+    ["Quiches", "quiche"],
+    ["Brioches", "brioche"],
+    ["Peaches", "peach"],
+    ["Green  Beans", "green bean"],
+])
+def test_variants_share_a_key(variants):
+    assert len({normalize_name(v) for v in variants}) == 1
+
+
+def test_ie_singulars_keep_their_ending():
+    assert normalize_name("Chocolate Chip Cookies") == "chocolate chip cookie"
+    assert normalize_name("Brownies") == "brownie"
+    assert normalize_name("Cherries") == "cherry"
+
+
+def test_che_singulars_keep_their_ending():
+    assert normalize_name("Spinach Quiches") == "spinach quiche"
+    assert normalize_name("Brioches") == "brioche"
+    assert normalize_name("Peaches") == "peach"
+    assert normalize_name("Radishes") == "radish"
+
+
+def test_non_plural_endings_are_kept():
+    assert normalize_name("Hummus") == "hummus"
+    assert normalize_name("Swiss") == "swiss"
+    assert normalize_name("Rice") == "rice"
+    assert normalize_name("Series") == "series"
+    assert normalize_name("Species") == "species"
+
+
+@pytest.fixture
+def db():
+    db = MongoClient()["test_db"]
+    with patch("groceries.get_groceries_collection", return_value=db["groceries"]), \
+         patch("database.get_groceries_collection", return_value=db["groceries"]), \
+         patch("groceries.pantry_changed"), \
+         patch("purchases.get_purchases_collection", return_value=db["grocery_purchases"]), \
+         patch("pantry_events.pantry_changed"):
+        yield db
+
+
+def test_add_grocery_dedupes_on_name_key(db):
+    first = groceries.add_grocery(GroceryCreate(name="Milk"), current_user=USER)
+    groceries.add_grocery(GroceryCreate(name="milk "), current_user=USER)
+    third = groceries.add_grocery(GroceryCreate(name="Milks"), current_user=USER)
+
+    assert third.id == first.id
+    assert third.count == 3
+    assert third.name == "Milk"
+    assert db["groceries"].count_documents({}) == 1
+    assert db["groceries"].find_one()["name_key"] == "milk"
+
+
+def test_add_groceries_to_db_dedupes_on_name_key(db):
+    with patch("receipt_parser.llm_router"), patch("receipt_parser.config") as cfg:
+        cfg.LLM_MAX_TOKENS = "100"
+        cfg.LLM_TEMPERATURE = "0.1"
+        parser = ReceiptParser(user_id=USER_ID)
+
+    ids = parser.add_groceries_to_db([{"name": "Apples"}, {"name": "apple", "count": 2}, {"name": "Bread"}])
+
+    assert ids[0] == ids[1]
+    assert db["groceries"].find_one({"name_key": "apple"})["count"] == 3
+    assert db["groceries"].count_documents({}) == 2
+
+
+def test_backfill_merges_duplicates_and_repoints_receipts():
+    db = MongoClient()["test_db"]
+    user = ObjectId(USER_ID)
+    created = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    keep = db["groceries"].insert_one({"user_id": user, "name": "Milk", "count": 1, "created_at": created}).inserted_id
+    dupe = db["groceries"].insert_one({"user_id": user, "name": "milk ", "count": 2, "min_days": 5, "max_days": 7}).inserted_id
+    db["groceries"].insert_one({"user_id": user, "name": "Bread", "count": 1})
+    db["groceries"].insert_one({"user_id": ObjectId(), "name": "MILK", "count": 4})
+    db["receipts"].insert_one({"user_id": USER_ID, "grocery_items": [str(dupe)]})
+
+    assert backfill_name_keys(db["groceries"], db["receipts"], dry_run=True) == {"updated": 3, "merged": 1}
+    assert db["groceries"].count_documents({}) == 4
+
+    assert backfill_name_keys(db["groceries"], db["receipts"]) == {"updated": 3, "merged": 1}
+    merged = db["groceries"].find_one({"_id": keep})
+    assert (merged["name_key"], merged["count"], merged["min_days"]) == ("milk", 3, 5)
+    assert merged["expires_earliest_at"] == datetime(2025, 1, 6)
+    assert db["groceries"].find_one({"_id": dupe}) is None
+    assert db["receipts"].find_one()["grocery_items"] == [str(keep)]
+
+    # Idempotent
+    assert backfill_name_keys(db["groceries"], db["receipts"]) == {"updated": 0, "merged": 0}
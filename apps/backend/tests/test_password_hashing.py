@@ -0,0 +1,71 @@
+import asyncio
+import threading
+from unittest.mock import patch
+
+import pytest
+from fastapi import HTTPException
+from mongomock import MongoClient
+
+import auth
+from auth import LoginRequest, RegisterRequest
+from password_hashing import PasswordHasher, make_context
+
+
+def test_verify_and_update_rehashes_when_rounds_change():
+    old = make_context(4).hash("hunter22")
+    hasher = PasswordHasher(make_context(5), workers=1, max_queue=0)
+
+    valid, new_hash = asyncio.run(hasher.verify_and_update("hunter22", old))
+    assert valid and new_hash and new_hash.startswith("$2b$05$")
+
+    valid, again = asyncio.run(hasher.verify_and_update("hunter22", new_hash))
+    assert valid and again is None
+    assert asyncio.run(hasher.verify_and_update("wrong", new_hash)) == (False, None)
+    assert asyncio.run(hasher.verify_and_update("hunter22", "")) == (False, None)
+    assert asyncio.run(hasher.verify_and_update("hunter22", "not-a-hash")) == (False, None)
+
+
+def test_full_queue_is_rejected_with_503():
+    hasher = PasswordHasher(make_context(4), workers=1, max_queue=1)
+    release = threading.Event()
+
+    def blocked(password):
+        release.wait(5)
+        return password
+
+    async def scenario():
+        with patch.object(hasher.context, "hash", side_effect=blocked):
+            running = asyncio.ensure_future(hasher.hash("a"))
+            queued = asyncio.ensure_future(hasher.hash("b"))
+            await asyncio.sleep(0.05)
+            assert hasher.stats() == {"workers": 1, "in_flight": 1, "waiting": 1, "max_queue": 1}
+            with pytest.raises(HTTPException) as excinfo:
+                await hasher.hash("c")
+            release.set()
+            return await running, await queued, excinfo.value
+
+    first, second, error = asyncio.run(scenario())
+    assert (first, second) == ("a", "b")
+    assert error.status_code == 503 and error.headers["Retry-After"] == "1"
+    assert hasher.stats()["in_flight"] == 0
+
+
+def test_login_upgrades_stored_hash():
+    db = MongoClient().db
+    users = db.users
+    weak = PasswordHasher(make_context(4), workers=1, max_queue=4)
+    strong = PasswordHasher(make_context(5), workers=1, max_queue=4)
+    with patch("auth.get_user_collection", return_value=users), \
+            patch("refresh_tokens.get_refresh_tokens_collection", return_value=db.refresh_tokens):
+        with patch("auth.password_hasher", weak):
+            asyncio.run(auth.register(RegisterRequest(username="alice", email="alice@example.com", password="hunter22")))
+        assert users.find_one({"email": "alice@example.com"})["password"].startswith("$2b$04$")
+
+        with patch("auth.password_hasher", strong):
+            token = asyncio.run(auth.login(LoginRequest(email="alice@example.com", password="hunter22")))
+            assert token.access_token
+            assert users.find_one({"email": "alice@example.com"})["password"].startswith("$2b$05$")
+
+            with pytest.raises(HTTPException) as excinfo:
+                asyncio.run(auth.login(LoginRequest(email="alice@example.com", password="wrongpass")))
+            assert excinfo.value.status_code == 401
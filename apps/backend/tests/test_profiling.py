@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from auth import User, create_access_token, get_admin_user
+from config import config
+from profiling import ProfileStore, ProfilingMiddleware, SamplingProfiler
+
+
+ADMIN = User(id="507f1f77bcf86cd799439011", email="admin@example.com", username="admin")
+
+
+@pytest.fixture(autouse=True)
+def admins(monkeypatch):
+    monkeypatch.setattr(config, "ADMIN_EMAILS", {"admin@example.com"})
+
+
+def _spin_in_marker_function(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampler_records_busy_thread_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=_spin_in_marker_function, args=(stop,), name="busy-worker")
+    profiler = SamplingProfiler(interval_seconds=0.001)
+    worker.start()
+    profiler.start()
+    time.sleep(0.05)
+    samples = profiler.stop()
+    stop.set()
+    worker.join()
+
+    busy = [s for s in samples if "_spin_in_marker_function" in s]
+    assert busy and all(s.startswith("busy-worker;") for s in busy)
+    line = SamplingProfiler.collapsed(samples).splitlines()[0]
+    stack, count = line.rsplit(" ", 1)
+    assert int(count) >= 1 and ";" in stack
+
+
+def test_store_is_a_bounded_ring_buffer(tmp_path):
+    store = ProfileStore(tmp_path, max_files=3)
+    ids = [store.new_id("GET", "/api/groceries/{item_id}") for _ in range(5)]
+    for profile_id in ids:
+        store.save(profile_id, "main;work 1\n")
+
+    listed = [p["id"] for p in store.list()]
+    assert listed == list(reversed(ids[2:]))
+    assert store.path(ids[0]) is None
+    assert store.path(ids[-1]).read_text() == "main;work 1\n"
+    assert store.path("../../etc/passwd") is None
+
+
+def _app(tmp_path, **kwargs):
+    app = FastAPI()
+    store = ProfileStore(tmp_path)
+    app.add_middleware(ProfilingMiddleware, store=store, interval_seconds=0.001, **kwargs)
+
+    @app.get("/work/{n}")
+    def work(n: int):
+        time.sleep(0.01)
+        return {"n": n}
+
+    return TestClient(app), store
+
+
+def test_admin_header_profiles_the_request(tmp_path):
+    client, store = _app(tmp_path)
+    token = create_access_token({"sub": ADMIN.id, "email": ADMIN.email})
+
+    response = client.get("/work/1", headers={"X-Profile": "1", "Authorization": f"Bearer {token}"})
+
+    profile_id = response.headers["x-profile-id"]
+    assert "GET-work_n" in profile_id
+    assert store.path(profile_id) is not None
+
+
+def test_profile_flag_ignored_for_non_admins(tmp_path):
+    client, store = _app(tmp_path)
+    token = create_access_token({"sub": "u2", "email": "someone@example.com"})
+
+    response = client.get("/work/1?profile=1", headers={"Authorization": f"Bearer {token}"})
+    response_no_token = client.get("/work/1?profile=1")
+
+    assert "x-profile-id" not in response.headers
+    assert "x-profile-id" not in response_no_token.headers
+    assert store.list() == []
+
+
+def test_sampling_profiles_one_in_n_requests(tmp_path):
+    client, store = _app(tmp_path, sample_every_n=3)
+    profiled = ["x-profile-id" in client.get(f"/work/{i}").headers for i in range(6)]
+    assert profiled == [False, False, True, False, False, True]
+    assert len(store.list()) == 2
+
+
+def test_admin_dependency_rejects_other_users():
+    assert get_admin_user(ADMIN) is ADMIN
+    with pytest.raises(HTTPException) as exc:
+        get_admin_user(User(id="u2", email="someone@example.com", username="someone"))
+    assert exc.value.status_code == 403
@@ -0,0 +1,66 @@
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+from bson import ObjectId
+from mongomock import MongoClient
+from pymongo.errors import AutoReconnect
+
+import groceries
+from auth import User
+from groceries import GroceryBatchOp, GroceryBatchRequest, GroceryCreate
+from purchases import backfill_purchases
+
+
+USER_ID = "507f1f77bcf86cd799439011"
+USER = User(id=USER_ID, email="tester@example.com", username="tester")
+
+
+@pytest.fixture
+def db():
+    db = MongoClient()["test_db"]
+    with patch("groceries.get_groceries_collection", return_value=db["groceries"]), \
+         patch("purchases.get_purchases_collection", return_value=db["grocery_purchases"]), \
+         patch("groceries.pantry_changed"):
+        yield db
+
+
+def test_every_add_is_logged_even_when_it_only_increments(db):
+    first = groceries.add_grocery(GroceryCreate(name="Milk"), current_user=USER)
+    again = groceries.add_grocery(GroceryCreate(name="milk"), current_user=USER)
+    groceries.batch_groceries(GroceryBatchRequest(ops=[
+        GroceryBatchOp(op="add", name="Milks", by=2),
+        GroceryBatchOp(op="consume", name="milk"),
+    ]), current_user=USER)
+
+    assert first.id == again.id and db["groceries"].count_documents({}) == 1
+    events = list(db["grocery_purchases"].find({}, sort=[("_id", 1)]))
+    assert [(e["name_key"], e["units"]) for e in events] == [("milk", 1), ("milk", 1), ("milk", 2)]
+    assert {e["grocery_id"] for e in events} == {ObjectId(first.id)}
+    assert all(e["user_id"] == ObjectId(USER_ID) for e in events)
+
+
+def test_a_failed_log_write_does_not_fail_the_add(db):
+    with patch.object(db["grocery_purchases"], "insert_many", side_effect=AutoReconnect("down")):
+        item = groceries.add_grocery(GroceryCreate(name="Eggs"), current_user=USER)
+    assert item.count == 1
+
+
+def test_backfill_logs_each_existing_grocery_once(db):
+    created = datetime(2025, 1, 1)
+    logged = db["groceries"].insert_one(
+        {"user_id": ObjectId(USER_ID), "name": "Milk", "name_key": "milk", "count": 2, "created_at": created}
+    ).inserted_id
+    db["grocery_purchases"].insert_one({"grocery_id": logged, "units": 2})
+    for i in range(4):
+        db["groceries"].insert_one(
+            {"user_id": ObjectId(USER_ID), "name": f"Item {i}", "name_key": f"item {i}", "count": i + 1, "created_at": created}
+        )
+
+    assert backfill_purchases(db["groceries"], db["grocery_purchases"], batch_size=2, dry_run=True) == 4
+    assert db["grocery_purchases"].count_documents({}) == 1
+    assert backfill_purchases(db["groceries"], db["grocery_purchases"], batch_size=2) == 4
+    assert backfill_purchases(db["groceries"], db["grocery_purchases"], batch_size=2) == 0
+
+    event = db["grocery_purchases"].find_one({"name": "Item 2"})
+    assert (event["units"], event["created_at"], event["backfilled"]) == (3, created, True)
@@ -8,15 +8,10 @@ from receipt_parser import ReceiptParser
 class TestReceiptParser(unittest.TestCase):
 
     def setUp(self):
-        self.patcher = patch('receipt_parser.genai')
-        self.mock_genai = self.patcher.start()
+        self.patcher = patch('receipt_parser.llm_router')
+        self.mock_router = self.patcher.start()
+        self.mock_router.available.return_value = True
 
-        # Mock the configure and GenerativeModel methods
-        self.mock_genai.configure.return_value = None
-        self.mock_model = MagicMock()
-        self.mock_genai.GenerativeModel.return_value = self.mock_model
-
-        # Set a dummy API key for the test
         with patch('receipt_parser.config') as mock_config:
             mock_config.GEMINI_API_KEY = "test_api_key"
             mock_config.LLM_MODEL = "gemini-pro"
@@ -48,7 +43,7 @@ class TestReceiptParser(unittest.TestCase):
         ])
 
         # Configure the mock model to return the desired response
-        self.mock_model.generate_content.return_value.text = mock_llm_response
+        self.mock_router.generate.return_value = mock_llm_response
 
         # Call the method to be tested
         with patch.object(self.parser, '_build_prompt', wraps=self.parser._build_prompt) as spy_build_prompt:
@@ -79,7 +74,7 @@ class TestReceiptParser(unittest.TestCase):
         Soap              $3.00
         """
         mock_llm_response = "[]"
-        self.mock_model.generate_content.return_value.text = mock_llm_response
+        self.mock_router.generate.return_value = mock_llm_response
 
         parsed_items = self.parser.parse_receipt_text(ocr_text)
         self.assertEqual(parsed_items, [])
@@ -87,7 +82,7 @@ class TestReceiptParser(unittest.TestCase):
     def test_parse_receipt_text_invalid_json_response(self):
         ocr_text = "some receipt text"
         mock_llm_response = "this is not json"
-        self.mock_model.generate_content.return_value.text = mock_llm_response
+        self.mock_router.generate.return_value = mock_llm_response
 
         parsed_items = self.parser.parse_receipt_text(ocr_text)
         self.assertEqual(parsed_items, [])
@@ -98,7 +93,9 @@ class TestReceiptParser(unittest.TestCase):
             {"name": "Apple", "min_days": 10, "max_days": 14},
         ]
 
-        with patch('database.get_groceries_collection') as mock_get_collection:
+        with patch('database.get_groceries_collection') as mock_get_collection, \
+             patch('pantry_events.get_pantry_versions_collection'), \
+             patch('purchases.get_purchases_collection'):
             mock_collection = MagicMock()
             # Simulate upsert behavior: return a document with an _id each time
             mock_collection.find_one_and_update.side_effect = [
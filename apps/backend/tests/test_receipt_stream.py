@@ -0,0 +1,56 @@
+import asyncio
+import json
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import server
+
+
+def _collect(file_path: Path, user_id: str) -> list[tuple[str, dict]]:
+    async def run():
+        return [frame async for frame in server._receipt_progress_events(file_path, user_id)]
+
+    events = []
+    for frame in asyncio.run(run()):
+        lines = frame.strip().split("\n")
+        assert lines[0].startswith("event: ")
+        assert lines[1].startswith("data: ")
+        events.append((lines[0][len("event: "):], json.loads(lines[1][len("data: "):])))
+    return events
+
+
+def test_sse_event_format():
+    frame = server._sse_event("ocr_done", {"raw_text": "MILK 3.50"})
+    assert frame == 'event: ocr_done\ndata: {"raw_text": "MILK 3.50"}\n\n'
+
+
+def test_stream_emits_each_stage_in_order():
+    parser = MagicMock()
+    parser.parse_receipt_text.return_value = [{"name": "Milk", "min_days": 5, "max_days": 7}]
+    parser.add_groceries_to_db.return_value = ["g1"]
+
+    with patch("server.ocr_image", return_value="MILK 3.50"), \
+         patch("server.ReceiptParser", return_value=parser), \
+         patch("server._persist_receipt", return_value="r1") as persist, \
+         patch("server.image_store") as store:
+        events = _collect(Path("/tmp/receipt_1.jpg"), "507f1f77bcf86cd799439011")
+
+    assert [name for name, _ in events] == ["uploaded", "ocr_done", "items_parsed", "persisted"]
+    assert events[1][1]["raw_text"] == "MILK 3.50"
+    assert events[2][1]["items"][0]["name"] == "Milk"
+    assert events[3][1]["grocery_item_ids"] == ["g1"]
+    assert events[3][1]["receipt_id"] == "r1"
+    store.schedule_compaction.assert_called_once_with("receipt_1")
+    persist.assert_called_once_with(
+        "507f1f77bcf86cd799439011", "/tmp/receipt_1.jpg", "MILK 3.50", ["g1"], "receipt_1"
+    )
+
+
+def test_stream_stops_with_error_event_when_ocr_fails():
+    with patch("server.ocr_image", side_effect=RuntimeError("bad image")), \
+         patch("server.ReceiptParser") as parser_cls:
+        events = _collect(Path("/tmp/receipt_2.jpg"), "507f1f77bcf86cd799439011")
+
+    assert [name for name, _ in events] == ["uploaded", "error"]
+    assert events[1][1]["stage"] == "ocr"
+    parser_cls.assert_not_called()
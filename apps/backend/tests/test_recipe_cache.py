@@ -0,0 +1,109 @@
+from unittest.mock import patch
+
+import pytest
+from fastapi import HTTPException
+from mongomock import MongoClient
+
+import groceries
+from auth import User
+from groceries import Recipe
+from recipe_cache import RecipeCache, ingredient_key
+
+
+USER_ID = "507f1f77bcf86cd799439011"
+
+
+def _recipe(title: str) -> Recipe:
+    return Recipe(title=title, ingredients_used=["Milk"], steps=["Pour"], estimated_minutes=5)
+
+
+def test_ingredient_key_ignores_order_case_and_whitespace():
+    assert ingredient_key(["Milk", "Eggs"]) == ingredient_key([" eggs", "MILK", "milk"])
+    assert ingredient_key(["Milk"]) != ingredient_key(["Milk", "Bread"])
+
+
+def test_take_serves_each_variant_once():
+    cache = RecipeCache(pool_size=2, ttl_seconds=60)
+    key = ingredient_key(["Milk"])
+    assert cache.take(USER_ID, key) is None
+
+    assert cache.put(USER_ID, key, _recipe("A"))
+    assert cache.put(USER_ID, key, _recipe("B"))
+    assert not cache.put(USER_ID, key, _recipe("C"))  # pool full
+
+    assert cache.take(USER_ID, key).title == "A"
+    assert cache.take(USER_ID, key).title == "B"
+    assert cache.take(USER_ID, key) is None
+    assert cache.known_titles(USER_ID, key) == ["A", "B"]
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_new_ingredient_set_or_invalidate_drops_pool():
+    cache = RecipeCache(pool_size=2, ttl_seconds=60)
+    old_key = ingredient_key(["Milk"])
+    cache.take(USER_ID, old_key)
+    cache.put(USER_ID, old_key, _recipe("A"))
+
+    assert cache.take(USER_ID, ingredient_key(["Milk", "Bread"])) is None
+    assert cache.take(USER_ID, old_key) is None
+
+    cache.take(USER_ID, old_key)
+    cache.put(USER_ID, old_key, _recipe("A"))
+    cache.invalidate(USER_ID)
+    assert not cache.put(USER_ID, old_key, _recipe("B"))
+    assert cache.take(USER_ID, old_key) is None
+
+
+def test_refill_tops_up_pool_and_avoids_known_titles():
+    cache = RecipeCache(pool_size=2, ttl_seconds=60)
+    key = ingredient_key(["Milk"])
+    cache.mark_served(USER_ID, key, _recipe("Served"))
+
+    seen_args = []
+
+    def generate(avoid):
+        seen_args.append(list(avoid))
+        return _recipe(f"R{len(seen_args)}")
+
+    cache._refill(USER_ID, key, generate)
+    assert seen_args == [["Served"], ["Served", "R1"]]
+    assert [cache.take(USER_ID, key).title for _ in range(2)] == ["R1", "R2"]
+
+
+@pytest.fixture
+def pantry():
+    db = MongoClient()["test_db"]
+    db["groceries"].insert_many([
+        {"user_id": groceries.ObjectId(USER_ID), "name": "Milk", "count": 1},
+        {"user_id": groceries.ObjectId(USER_ID), "name": "milk ", "count": 1},
+        {"user_id": groceries.ObjectId(USER_ID), "name": "Bread", "count": 2},
+    ])
+    cache = RecipeCache(pool_size=2, ttl_seconds=60)
+    with patch("groceries.get_groceries_collection", return_value=db["groceries"]), \
+         patch("groceries.get_recipes_collection", return_value=db["recipes"]), \
+         patch("recipe_scheduler.get_recipes_collection", return_value=db["recipes"]), \
+         patch("groceries.recipe_cache", cache), \
+         patch.object(cache, "schedule_refill"):
+        yield cache
+
+
+def test_generate_recipe_serves_cached_variant_without_model_call(pantry):
+    user = User(id=USER_ID, email="tester@example.com", username="tester")
+    key = ingredient_key(["Milk", "Bread"])
+    pantry.take(USER_ID, key)
+    pantry.put(USER_ID, key, _recipe("Cached"))
+
+    with patch("groceries._generate_recipe") as generate:
+        recipe = groceries.generate_recipe(current_user=user)
+
+    assert recipe.title == "Cached"
+    generate.assert_not_called()
+    pantry.schedule_refill.assert_called_once()
+
+
+def test_generate_recipe_returns_503_when_model_fails(pantry):
+    user = User(id=USER_ID, email="tester@example.com", username="tester")
+    with patch("groceries._generate_recipe", return_value=None):
+        with pytest.raises(HTTPException) as excinfo:
+            groceries.generate_recipe(current_user=user)
+    assert excinfo.value.status_code == 503
@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from mongomock import MongoClient
+
+import recipes
+from auth import User
+from recipes import RecipeCreate, RecipeUpdate
+
+
+USER_ID = "507f1f77bcf86cd799439011"
+USER = User(id=USER_ID, email="tester@example.com", username="tester")
+
+
+@pytest.fixture
+def db():
+    db = MongoClient()["test_db"]
+    with patch("recipes.get_recipes_collection", return_value=db["recipes"]), \
+         patch("recipes.get_groceries_collection", return_value=db["groceries"]), \
+         patch("pantry_events.get_pantry_versions_collection", return_value=db["pantry_versions"]):
+        yield db
+
+
+def _add_grocery(db, name, min_days=None, age_days=0):
+    db["groceries"].insert_one({
+        "user_id": ObjectId(USER_ID),
+        "name": name,
+        "min_days": min_days,
+        "created_at": datetime.now(timezone.utc) - timedelta(days=age_days),
+        "count": 1,
+    })
+
+
+def test_index_keys_maintained_on_create_and_update(db):
+    created = recipes.create_recipe(RecipeCreate(title="Toast", ingredients=["Bread", " BUTTER "]), current_user=USER)
+    doc = db["recipes"].find_one({"_id": ObjectId(created.id)})
+    assert doc["ingredient_keys"] == ["bread", "butter"]
+
+    recipes.update_recipe(created.id, RecipeUpdate(ingredients=["Bread", "Jam"]), current_user=USER)
+    doc = db["recipes"].find_one({"_id": ObjectId(created.id)})
+    assert doc["ingredient_keys"] == ["bread", "jam"]
+
+
+def test_ranks_by_coverage_then_expiry(db):
+    _add_grocery(db, "Milk", min_days=5, age_days=4)   # expires in ~1 day
+    _add_grocery(db, "Bread", min_days=30)
+    _add_grocery(db, "Eggs", min_days=30)
+    _add_grocery(db, "Rice")
+
+    full_urgent = recipes.create_recipe(RecipeCreate(title="Milk Toast", ingredients=["Milk", "Bread"]), current_user=USER)
+    full_relaxed = recipes.create_recipe(RecipeCreate(title="Egg Toast", ingredients=["Eggs", "Bread"]), current_user=USER)
+    half = recipes.create_recipe(RecipeCreate(title="Omelette", ingredients=["Eggs", "Cheese"]), current_user=USER)
+    recipes.create_recipe(RecipeCreate(title="Salad", ingredients=["Lettuce"]), current_user=USER)
+
+    ranked = recipes.rank_cookable_recipes(limit=10, current_user=USER)
+
+    assert [r.id for r in ranked] == [full_urgent.id, full_relaxed.id, half.id]
+    assert ranked[0].coverage == 1.0
+    assert 0 < ranked[0].soonest_expiry_days < 2
+    assert ranked[2].missing_ingredients == ["cheese"]
+
+    assert len(recipes.rank_cookable_recipes(limit=1, current_user=USER)) == 1
+
+
+def test_expiring_items_never_outrank_higher_coverage(db):
+    for name in ("Milk", "Cream", "Yogurt"):
+        _add_grocery(db, name, min_days=5, age_days=5)   # all expire today
+    _add_grocery(db, "Bread", min_days=30)
+    _add_grocery(db, "Butter", min_days=30)
+
+    cookable = recipes.create_recipe(RecipeCreate(title="Toast", ingredients=["Bread", "Butter"]), current_user=USER)
+    partial = recipes.create_recipe(
+        RecipeCreate(title="Pancakes", ingredients=["Milk", "Cream", "Yogurt", "Flour"]), current_user=USER
+    )
+
+    ranked = recipes.rank_cookable_recipes(limit=10, current_user=USER)
+    # Pancakes has the higher score, but Toast can be cooked right now
+    assert ranked[1].score > ranked[0].score
+    assert [r.id for r in ranked] == [cookable.id, partial.id]
+
+
+def test_backfills_recipes_saved_before_index(db):
+    _add_grocery(db, "Milk")
+    db["recipes"].insert_one({"user_id": USER_ID, "title": "Legacy", "ingredients": ["milk"], "steps": []})
+
+    ranked = recipes.rank_cookable_recipes(limit=5, current_user=USER)
+
+    assert [r.title for r in ranked] == ["Legacy"]
+    assert db["recipes"].find_one({"title": "Legacy"})["ingredient_keys"] == ["milk"]
+
+
+def test_invalid_limit(db):
+    with pytest.raises(HTTPException) as excinfo:
+        recipes.rank_cookable_recipes(limit=0, current_user=USER)
+    assert excinfo.value.status_code == 400
@@ -0,0 +1,154 @@
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from bson import ObjectId
+from fastapi import Request, Response
+from mongomock import MongoClient
+
+import recipes
+from auth import User
+from groceries import Recipe
+from llm_limits import LLMLimiter
+from recipe_cache import ingredient_key
+from recipe_scheduler import RecipePregenScheduler, take_pregenerated
+
+
+USER_ID = "507f1f77bcf86cd799439011"
+
+
+@pytest.fixture
+def db():
+    db = MongoClient()["test_db"]
+    db["groceries"].insert_many([
+        {"user_id": ObjectId(USER_ID), "name": "Milk", "count": 1},
+        {"user_id": ObjectId(USER_ID), "name": "Bread", "count": 1},
+    ])
+    with patch("groceries.get_groceries_collection", return_value=db["groceries"]), \
+         patch("groceries.get_recipes_collection", return_value=db["recipes"]), \
+         patch("recipe_scheduler.get_recipes_collection", return_value=db["recipes"]), \
+         patch("recipes.get_recipes_collection", return_value=db["recipes"]), \
+         patch("pantry_events.get_pantry_versions_collection", return_value=db["pantry_versions"]):
+        yield db
+
+
+def _fake_generate(ingredients, avoid):
+    return Recipe(title=f"Recipe {len(avoid)}", ingredients_used=ingredients, steps=["Cook"], estimated_minutes=10)
+
+
+def test_debounce_collapses_bursts_into_one_run():
+    scheduler = RecipePregenScheduler(debounce_seconds=0.05, recipes_per_user=2)
+    done = threading.Event()
+    calls = []
+
+    def run(user_id):
+        calls.append(user_id)
+        done.set()
+        return 0
+
+    with patch.object(scheduler, "run_for_user", side_effect=run):
+        for _ in range(5):
+            scheduler.notify_pantry_changed(USER_ID)
+        assert done.wait(2)
+    assert calls == [USER_ID]
+
+
+def test_change_during_a_run_schedules_another():
+    scheduler = RecipePregenScheduler(debounce_seconds=0.01, recipes_per_user=2)
+    started, release, second = threading.Event(), threading.Event(), threading.Event()
+    calls = []
+
+    def run(user_id):
+        calls.append(user_id)
+        if len(calls) == 1:
+            started.set()
+            release.wait(2)
+        else:
+            second.set()
+        return 0
+
+    with patch.object(scheduler, "run_for_user", side_effect=run):
+        scheduler.notify_pantry_changed(USER_ID)
+        assert started.wait(2)
+        # Fires while the first run is still going
+        scheduler.notify_pantry_changed(USER_ID)
+        time.sleep(0.05)
+        assert calls == [USER_ID]
+        release.set()
+        assert second.wait(2)
+    scheduler.shutdown()
+    assert calls == [USER_ID, USER_ID]
+
+
+def test_run_for_user_stores_hidden_recipes_and_drops_stale_ones(db):
+    db["recipes"].insert_one({"user_id": USER_ID, "title": "Old", "pregenerated": True, "ingredient_key": "stale"})
+    scheduler = RecipePregenScheduler(debounce_seconds=1, recipes_per_user=2)
+
+    with patch("groceries._generate_recipe", side_effect=_fake_generate):
+        assert scheduler.run_for_user(USER_ID) == 2
+        # Already topped up: nothing more to generate
+        assert scheduler.run_for_user(USER_ID) == 0
+
+    stored = list(db["recipes"].find({"user_id": USER_ID}))
+    assert len(stored) == 2
+    assert {d["source"] for d in stored} == {"ai_generated"}
+    assert {d["ingredient_key"] for d in stored} == {ingredient_key(["Milk", "Bread"])}
+
+    user = User(id=USER_ID, email="tester@example.com", username="tester")
+    request = Request({"type": "http", "headers": []})
+    assert recipes.list_recipes(request=request, response=Response(), current_user=user).body == b"[]"
+
+
+def test_run_for_user_respects_budget(db):
+    scheduler = RecipePregenScheduler(debounce_seconds=1, recipes_per_user=3)
+    with patch("recipe_scheduler.llm_limiter", LLMLimiter(max_concurrency=1, hourly_budget=0)) as limiter, \
+         patch.object(limiter, "budget_available", side_effect=[True, False]), \
+         patch("groceries._generate_recipe", side_effect=_fake_generate):
+        assert scheduler.run_for_user(USER_ID) == 1
+
+
+def test_take_pregenerated_claims_each_recipe_once(db):
+    key = ingredient_key(["Milk", "Bread"])
+    scheduler = RecipePregenScheduler(debounce_seconds=1, recipes_per_user=1)
+    with patch("groceries._generate_recipe", side_effect=_fake_generate):
+        scheduler.run_for_user(USER_ID)
+
+    assert take_pregenerated(USER_ID, key)["title"] == "Recipe 0"
+    assert take_pregenerated(USER_ID, key) is None
+
+
+def test_llm_limiter_budget_window():
+    limiter = LLMLimiter(max_concurrency=2, hourly_budget=2)
+    assert limiter.budget_available()
+    with limiter.slot():
+        pass
+    with limiter.slot():
+        pass
+    assert limiter.calls_last_hour() == 2
+    assert not limiter.budget_available()
+
+
+def test_background_calls_leave_reserved_slots_for_interactive_ones():
+    limiter = LLMLimiter(max_concurrency=2, hourly_budget=0, interactive_reserve=1)
+    holding, release = threading.Event(), threading.Event()
+    second_started = threading.Event()
+
+    def background_call(started):
+        with limiter.background(), limiter.slot():
+            started.set()
+            release.wait(2)
+
+    first = threading.Thread(target=background_call, args=(holding,))
+    second = threading.Thread(target=background_call, args=(second_started,))
+    first.start()
+    assert holding.wait(2)
+    second.start()
+    # The second background call waits for the first, not for the reserved slot
+    assert not second_started.wait(0.05)
+    with limiter.slot():
+        pass  # interactive call gets the reserved slot straight away
+    release.set()
+    first.join(2)
+    second.join(2)
+    assert second_started.is_set()
@@ -0,0 +1,92 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+from mongomock import MongoClient
+
+import auth
+import refresh_tokens
+from auth import LoginRequest, RefreshRequest
+from config import config
+from password_hashing import PasswordHasher, make_context
+
+
+@pytest.fixture
+def db():
+    db = MongoClient().db
+    hasher = PasswordHasher(make_context(4), workers=1, max_queue=4)
+    db.users.insert_one({"username": "alice", "email": "alice@example.com", "password": hasher.context.hash("hunter22")})
+    with patch("auth.get_user_collection", return_value=db.users), \
+            patch("refresh_tokens.get_refresh_tokens_collection", return_value=db.refresh_tokens), \
+            patch("auth.password_hasher", hasher):
+        yield db
+
+
+def _login():
+    return asyncio.run(auth.login(LoginRequest(email="alice@example.com", password="hunter22")))
+
+
+def test_login_returns_refresh_token_stored_hashed(db):
+    tokens = _login()
+    assert tokens.refresh_token and tokens.expires_in == config.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    stored = db.refresh_tokens.find_one()
+    assert stored["token_hash"] == refresh_tokens.hash_token(tokens.refresh_token)
+    assert tokens.refresh_token not in str(stored)
+
+
+def test_refresh_rotates_without_password_check(db):
+    first = _login()
+    with patch.object(auth.password_hasher, "verify_and_update", side_effect=AssertionError("bcrypt used")):
+        second = auth.refresh(RefreshRequest(refresh_token=first.refresh_token))
+
+    claims = jwt.decode(second.access_token, config.SECRET_KEY, algorithms=[config.ALGORITHM])
+    assert claims["email"] == "alice@example.com"
+    assert second.refresh_token != first.refresh_token
+    assert auth.get_current_user(second.access_token).username == "alice"
+    third = auth.refresh(RefreshRequest(refresh_token=second.refresh_token))
+    assert third.refresh_token
+
+
+def test_reusing_rotated_token_revokes_the_family(db):
+    first = _login()
+    second = auth.refresh(RefreshRequest(refresh_token=first.refresh_token))
+
+    with pytest.raises(HTTPException) as excinfo:
+        auth.refresh(RefreshRequest(refresh_token=first.refresh_token))
+    assert excinfo.value.status_code == 401
+    # The legitimate successor is revoked too
+    with pytest.raises(HTTPException):
+        auth.refresh(RefreshRequest(refresh_token=second.refresh_token))
+
+
+def test_logout_revokes_and_other_sessions_survive(db):
+    phone = _login()
+    laptop = _login()
+    auth.logout(RefreshRequest(refresh_token=phone.refresh_token))
+
+    with pytest.raises(HTTPException):
+        auth.refresh(RefreshRequest(refresh_token=phone.refresh_token))
+    assert auth.refresh(RefreshRequest(refresh_token=laptop.refresh_token)).refresh_token
+
+
+def test_unknown_and_expired_tokens_rejected(db):
+    with pytest.raises(HTTPException):
+        auth.refresh(RefreshRequest(refresh_token="nope"))
+
+    tokens = _login()
+    db.refresh_tokens.update_one({}, {"$set": {"expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}})
+    with pytest.raises(HTTPException):
+        auth.refresh(RefreshRequest(refresh_token=tokens.refresh_token))
+
+
+def test_ttl_and_lookup_indexes():
+    db = MongoClient().db
+    with patch("database.get_db", return_value=db):
+        from database import ensure_indexes
+        ensure_indexes()
+    info = db.refresh_tokens.index_information()
+    assert info["token_hash_1"]["unique"]
+    assert info["expires_at_1"]["expireAfterSeconds"] == 0
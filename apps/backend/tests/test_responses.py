@@ -0,0 +1,64 @@
+import json
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from compression import CompressionMiddleware, negotiate_encoding
+from responses import FastJSONResponse
+
+
+def test_fast_json_handles_datetime_and_objectid():
+    oid = ObjectId()
+    body = FastJSONResponse({"id": oid, "at": datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc)}).body
+    assert json.loads(body) == {"id": str(oid), "at": "2025-01-02T03:04:05Z"}
+
+
+def test_negotiate_encoding_respects_q_values():
+    assert negotiate_encoding("") is None
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0") is None
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("*") is not None
+
+
+def _client() -> TestClient:
+    app = FastAPI(default_response_class=FastJSONResponse)
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/big")
+    def big():
+        return [{"name": f"Item {i}", "count": 1} for i in range(100)]
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter(["a" * 200, "b" * 200]), media_type="text/event-stream")
+
+    return TestClient(app)
+
+
+def test_large_responses_are_gzipped():
+    client = _client()
+    resp = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in resp.headers["vary"]
+    assert int(resp.headers["content-length"]) < len(resp.content)
+    assert resp.json()[99] == {"name": "Item 99", "count": 1}
+
+    raw = client.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in raw.headers
+    assert raw.content == resp.content
+
+
+def test_small_and_streaming_responses_pass_through():
+    client = _client()
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    resp = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in resp.headers
+    assert resp.text == "a" * 200 + "b" * 200
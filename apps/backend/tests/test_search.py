@@ -0,0 +1,132 @@
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+from bson import ObjectId
+from mongomock import MongoClient
+
+import search
+from auth import User
+from config import config
+from pantry_events import bump_version
+from search import InvertedIndex, LocalIndexSearch, MongoTextSearch, snippet, tokenize
+
+
+USER_ID = "507f1f77bcf86cd799439011"
+USER = User(id=USER_ID, email="tester@example.com", username="tester")
+OTHER_ID = "507f1f77bcf86cd799439012"
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = MongoClient()["test_db"]
+    now = datetime.now(timezone.utc)
+    db.receipts.insert_many([
+        {"user_id": USER_ID, "raw_text": "FISH MARKET\nAtlantic salmon fillet 12.99\nLemons 1.50", "created_at": now},
+        {"user_id": USER_ID, "raw_text": "CORNER STORE\nMilk 2.49\nBread 3.10", "created_at": now},
+        {"user_id": USER_ID, "raw_text": "SUPERMART\nSmoked salmon 8.99\nSalmon roe 14.00\nEggs 3.20", "created_at": now},
+        {"user_id": OTHER_ID, "raw_text": "Salmon salmon salmon", "created_at": now},
+    ])
+    db.groceries.insert_many([
+        {"user_id": ObjectId(USER_ID), "name": "Salmon", "created_at": now},
+        {"user_id": ObjectId(USER_ID), "name": "Milk", "created_at": now},
+        {"user_id": ObjectId(OTHER_ID), "name": "Salmon", "created_at": now},
+    ])
+    local = LocalIndexSearch(max_users=2)
+    monkeypatch.setattr(search, "local_search", local)
+    with patch("search.get_receipts_collection", return_value=db.receipts), \
+         patch("search.get_groceries_collection", return_value=db.groceries), \
+         patch("pantry_events.get_pantry_versions_collection", return_value=db.pantry_versions):
+        yield db
+
+
+def _search(q, **kwargs):
+    params = {"type": "all", "offset": 0, "limit": 20, **kwargs}
+    return search.search(q=q, current_user=USER, **params)
+
+
+def test_tokenize_and_snippet():
+    assert tokenize("The Smoked SALMONS, and eggs!") == ["smoked", "salmon", "egg"]
+    text = "A" * 200 + " fresh salmon fillet " + "B" * 200
+    out = snippet(text, ["salmon"], width=60)
+    assert "salmon" in out and out.startswith("…") and out.endswith("…")
+
+
+def test_local_backend_ranks_and_scopes_to_user(db, monkeypatch):
+    monkeypatch.setattr(config, "SEARCH_BACKEND", "local")
+    result = _search("salmon")
+
+    assert result.backend == "local"
+    assert result.total == 3
+    kinds = [h.kind for h in result.results]
+    assert sorted(kinds) == ["grocery", "receipt", "receipt"]
+    receipts = [h for h in result.results if h.kind == "receipt"]
+    # Two mentions outrank one
+    assert receipts[0].title == "SUPERMART" and receipts[1].title == "FISH MARKET"
+    assert "salmon" in receipts[0].snippet.lower()
+    assert all(h.id != str(db.receipts.find_one({"user_id": OTHER_ID})["_id"]) for h in result.results)
+
+    only_groceries = _search("salmon milk", type="groceries")
+    assert {h.title for h in only_groceries.results} == {"Salmon", "Milk"}
+
+
+def test_local_backend_paginates(db, monkeypatch):
+    monkeypatch.setattr(config, "SEARCH_BACKEND", "local")
+    full = _search("salmon milk eggs").results
+    page = _search("salmon milk eggs", offset=1, limit=2)
+    assert page.total == len(full) == 5
+    assert [h.id for h in page.results] == [h.id for h in full[1:3]]
+
+
+def test_local_index_rebuilds_when_data_version_changes(db, monkeypatch):
+    monkeypatch.setattr(config, "SEARCH_BACKEND", "local")
+    assert _search("salmon").total == 3
+    assert _search("salmon").total == 3
+    assert search.local_search.builds == 1
+
+    db.receipts.insert_one({"user_id": USER_ID, "raw_text": "Salmon steak 9.99"})
+    bump_version(USER_ID, "receipts")
+    assert _search("salmon").total == 4
+    assert search.local_search.builds == 2
+
+    # Recipes aren't indexed: saving one keeps the index
+    bump_version(USER_ID, "recipes")
+    assert _search("salmon").total == 4
+    assert search.local_search.builds == 2
+
+
+def test_mongo_backend_falls_back_to_local_without_text_support(db, monkeypatch):
+    monkeypatch.setattr(config, "SEARCH_BACKEND", "mongo")
+    result = _search("salmon")
+    assert result.backend == "local" and result.total == 3
+
+
+def test_mongo_backend_query_shape():
+    receipts, groceries = MagicMock(), MagicMock()
+    receipts.count_documents.return_value = 1
+    groceries.count_documents.return_value = 0
+    receipts.find.return_value.sort.return_value.limit.return_value = [
+        {"_id": ObjectId(), "raw_text": "STORE\nsalmon", "score": 1.5},
+    ]
+    groceries.find.return_value.sort.return_value.limit.return_value = []
+    with patch("search.get_receipts_collection", return_value=receipts), \
+         patch("search.get_groceries_collection", return_value=groceries):
+        hits, total = MongoTextSearch().search(USER_ID, "salmon", search.KINDS, 10)
+
+    assert total == 1 and hits[0].score == 1.5 and hits[0].title == "STORE"
+    filt, proj = receipts.find.call_args.args
+    assert filt == {"user_id": USER_ID, "$text": {"$search": "salmon"}}
+    assert proj["score"] == {"$meta": "textScore"}
+    assert groceries.find.call_args.args[0]["user_id"] == ObjectId(USER_ID)
+
+
+def test_bm25_prefers_rare_terms():
+    docs = [("receipt", {"_id": i}, text) for i, text in enumerate(["milk bread", "milk eggs", "milk saffron"])]
+    hits, total = InvertedIndex(docs).search("milk saffron", ("receipt",), 10)
+    assert total == 3 and hits[0].id == "2"
+
+
+def test_query_without_words_rejected(db):
+    with pytest.raises(search.HTTPException) as excinfo:
+        _search("the and")
+    assert excinfo.value.status_code == 400